@@ -0,0 +1,142 @@
+"""Exact best response and exploitability for Kuhn poker
+
+A strategy is any function mapping (state, player index) to a
+distribution over the actions available at that state, e.g. the regret
+matched strategy KuhnPokerCFR plays or the normalized average strategy of
+a cumulative profile. The best responder knows its own card and the
+actions so far, so its information sets are (card, action history); its
+action at each information set maximizes the value summed over the deals
+it cannot tell apart, weighted by the chance and opponent reach of each.
+"""
+import copy
+from itertools import permutations
+
+from pokerkit import State
+
+from actions import ActionType
+from infosets import InfoSet, InfoSetMap
+from poker_algorithms import KuhnPokerCFR
+
+_STARTING_STACK_SIZE = 2
+
+
+def regret_strategy(regrets: InfoSetMap):
+    """The strategy KuhnPokerCFR.play() samples from: regret matching"""
+    return lambda state, index: KuhnPokerCFR.regret_matching(regrets, state, index)
+
+
+def average_strategy(cumulative_profile: InfoSetMap):
+    """The normalized average strategy of a cumulative profile, uniform at
+    unseen information sets"""
+    def strategy(state: State, index: int) -> dict[ActionType, float]:
+        actions = KuhnPokerCFR.available_actions(state)
+        profile = cumulative_profile.get_actions(InfoSet(state, index)) or {}
+        weights = [max(0, profile.get(action, 0)) for action in actions]
+        total = sum(weights)
+        if total == 0:
+            return {action: 1 / len(actions) for action in actions}
+        return {action: weight / total for action, weight in zip(actions, weights)}
+    return strategy
+
+
+def best_response_value(base_state: State, strategy, player_index: int) -> float:
+    """Expected payoff per hand of a best response to a strategy
+
+    Args:
+        base_state (State): the undealt Kuhn poker state
+        strategy: function from (state, player index) to a distribution
+                    over the available actions, played by the opponent
+        player_index (int): the seat of the best responder
+
+    Returns:
+        float: the best responder's expected chips won per hand
+    """
+    deals = []
+    for cards in permutations(base_state.deck_cards, 2):
+        state = copy.deepcopy(base_state)
+        state.deck_cards = list(cards) + [card for card in base_state.deck_cards
+                                          if card not in cards]
+        state.deal_hole()
+        state.deal_hole()
+        deals.append(state)
+    chance = 1 / len(deals)
+
+    # gather the histories of every information set of the best responder
+    infosets = {}
+    for state in deals:
+        _collect(state, (), chance, strategy, player_index, infosets)
+
+    choices = {}
+    return sum(_value(state, (), strategy, player_index, infosets, choices) * chance
+               for state in deals)
+
+
+def exploitability(base_state: State, strategy) -> float:
+    """Mean chips per hand a best responder wins against a strategy over
+    both seats; zero exactly at a Nash equilibrium"""
+    return (best_response_value(base_state, strategy, 0)
+            + best_response_value(base_state, strategy, 1)) / 2
+
+
+def _infoset(state: State, history: tuple, player_index: int) -> tuple:
+    """Private helper for the best responder's information set"""
+    return (tuple(state.hole_cards[player_index]), history)
+
+
+def _child(state: State, action: ActionType) -> State:
+    """Private helper to play an action on a copy of a state"""
+    child = copy.deepcopy(state)
+    KuhnPokerCFR.play_action(child, action)
+    return child
+
+
+def _collect(state: State,
+             history: tuple,
+             reach: float,
+             strategy,
+             player_index: int,
+             infosets: dict) -> None:
+    """Private helper to record (state, history, reach) under the best
+    responder's information sets"""
+    if not state.status:
+        return
+    if state.actor_index == player_index:
+        infosets.setdefault(_infoset(state, history, player_index), []).append(
+            (state, history, reach))
+        for action in KuhnPokerCFR.available_actions(state):
+            _collect(_child(state, action), history + (action,), reach,
+                     strategy, player_index, infosets)
+        return
+    for action, probability in strategy(state, state.actor_index).items():
+        if probability > 0:
+            _collect(_child(state, action), history + (action,), reach * probability,
+                     strategy, player_index, infosets)
+
+
+def _value(state: State,
+           history: tuple,
+           strategy,
+           player_index: int,
+           infosets: dict,
+           choices: dict) -> float:
+    """Private helper for the best responder's value of a state"""
+    if not state.status:
+        return state.stacks[player_index] - _STARTING_STACK_SIZE
+    if state.actor_index != player_index:
+        return sum(probability * _value(_child(state, action), history + (action,),
+                                        strategy, player_index, infosets, choices)
+                   for action, probability in strategy(state, state.actor_index).items()
+                   if probability > 0)
+
+    key = _infoset(state, history, player_index)
+    if key not in choices:
+        # the best action is the same for every history of the information set
+        choices[key] = max(
+            KuhnPokerCFR.available_actions(state),
+            key=lambda action: sum(
+                reach * _value(_child(member, action), member_history + (action,),
+                               strategy, player_index, infosets, choices)
+                for member, member_history, reach in infosets[key]))
+    action = choices[key]
+    return _value(_child(state, action), history + (action,),
+                  strategy, player_index, infosets, choices)
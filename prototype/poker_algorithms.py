@@ -63,8 +63,16 @@ class KuhnPokerCFR:
             2,  # number of players
         )
 
-    def train(self, epochs: int, epsilon: float, tau: float, beta: float) -> None:
+    def train(self,
+              epochs: int,
+              epsilon: float,
+              tau: float,
+              beta: float,
+              exploitability_every: int = 0) -> None:
         """Train the model using Monte Carlo Counterfactual Regret Minimization
+
+        If exploitability_every is positive, the exact exploitability of the 
+        average strategy is printed every that many epochs.
         
         Algorithm based on Gibson, et al. (2012)
         """
@@ -73,13 +81,10 @@ class KuhnPokerCFR:
 
         epoch_to_stars = 70 / epochs
         for current_epoch in range(epochs):
-            print("[", end='')
+            # redraw the progress bar only when it gains a star
             stars = int(current_epoch * epoch_to_stars)
-            for i in range(stars):
-                print("*", end='')
-            for i in range(70 - stars - 1):
-                print("-", end='')
-            print("]")
+            if current_epoch == 0 or stars != int((current_epoch - 1) * epoch_to_stars):
+                print("[" + "*" * stars + "-" * (70 - stars - 1) + "]")
 
             state = copy.deepcopy(self._base_state)
 
@@ -105,6 +110,12 @@ class KuhnPokerCFR:
                                    regrets,
                                    cumulative_profile)
 
+            if exploitability_every and (current_epoch + 1) % exploitability_every == 0:
+                # imported here since best_response depends on this module
+                from best_response import average_strategy, exploitability
+                print(f"Epoch {current_epoch + 1}: exploitability "
+                      f"{exploitability(self._base_state, average_strategy(cumulative_profile)):.5f}")
+
         self._regrets = regrets
         print(regrets.to_string())
 
@@ -266,7 +277,5 @@ class KuhnPokerCFR:
                     result[action] = 1 / len(action_list)
             else:
                 for action in action_list:
-                    current_regret = max(0, (table.get_actions(current_infoset)).get(action))
-                    result[action] = \
-                        (current_regret / regret_sum) if current_regret is not None else 0
+                    result[action] = regret_set_positive.get(action, 0) / regret_sum
         return result
@@ -0,0 +1,230 @@
+"""Headless evaluation of two players over many hands of heads-up no-limit
+hold'em
+
+Hands are played on the lightweight HUNLState with no per-hand output and
+are split into chunks that a process pool plays in parallel. Each chunk
+seeds its own random state from the evaluation seed, so results do not
+depend on the number of workers. Players swap seats every hand, and each
+chunk reduces the first player's payoffs into NumPy sums so that only two
+numbers per chunk cross process boundaries.
+
+Two techniques reduce the variance of the estimate. With duplicate
+dealing every deal is played twice with the players' seats, and therefore
+their cards, swapped, and the sample is the mean of the two hands. With an
+AllInEquity, the luck of every chance event is subtracted from the
+payoffs, as the chance terms of AIVAT (Burch et al., 2018) do: dealing
+cards moves player 0's equity from e to e', changing the value of the pot P
+committed at that moment by (e' - e) * P. The equity before a deal is the
+expectation of the equity after it, so the correction has mean zero and the
+estimate stays unbiased while most of the card luck cancels out. (The
+preflop equity comes from the sampled table, whose error adds a small bias
+to the flop term.)"""
+import argparse
+import functools
+import multiprocessing
+import random
+from collections.abc import Callable
+
+import numpy as np
+
+from strategy_server import RemotePlayer
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.betting import ActionTree, BettingConfig
+from util.cards import N_CARDS
+from util.equity import AllInEquity
+from util.games import BIG_BLIND, CARDS_DEALT, SMALL_BLIND, HUNLState
+from util.players import CFRPlayer, Player
+
+_Z_95 = 1.959963984540054
+_RIVER = 3
+
+
+class EvaluationResult:
+    """Summary of the first player's winnings in milli big blinds per hand"""
+
+    def __init__(self,
+                 samples: int,
+                 total: float,
+                 total_squares: float,
+                 hands_per_sample: int = 1) -> None:
+        """Summarize accumulated payoffs
+
+        Args:
+            samples (int): number of independent samples (hands, or deals 
+                        when duplicate dealing)
+            total (float): sum of the first player's per-sample payoffs in 
+                        chips
+            total_squares (float): sum of the squared per-sample payoffs
+            hands_per_sample (int): hands played per sample
+        """
+        self.hands = samples * hands_per_sample
+        scale = 1000 / BIG_BLIND
+        self.mean = scale * total / samples
+        variance = (total_squares - total * total / samples) / max(samples - 1, 1)
+        self.std = scale * float(np.sqrt(max(variance, 0.0)))
+        self.ci95 = _Z_95 * self.std / float(np.sqrt(samples))
+
+    def __str__(self) -> str:
+        return (f"{self.hands} hands: {self.mean:.1f} ± {self.ci95:.1f} mbb/hand "
+                f"(95% CI, std {self.std:.1f})")
+
+
+def evaluate(players: tuple[Callable[[], Player], Callable[[], Player]],
+             hands: int,
+             workers: int = 1,
+             seed: int = 0,
+             abstraction: CardAbstraction | None = None,
+             chunk_size: int = 10000,
+             duplicate: bool = False,
+             equity: AllInEquity | None = None,
+             betting: ActionTree | None = None) -> EvaluationResult:
+    """Play two players against each other and summarize the first's winnings
+
+    Args:
+        players (tuple[Callable[[], Player], Callable[[], Player]]):
+                    picklable factories (e.g. functools.partial) creating
+                    each player; every process creates its own players
+        hands (int): number of hands to play
+        workers (int): number of processes playing chunks in parallel
+        seed (int): seed of the deals and of the players' sampling
+        abstraction (CardAbstraction | None): card abstraction the players'
+                    information sets are keyed on
+        chunk_size (int): hands per unit of work
+        duplicate (bool): play every deal from both seats; hands is then 
+                    the number of deals
+        equity (AllInEquity | None): if given, subtract the luck of the 
+                    cards from every payoff
+        betting (ActionTree | None): if given, actions outside this betting 
+                    abstraction are illegal
+
+    Returns:
+        EvaluationResult: the first player's winnings in mbb/hand
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(-(-hands // chunk_size))
+    chunks = [(players, abstraction, equity, betting, duplicate,
+               min(chunk_size, hands - start), int(chunk_seed))
+              for start, chunk_seed in zip(range(0, hands, chunk_size), seeds)]
+    if workers == 1:
+        sums = [_play_chunk(*chunk) for chunk in chunks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            sums = pool.starmap(_play_chunk, chunks)
+    return EvaluationResult(hands,
+                            sum(total for total, _ in sums),
+                            sum(squares for _, squares in sums),
+                            2 if duplicate else 1)
+
+
+def _play_chunk(players: tuple[Callable[[], Player], Callable[[], Player]],
+                abstraction: CardAbstraction | None,
+                equity: AllInEquity | None,
+                betting: ActionTree | None,
+                duplicate: bool,
+                samples: int,
+                seed: int) -> tuple[float, float]:
+    """Private helper to play a chunk of hands or duplicate deals
+
+    Returns:
+        tuple[float, float]: sum and sum of squares of the first player's
+                    per-sample payoffs
+    """
+    random.seed(seed)
+    dealer = random.Random(seed)
+    seated = [factory() for factory in players]
+    orders = ((seated[0], seated[1]), (seated[1], seated[0]))
+    payoffs = np.empty(samples)
+    for sample in range(samples):
+        deck = dealer.sample(range(N_CARDS), CARDS_DEALT)
+        if duplicate:
+            # the first player sits in seat 0, then seat 1, of the same deal
+            payoffs[sample] = (_play_hand(deck, orders[0], abstraction, equity, betting)[0]
+                               + _play_hand(deck, orders[1], abstraction, equity, betting)[1]) / 2
+        else:
+            # the first player sits in seat sample % 2
+            seat = sample % 2
+            payoffs[sample] = _play_hand(deck, orders[seat], abstraction, equity, betting)[seat]
+    return float(payoffs.sum()), float(np.dot(payoffs, payoffs))
+
+
+def _play_hand(deck: list[int],
+               order: tuple[Player, Player],
+               abstraction: CardAbstraction | None,
+               equity: AllInEquity | None,
+               betting: ActionTree | None) -> tuple[float, float]:
+    """Private helper to play out a hand between seated players
+
+    A player returning an illegal action checks or calls instead.
+
+    Returns:
+        tuple[float, float]: each seat's payoff, less its luck if equity is 
+                    given
+    """
+    state = HUNLState(deck, abstraction, betting=betting)
+    # (street dealt, chips committed when it was dealt) of every chance event
+    deals = [(0, SMALL_BLIND + BIG_BLIND)]
+    while state.status:
+        actor = state.actor_index
+        action = order[actor].get_action(state.infoset(actor))
+        if action not in state.legal_actions():
+            action = Action.CHECK_CALL
+        street = state.street
+        # only a call can close the action, matching the bets at this amount
+        called = state.pot + 2 * min(state.bets[1 - actor],
+                                     state.bets[actor] + state.stacks[actor])
+        state.push(action)
+        if state.status and state.street != street:
+            deals.append((state.street, state.pot))
+        elif not state.status and state.folder_index is None:
+            # the rest of the board is dealt at showdown
+            deals.extend((dealt, called) for dealt in range(street + 1, _RIVER + 1))
+    for seat, player in enumerate(order):
+        player.handle_round_over(state, seat)
+
+    payoffs = state.payoffs
+    if equity is None:
+        return payoffs
+    luck = _luck(deck, deals, equity)
+    return payoffs[0] - luck, payoffs[1] + luck
+
+
+def _luck(deck: list[int], deals: list[tuple[int, int]], equity: AllInEquity) -> float:
+    """Private helper for the chips seat 0 gained from the cards dealt"""
+    hole_cards = ((deck[0], deck[1]), (deck[2], deck[3]))
+    board_counts = (0, 3, 4, 5)
+    luck = 0.0
+    previous = 0.5
+    for street, committed in deals:
+        current = equity.equity(hole_cards, tuple(deck[4:4 + board_counts[street]]))
+        luck += (current - previous) * committed
+        previous = current
+    return luck
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate two compiled policies head to head.")
+    parser.add_argument("policies", nargs=2, help="policy files written by save_policy_to_file, "
+                                                  "or URLs of strategy servers")
+    parser.add_argument("hands", type=int)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--abstraction", help="directory of the card abstraction tables")
+    parser.add_argument("--duplicate", action="store_true",
+                        help="play every deal from both seats")
+    parser.add_argument("--equity", help="directory of the preflop equity tables, to "
+                                         "subtract the luck of the cards")
+    parser.add_argument("--betting", help="JSON betting config the policies were trained on")
+    args = parser.parse_args()
+
+    abstraction = CardAbstraction(args.abstraction) if args.abstraction else None
+    equity = AllInEquity(args.equity) if args.equity else None
+    betting = ActionTree(BettingConfig.load(args.betting)) if args.betting else None
+    players = tuple(functools.partial(RemotePlayer if policy.startswith('http') else CFRPlayer,
+                                      None, policy)
+                    for policy in args.policies)
+    print(evaluate(players, args.hands, args.workers, args.seed, abstraction,
+                   duplicate=args.duplicate, equity=equity, betting=betting))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,45 @@
 """Model to approximate Nash equilibrium play in an incomplete information 
 extended form game using average strategy sampling Monte Carlo counterfactual 
 regret minimization. Customized for heads-up, no-limit Texas Hold'em"""
+import multiprocessing
+import queue
+import random
+import sys
+import time
+import uuid
+from collections.abc import Callable
+
+from util.abstraction import CardAbstraction
 from util.actions import Action
-from util.infosets import InfoSet, InfoSetMap
+from util.best_response import exploitability
+from util.betting import ActionTree
+from util.cards import N_CARDS
+from util.checkpoints import Checkpointer
+from util.equity import AllInEquity
+from util.games import CARDS_DEALT, HUNLState
+from util.infosets import InfoSet, InfoSetMap, SharedInfoSetMap
+from util.metrics import TrainingMetrics
+from util.strategies import PolicyTable
 
-from pokerkit import State
+# seconds between checks that parallel training workers are still running
+_POLL_SECONDS = 1.0
 
 
-def _walk_tree(base_state: State,
+def _walk_tree(base_state: HUNLState,
                player_index: int,
                sample_prob: float,
                epsilon: float,
                tau: float,
                beta: float,
                regrets: InfoSetMap,
-               cumulative_profile: InfoSetMap) -> float:
+               cumulative_profile: InfoSetMap,
+               in_place: bool = False) -> float:
     """Perform an iteration of MCCFR
     
     Args:
-        base_state (State): the state (history) at the root of the subtree 
-                            that will be traversed on this method call
-        player_index (int): the index of the player to act at this history
+        base_state (HUNLState): the state (history) at the root of the 
+                            subtree that will be traversed on this method call
+        player_index (int): the index of the player whose regrets are updated
         sample_prob (float): the probability of sampling this history
         epsilon (float): see HeadsUpNLCFR.train()
         tau (float): see HeadsUpNLCFR.train()
@@ -29,10 +48,227 @@ def _walk_tree(base_state: State,
                             actions at InfoSets
         cumulative_profile (InfoSetMap): a table associating InfoSets with 
                             action probability distributions
+        in_place (bool): see HeadsUpNLCFR.train()
 
     Returns:
         float: the approximated utility of the given base state
     """
+    # handle terminal state
+    if not base_state.status:
+        return base_state.payoffs[player_index] / sample_prob
+
+    current_infoset = base_state.infoset(base_state.actor_index)
+    current_strategy = _regret_matching(regrets,
+                                        current_infoset,
+                                        base_state.legal_actions())
+
+    # handle opponent state
+    if base_state.actor_index != player_index:
+        # update cumulative profile
+        old_dist = cumulative_profile.get_actions(current_infoset) or {}
+        for action, action_probability in current_strategy.items():
+            cumulative_profile.set_action(current_infoset,
+                                          action,
+                                          old_dist.get(action, 0)
+                                          + (action_probability / sample_prob))
+
+        # play opponent action
+        new_action = _sample_action(current_strategy)
+        return _walk_child(base_state,
+                           new_action,
+                           player_index,
+                           sample_prob,
+                           epsilon,
+                           tau,
+                           beta,
+                           regrets,
+                           cumulative_profile,
+                           in_place)
+
+    # handle player state (update regrets)
+    cumulative_strategy = cumulative_profile.get_actions(current_infoset) or {}
+    cumulative_profile_sum = sum(cumulative_strategy.values())
+    action_values = {}
+    for action in current_strategy:
+        probability_to_walk_path = max(
+            epsilon,
+            (beta + (tau * cumulative_strategy.get(action, 0)))
+            / (beta + cumulative_profile_sum)
+        )
+        action_values[action] = 0
+        if random.random() < probability_to_walk_path:
+            action_values[action] = _walk_child(base_state,
+                                                action,
+                                                player_index,
+                                                sample_prob * min(1, probability_to_walk_path),
+                                                epsilon,
+                                                tau,
+                                                beta,
+                                                regrets,
+                                                cumulative_profile,
+                                                in_place)
+
+    # calculate new state value
+    new_state_value = 0
+    for action, value in action_values.items():
+        new_state_value += current_strategy[action] * value
+
+    # update regrets
+    old_regret_set = regrets.get_actions(current_infoset) or {}
+    for action, value in action_values.items():
+        regrets.set_action(current_infoset,
+                           action,
+                           old_regret_set.get(action, 0) + value - new_state_value)
+
+    return new_state_value
+
+
+def _walk_child(base_state: HUNLState,
+                action: Action,
+                player_index: int,
+                sample_prob: float,
+                epsilon: float,
+                tau: float,
+                beta: float,
+                regrets: InfoSetMap,
+                cumulative_profile: InfoSetMap,
+                in_place: bool) -> float:
+    """Walk the subtree below an action taken at base_state
+
+    The action is either applied to a copy of the state or pushed onto the 
+    state itself and undone once the subtree has been walked. See 
+    _walk_tree() for the remaining arguments.
+    """
+    if not in_place:
+        return _walk_tree(base_state.apply(action),
+                          player_index,
+                          sample_prob,
+                          epsilon,
+                          tau,
+                          beta,
+                          regrets,
+                          cumulative_profile)
+
+    base_state.push(action)
+    value = _walk_tree(base_state,
+                       player_index,
+                       sample_prob,
+                       epsilon,
+                       tau,
+                       beta,
+                       regrets,
+                       cumulative_profile,
+                       in_place)
+    base_state.pop()
+    return value
+
+
+def _run_epochs(epochs: int,
+                epsilon: float,
+                tau: float,
+                beta: float,
+                in_place: bool,
+                abstraction: CardAbstraction | None,
+                equity: AllInEquity | None,
+                betting: ActionTree | None,
+                regrets: InfoSetMap | SharedInfoSetMap,
+                cumulative_profile: InfoSetMap | SharedInfoSetMap,
+                first_epoch: int = 0,
+                checkpointer: Checkpointer | None = None,
+                checkpoint_every: int = 0,
+                exploitability_every: int = 0,
+                on_exploitability: Callable[[int, float], None] | None = None,
+                metrics: TrainingMetrics | None = None) -> None:
+    """Deal hands and walk the tree from each, alternating the player whose 
+    regrets are updated, for epochs first_epoch through epochs - 1. See 
+    HeadsUpNLCFR for the arguments."""
+    for current_epoch in range(first_epoch, epochs):
+        state = HUNLState(random.sample(range(N_CARDS), CARDS_DEALT), abstraction, equity,
+                          betting)
+        _walk_tree(state,
+                   current_epoch % 2,
+                   1.0,
+                   epsilon,
+                   tau,
+                   beta,
+                   regrets,
+                   cumulative_profile,
+                   in_place)
+        if metrics is not None:
+            metrics.record(current_epoch + 1, regrets, cumulative_profile)
+        if checkpointer is not None and (current_epoch + 1) % checkpoint_every == 0:
+            checkpointer.save(regrets, cumulative_profile, current_epoch + 1)
+        if exploitability_every and (current_epoch + 1) % exploitability_every == 0:
+            policy = PolicyTable.compile(cumulative_profile)
+            on_exploitability(current_epoch + 1,
+                              exploitability(policy, abstraction, betting=betting))
+    # save the epochs since the last periodic checkpoint, so that a run
+    # shorter than checkpoint_every is checkpointed too
+    if checkpointer is not None and checkpointer.iteration < epochs:
+        checkpointer.save(regrets, cumulative_profile, epochs)
+
+
+def _train_worker(worker_index: int,
+                  epochs: int,
+                  seed: int,
+                  epsilon: float,
+                  tau: float,
+                  beta: float,
+                  in_place: bool,
+                  abstraction: CardAbstraction | None,
+                  equity: AllInEquity | None,
+                  betting: ActionTree | None,
+                  regrets: SharedInfoSetMap,
+                  cumulative_profile: SharedInfoSetMap,
+                  results: multiprocessing.Queue) -> None:
+    """Entry point of a parallel training process
+
+    Runs its share of the epochs against the shared tables and reports 
+    (worker_index, epochs, seconds) on the results queue.
+    """
+    random.seed(seed)
+    start = time.perf_counter()
+    _run_epochs(epochs, epsilon, tau, beta, in_place, abstraction, equity, betting,
+                regrets, cumulative_profile)
+    results.put((worker_index, epochs, time.perf_counter() - start))
+    regrets.close()
+    cumulative_profile.close()
+
+
+def _check_workers(processes: list[multiprocessing.Process]) -> None:
+    """Private helper to raise if a training worker exited with an error"""
+    for process in processes:
+        if process.exitcode not in (None, 0):
+            raise RuntimeError(f"Training worker exited with code {process.exitcode}.")
+
+
+def _regret_matching(table: InfoSetMap,
+                     infoset: InfoSet,
+                     legal_actions: list[Action]) -> dict[Action, float]:
+    """Returns a probability distribution over the legal actions at an 
+    information set given a regret table"""
+    regret_set = table.get_actions(infoset) or {}
+    positive_regrets = [max(0, regret_set.get(action, 0)) for action in legal_actions]
+    regret_sum = sum(positive_regrets)
+    if regret_sum == 0:
+        return {action: 1 / len(legal_actions) for action in legal_actions}
+    return {action: regret / regret_sum
+            for action, regret in zip(legal_actions, positive_regrets)}
+
+
+def _sample_action(strategy: dict[Action, float]) -> Action:
+    """Sample an action from a strategy"""
+    return random.choices(list(strategy.keys()), weights=strategy.values(), k=1)[0]
+
+
+# functions timed under each phase of a tree walk, and counted as the nodes
+# it touches, when training with metrics
+_PHASES = {'copy': [(HUNLState, 'apply'), (HUNLState, 'push'), (HUNLState, 'pop')],
+           'infoset': [(HUNLState, 'infoset')],
+           'lookup': [(InfoSetMap, 'get_actions'), (InfoSetMap, 'set_action')],
+           'regret_matching': [(sys.modules[__name__], '_regret_matching')],
+           'terminal': [(HUNLState, '_showdown')]}
+_COUNTERS = {'nodes': (sys.modules[__name__], '_walk_tree')}
 
 
 class HeadsUpNLCFR:
@@ -40,10 +276,46 @@ class HeadsUpNLCFR:
     or loaded from a file. Strategies can be derived from trained regrets given 
     an InfoSet"""
 
-    def __init__(self, regrets_filename: str | None = None) -> None:
-        pass
+    def __init__(self,
+                 regrets_filename: str | None = None,
+                 abstraction: CardAbstraction | None = None,
+                 equity: AllInEquity | None = None,
+                 betting: ActionTree | None = None) -> None:
+        """Create a model
 
-    def train(self, epochs: int, epsilon: float, tau: float, beta: float) -> None:
+        Args:
+            regrets_filename (str | None): regret table to load, if any
+            abstraction (CardAbstraction | None): card abstraction that 
+                        training keys information sets on
+            equity (AllInEquity | None): if given, training values hands 
+                        that are all in before the river by their equity 
+                        instead of dealing out the board, which removes 
+                        the runout's variance from the regret updates
+            betting (ActionTree | None): betting abstraction to train on; 
+                        the full Action set at every node if None
+        """
+        self._abstraction = abstraction
+        self._equity = equity
+        self._betting = betting
+        self._regrets = None
+        self._cumulative_profile = None
+        if regrets_filename is not None:
+            self.load_regrets_from_file(regrets_filename)
+
+    def train(self,
+              epochs: int,
+              epsilon: float,
+              tau: float,
+              beta: float,
+              in_place: bool = False,
+              workers: int = 1,
+              capacity: int | None = None,
+              checkpoint_dir: str | None = None,
+              checkpoint_every: int = 100000,
+              exploitability_every: int = 0,
+              on_exploitability: Callable[[int, float], None] | None = None,
+              metrics_file: str | None = None,
+              metrics_every: int = 10000) -> None:
         """Train the model
 
         Args:
@@ -54,16 +326,172 @@ class HeadsUpNLCFR:
                         will always be sampled
             beta (float): bonus parameter - increases the rate of exploration 
                         during early AS iterations
+            in_place (bool): walk the tree by applying and undoing actions 
+                        on a single state per epoch instead of copying the 
+                        state at every node
+            workers (int): number of processes walking the tree in parallel 
+                        against tables in shared memory
+            capacity (int | None): the number of information sets the 
+                        shared tables can hold (parallel training only); 
+                        by default the exact count of the betting 
+                        abstraction, or 1000000 without one
+            checkpoint_dir (str | None): directory to checkpoint the tables 
+                        in; a run resumes from the checkpoint found there, 
+                        with its epoch count and random state (single 
+                        process training only)
+            checkpoint_every (int): number of epochs between checkpoints, plus 
+                        one when training ends
+            exploitability_every (int): if positive, estimate the 
+                        exploitability of the average strategy every this 
+                        many epochs (single process training with a betting 
+                        abstraction only); see util.best_response
+            on_exploitability (Callable[[int, float], None] | None): 
+                        called with the epoch count and the exploitability 
+                        in mbb/hand of every estimate
+            metrics_file (str | None): if given, append throughput, phase 
+                        timing and memory samples to this CSV (.csv) or JSON 
+                        lines file (single process training only); see 
+                        util.metrics
+            metrics_every (int): number of epochs between metrics samples
 
         Algorithm implementation based on Gibson et al. (2012).
         """
+        if exploitability_every and self._betting is None:
+            # the public tree of the unabstracted game is far too large to walk
+            raise ValueError("Exploitability is only measured with a betting abstraction.")
+        if exploitability_every and on_exploitability is None:
+            raise ValueError("Exploitability is only measured with an on_exploitability callback.")
+        if checkpoint_dir is not None and checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1.")
+        if workers == 1:
+            checkpointer = None
+            first_epoch = 0
+            if checkpoint_dir is not None:
+                checkpointer = Checkpointer(checkpoint_dir)
+                first_epoch = checkpointer.iteration
+            if first_epoch > 0:
+                regrets, cumulative_profile = checkpointer.load()
+            else:
+                regrets = InfoSetMap()
+                cumulative_profile = InfoSetMap()
+            if metrics_file is None:
+                _run_epochs(epochs, epsilon, tau, beta, in_place, self._abstraction,
+                            self._equity, self._betting, regrets, cumulative_profile,
+                            first_epoch, checkpointer, checkpoint_every, exploitability_every,
+                            on_exploitability)
+            else:
+                with TrainingMetrics(metrics_file, metrics_every, _PHASES, _COUNTERS) as metrics:
+                    _run_epochs(epochs, epsilon, tau, beta, in_place, self._abstraction,
+                                self._equity, self._betting, regrets, cumulative_profile,
+                                first_epoch, checkpointer, checkpoint_every,
+                                exploitability_every, on_exploitability, metrics)
+            self._regrets = regrets
+            self._cumulative_profile = cumulative_profile
+            return
+        if checkpoint_dir is not None:
+            raise ValueError("Checkpointing is only supported with a single worker.")
+        if exploitability_every:
+            raise ValueError("Exploitability is only measured with a single worker.")
+        if metrics_file is not None:
+            raise ValueError("Metrics are only recorded with a single worker.")
+
+        if capacity is None:
+            capacity = (self._betting.infoset_count(self._abstraction)
+                        if self._betting is not None else 1000000)
+        shared_regrets = SharedInfoSetMap(capacity)
+        shared_profile = SharedInfoSetMap(capacity)
+        try:
+            self._train_parallel(epochs, epsilon, tau, beta, in_place, workers,
+                                 shared_regrets, shared_profile)
+            self._regrets = shared_regrets.to_infoset_map()
+            self._cumulative_profile = shared_profile.to_infoset_map()
+        finally:
+            for table in (shared_regrets, shared_profile):
+                table.close()
+                table.unlink()
+
+    def _train_parallel(self,
+                        epochs: int,
+                        epsilon: float,
+                        tau: float,
+                        beta: float,
+                        in_place: bool,
+                        workers: int,
+                        shared_regrets: SharedInfoSetMap,
+                        shared_profile: SharedInfoSetMap) -> None:
+        """Private helper method to run the training workers over the shared 
+        tables, raising if any of them fails"""
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_train_worker,
+                                    args=(worker_index,
+                                          epochs // workers + (worker_index < epochs % workers),
+                                          random.getrandbits(32),
+                                          epsilon,
+                                          tau,
+                                          beta,
+                                          in_place,
+                                          self._abstraction,
+                                          self._equity,
+                                          self._betting,
+                                          shared_regrets,
+                                          shared_profile,
+                                          results))
+            for worker_index in range(workers)
+        ]
+        start = time.perf_counter()
+        try:
+            for process in processes:
+                process.start()
+
+            # drain the queue before joining so that no worker blocks on it,
+            # polling so that a worker that died cannot leave us waiting
+            total_rate = 0
+            reported = 0
+            while reported < workers:
+                try:
+                    worker_index, worker_epochs, seconds = results.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    _check_workers(processes)
+                    continue
+                reported += 1
+                total_rate += worker_epochs / seconds
+                print(f"Worker {worker_index}: {worker_epochs / seconds:.1f} iterations/sec")
+            for process in processes:
+                process.join()
+            _check_workers(processes)
+            print(f"Total: {total_rate:.1f} iterations/sec "
+                  f"({epochs / (time.perf_counter() - start):.1f} wall clock)")
+        finally:
+            # stop the other workers if one failed or we were interrupted
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
 
     def load_regrets_from_file(self, filename: str):
         """Load a regret table from a file
 
+        The table is memory-mapped rather than read, so loading takes 
+        constant time and processes loading the same file share its pages.
+
         Args:
             filename (str): the name of the file to load from
         """
+        self._regrets = InfoSetMap(filename)
 
     def save_regrets_to_file(self):
         """Save a regret table from a file"""
+        self._regrets.save_to_file(f"regrets-{uuid.uuid4()}.reg")
+
+    def compile_policy(self) -> PolicyTable:
+        """Compile the average strategy of the last training run for play
+
+        The average strategy, not the current regret-matched strategy, is 
+        what converges to a Nash equilibrium.
+        """
+        return PolicyTable.compile(self._cumulative_profile)
+
+    def save_policy_to_file(self):
+        """Save the compiled average strategy to a file"""
+        self.compile_policy().save_to_file(f"policy-{uuid.uuid4()}.pol")
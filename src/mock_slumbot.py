@@ -0,0 +1,318 @@
+"""Local stand-in for the Slumbot API, for testing and benchmarking clients
+
+The server speaks the same JSON protocol as slumbot.com over HTTP/1.1
+keep-alive: POST /api/login returns a token, /api/new_hand deals a hand and
+/api/act plays the client's move, each answered with the hand so far
+(action string, client_pos, hole_cards, board and, once the hand is over,
+winnings and bot_hole_cards). Hands are played on a pokerkit State with
+Slumbot's 50/100 blinds and 20000 chip stacks, so illegal moves are
+rejected the way the real service rejects them, with an error_msg.
+
+The bot's moves come from a configurable opponent: uniformly random
+moves, a naive rule of thumb, or a trained regret table or compiled
+policy played through action translation. A configurable delay before
+every response stands in for the network round trip, so a client's
+throughput and decision latency can be measured offline. Every session is
+a few objects on one asyncio event loop, so thousands can be open at once.
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+from pokerkit import Automation, Card, NoLimitTexasHoldem, Rank, State
+
+from slumbot import format_action, parse_action
+from util.abstraction import CardAbstraction
+from util.betting import ActionTree, BettingConfig
+from util.cards import card_index, card_text
+from util.games import BIG_BLIND, SMALL_BLIND, STARTING_STACK
+from util.json_http import json_connection
+from util.players import CFRPlayer, Player, RegretPlayer
+from util.translation import AbstractHand, ActionTranslator
+
+_AUTOMATIONS = (
+    Automation.ANTE_POSTING,
+    Automation.BET_COLLECTION,
+    Automation.BLIND_OR_STRADDLE_POSTING,
+    Automation.CARD_BURNING,
+    Automation.HOLE_DEALING,
+    Automation.BOARD_DEALING,
+    Automation.HOLE_CARDS_SHOWING_OR_MUCKING,
+    Automation.HAND_KILLING,
+    Automation.CHIPS_PUSHING,
+    Automation.CHIPS_PULLING,
+)
+_STRONG_RANKS = (Rank.ACE,)
+_MEDIUM_RANKS = (Rank.KING, Rank.QUEEN)
+
+
+def _board(state: State) -> list[Card]:
+    """Private helper for the board cards of a single board state"""
+    return [card for cards in state.board_cards for card in cards]
+
+
+def _cards(cards) -> list[str]:
+    """Private helper to write pokerkit cards in Slumbot's notation"""
+    return [card_text(card_index(card)) for card in cards]
+
+
+class Opponent:
+    """Decides the bot's moves, in Slumbot notation"""
+
+    def start(self, seat: int, state: State) -> object:
+        """Begin a hand in a seat, returning the hand's context for the
+        other methods"""
+        return None
+
+    def observe(self, context: object, move: str) -> None:
+        """Learn the client's move"""
+
+    def act(self, context: object, state: State) -> str:
+        """Return the bot's move at a state where it is to act"""
+        raise NotImplementedError
+
+
+class RandomOpponent(Opponent):
+    """Folds, checks or calls, or bets or raises any legal amount, uniformly"""
+
+    def __init__(self, seed: int | None = None) -> None:
+        self._random = random.Random(seed)
+
+    def act(self, context: object, state: State) -> str:
+        facing_bet = state.checking_or_calling_amount > 0
+        moves = ['c' if facing_bet else 'k']
+        if facing_bet:
+            moves.append('f')
+        if state.can_complete_bet_or_raise_to():
+            moves.append('b')
+        move = self._random.choice(moves)
+        if move == 'b':
+            raise_to = self._random.randint(state.min_completion_betting_or_raising_to_amount,
+                                            state.max_completion_betting_or_raising_to_amount)
+            return f'b{raise_to}'
+        return move
+
+
+class NaiveOpponent(Opponent):
+    """Plays its hole cards by a rule of thumb, as the prototype's
+    NaivePlayer does: min-raises pairs and aces, checks or calls with kings
+    and queens, and folds anything else to a bet"""
+
+    def act(self, context: object, state: State) -> str:
+        ranks = [card.rank for card in state.hole_cards[state.actor_index]]
+        facing_bet = state.checking_or_calling_amount > 0
+        if ((ranks[0] == ranks[1] or any(rank in _STRONG_RANKS for rank in ranks))
+                and state.can_complete_bet_or_raise_to()):
+            return f'b{state.min_completion_betting_or_raising_to_amount}'
+        if any(rank in _MEDIUM_RANKS for rank in ranks) or not facing_bet:
+            return 'c' if facing_bet else 'k'
+        return 'f'
+
+
+class StrategyOpponent(Opponent):
+    """Plays a trained strategy on the abstract game, translating the
+    client's bets onto it"""
+
+    def __init__(self,
+                 player: Player,
+                 abstraction: CardAbstraction | None = None,
+                 betting: ActionTree | None = None,
+                 seed: int | None = None) -> None:
+        self._player = player
+        self._abstraction = abstraction
+        self._betting = betting
+        self._translator = ActionTranslator(seed)
+
+    def start(self, seat: int, state: State) -> AbstractHand:
+        hole_cards = tuple(card_index(card) for card in state.hole_cards[seat])
+        return AbstractHand(seat, hole_cards, self._player, self._translator,
+                            self._abstraction, self._betting)
+
+    def observe(self, context: AbstractHand, move: str) -> None:
+        context.observe(*parse_action(move)[0])
+
+    def act(self, context: AbstractHand, state: State) -> str:
+        context.reveal_board(tuple(card_index(card) for card in _board(state)))
+        facing_bet = state.checking_or_calling_amount > 0
+        return format_action(*context.act(), facing_bet)
+
+
+class _Session:
+    """Private helper class for a session and its hand in progress"""
+
+    __slots__ = ('hands', 'client_pos', 'state', 'action', 'street', 'context')
+
+    def __init__(self) -> None:
+        self.hands = 0
+        self.client_pos = 0
+        self.state = None
+        self.action = ''
+        self.street = 0
+        self.context = None
+
+
+class MockSlumbot:
+    """The mock server's sessions and request handling"""
+
+    def __init__(self,
+                 opponent: Opponent,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 seed: int | None = None) -> None:
+        """Create a server
+
+        Args:
+            opponent (Opponent): decides the bot's moves in every session
+            latency (float): seconds to wait before every response
+            jitter (float): up to this many extra seconds are added to 
+                        the latency at random
+            seed (int | None): seed of the jitter
+        """
+        self._opponent = opponent
+        self._latency = latency
+        self._jitter = jitter
+        self._random = random.Random(seed)
+        self._sessions = {}
+        self.hands = 0
+        self.requests = 0
+
+    async def serve(self, host: str, port: int) -> None:
+        """Serve requests until cancelled"""
+        server = await asyncio.start_server(json_connection(self._respond), host, port,
+                                            backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    async def _respond(self, path: str, request: dict) -> dict:
+        """Private helper method to answer a request after the injected 
+        latency"""
+        delay = self._latency + self._jitter * self._random.random()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.handle(path, request)
+
+    def handle(self, path: str, request: dict) -> dict:
+        """Answer a request to an API endpoint"""
+        self.requests += 1
+        if path == '/api/login':
+            return {'token': self._new_session()}
+        token = request.get('token')
+        if token is None and path == '/api/new_hand':
+            token = self._new_session()
+        session = self._sessions.get(token)
+        if session is None:
+            return {'error_msg': "Unknown token."}
+
+        if path == '/api/new_hand':
+            self._deal(session)
+        elif path == '/api/act':
+            if session.state is None or not session.state.status:
+                return {'error_msg': "No hand in progress."}
+            error = self._play(session, request.get('incr', ''), True)
+            if error is not None:
+                return {'error_msg': error}
+        else:
+            return {'error_msg': f"Unknown endpoint {path}."}
+        self._bot_moves(session)
+        return self._response(token, session)
+
+    def _new_session(self) -> str:
+        """Private helper method to open a session, returning its token"""
+        token = uuid.uuid4().hex
+        self._sessions[token] = _Session()
+        return token
+
+    def _deal(self, session: _Session) -> None:
+        """Private helper method to start a session's next hand, alternating
+        the client's seat"""
+        session.client_pos = session.hands % 2
+        session.hands += 1
+        session.state = NoLimitTexasHoldem.create_state(
+            _AUTOMATIONS, True, 0, (SMALL_BLIND, BIG_BLIND), BIG_BLIND, STARTING_STACK, 2)
+        session.action = ''
+        session.street = 0
+        session.context = self._opponent.start(1 - session.client_pos, session.state)
+
+    def _play(self, session: _Session, move: str, client: bool) -> str | None:
+        """Private helper method to play a move, returning an error message
+        if it is illegal"""
+        state = session.state
+        facing_bet = state.checking_or_calling_amount > 0
+        if move == 'f' and facing_bet:
+            state.fold()
+        elif (move == 'k' and not facing_bet) or (move == 'c' and facing_bet):
+            state.check_or_call()
+        elif move[:1] == 'b' and move[1:].isdigit() and state.can_complete_bet_or_raise_to(
+                int(move[1:])):
+            state.complete_bet_or_raise_to(int(move[1:]))
+        else:
+            return f"Illegal move {move!r} after {session.action!r}."
+
+        if client:
+            self._opponent.observe(session.context, move)
+        session.action += move
+        if state.status and state.street_index != session.street:
+            session.street = state.street_index
+            session.action += '/'
+        return None
+
+    def _bot_moves(self, session: _Session) -> None:
+        """Private helper method to play the bot until the client is to act
+        or the hand is over"""
+        state = session.state
+        bot = 1 - session.client_pos
+        while state.status and state.actor_index == bot:
+            self._play(session, self._opponent.act(session.context, state), False)
+        if not state.status:
+            self.hands += 1
+
+    def _response(self, token: str, session: _Session) -> dict:
+        """Private helper method for the hand so far, as Slumbot reports it"""
+        state = session.state
+        response = {'token': token,
+                    'action': session.action,
+                    'client_pos': session.client_pos,
+                    'hole_cards': _cards(state.hole_cards[session.client_pos]),
+                    'board': _cards(_board(state))}
+        if not state.status:
+            response['winnings'] = state.stacks[session.client_pos] - STARTING_STACK
+            response['bot_hole_cards'] = _cards(state.hole_cards[1 - session.client_pos])
+        return response
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Slumbot API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--opponent", default="random",
+                        help="random, naive, or a regret table (.reg) or compiled policy file")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds to wait before every response")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="extra random seconds of latency, up to this many")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--abstraction", help="directory of the card abstraction tables")
+    parser.add_argument("--betting", help="JSON betting config the strategy was trained on")
+    args = parser.parse_args()
+
+    if args.opponent == 'random':
+        opponent = RandomOpponent(args.seed)
+    elif args.opponent == 'naive':
+        opponent = NaiveOpponent()
+    else:
+        player = (RegretPlayer(None, args.opponent) if args.opponent.endswith('.reg')
+                  else CFRPlayer(None, args.opponent))
+        abstraction = CardAbstraction(args.abstraction) if args.abstraction else None
+        betting = ActionTree(BettingConfig.load(args.betting)) if args.betting else None
+        opponent = StrategyOpponent(player, abstraction, betting, args.seed)
+    server = MockSlumbot(opponent, args.latency, args.jitter, args.seed)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"{server.hands} hands, {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Range-vs-range counterfactual regret minimization over the public tree of
+a heads-up, no-limit Texas Hold'em subgame
+
+Where HeadsUpNLCFR samples one deal per tree walk, this engine walks the
+public tree, the betting and board cards both players see, once per player
+per iteration. Each node carries a vector over all 1326 hole-card
+combinations: the reach probabilities of both players on the way down and
+the traverser's counterfactual values on the way up. Regret matching,
+regret updates and average strategy updates are NumPy operations over
+every combination at once, so an iteration updates every information set
+of the subgame. Terminal values come from util.ranges, and hands all in
+before the river are valued by the exact equity matrix of their board (the
+sampled preflop table for preflop all ins).
+
+The tree is built once from a starting HUNLState and board. Its chance
+nodes enumerate every card dealt, so subgames starting on the turn or
+river solve quickly, while flop subgames hold a copy of the turn and river
+tree per runout. Raises per street are capped by max_raises to keep the
+tree finite.
+
+Updates follow vanilla CFR, CFR+ (Tammelin, 2014) or discounted CFR (Brown
+and Sandholm, 2019).
+"""
+import math
+from itertools import combinations
+
+import numpy as np
+
+from util.actions import Action
+from util.cards import N_CARDS
+from util.equity import AllInEquity, N_COMBOS, equity_matrix
+from util.games import BIG_BLIND, HUNLState
+from util.ranges import Showdown, disjoint_combos, live_combos, opposed_reach
+
+VARIANTS = ('cfr', 'cfr+', 'dcfr')
+
+_DECISION, _FOLD, _SHOWDOWN, _CHANCE = range(4)
+_BOARD_COUNTS = (0, 3, 4, 5)
+_BOARD_SIZE = 5
+_HOLE_CARDS = 2
+_RAISES = (Action.ALL_IN, Action.BET_MIN, Action.BET_HALF, Action.BET_FULL)
+
+
+class _Node:
+    """Private helper class for a node of the public tree
+
+    Decision nodes hold (n_actions, N_COMBOS) regrets and average strategy
+    weights of the acting player. Fold nodes hold both players' payoffs,
+    showdown nodes the chips each player has committed, and chance nodes
+    the cards of each child and the normalizer of their values.
+    """
+
+    __slots__ = ('kind', 'player', 'actions', 'children', 'board', 'live', 'amount', 'showdown',
+                 'deals', 'regrets', 'average')
+
+    def __init__(self, kind: int, board: tuple[int, ...]) -> None:
+        self.kind = kind
+        self.board = board
+        self.live = None
+        self.player = None
+        self.actions = ()
+        self.children = []
+        self.amount = None
+        self.showdown = None
+        self.deals = ()
+        self.regrets = None
+        self.average = None
+
+
+class PublicTreeCFR:
+    """Solves a subgame for the strategies of both players' ranges"""
+
+    def __init__(self,
+                 state: HUNLState,
+                 board: tuple[int, ...],
+                 ranges: tuple[np.ndarray, np.ndarray] | None = None,
+                 variant: str = 'dcfr',
+                 max_raises: int = 2,
+                 equity: AllInEquity | None = None,
+                 alpha: float = 1.5,
+                 beta: float = 0.0,
+                 gamma: float = 2.0) -> None:
+        """Build the public tree of a subgame
+
+        Args:
+            state (HUNLState): the betting state at the root of the subgame;
+                        its own cards are ignored
+            board (tuple[int, ...]): the board cards visible at the root
+            ranges (tuple[np.ndarray, np.ndarray] | None): (N_COMBOS,)
+                        probabilities of each player holding each
+                        combination at the root, indexed by seat; uniform if
+                        None
+            variant (str): 'cfr', 'cfr+' or 'dcfr'
+            max_raises (int): bets and raises allowed per street
+            equity (AllInEquity | None): preflop equity tables, required if
+                        a player can be all in before the flop
+            alpha (float): DCFR discount exponent of positive regrets
+            beta (float): DCFR discount exponent of negative regrets
+            gamma (float): DCFR discount exponent of the average strategy
+        """
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown CFR variant {variant!r}.")
+        if len(board) != _BOARD_COUNTS[state.street]:
+            raise ValueError(f"Street {state.street} needs {_BOARD_COUNTS[state.street]} "
+                             f"board cards, got {len(board)}.")
+        self.iterations = 0
+        self._variant = variant
+        self._max_raises = max_raises
+        self._equity = equity
+        self._alpha, self._beta, self._gamma = alpha, beta, gamma
+        self._board = tuple(board)
+        live = live_combos(self._board)
+        if ranges is None:
+            ranges = (np.ones(N_COMBOS), np.ones(N_COMBOS))
+        self._ranges = tuple(np.asarray(weights, dtype=np.float64) * live for weights in ranges)
+
+        self._showdowns = {}
+        self._lives = {}
+        self._equity_margins = {}
+        self._disjoint = None
+        self.n_nodes = 0
+        self._root = self._build(state, self._board, 0)
+
+    def train(self, iterations: int) -> None:
+        """Run CFR iterations, updating each player once per iteration"""
+        for _ in range(iterations):
+            self.iterations += 1
+            for traverser in (0, 1):
+                self._cfr(self._root, traverser,
+                          self._ranges[traverser], self._ranges[1 - traverser])
+
+    def average_strategy(self, path: tuple = ()) -> dict[Action, np.ndarray]:
+        """The average strategy at a decision node
+
+        Args:
+            path (tuple): the actions, and at chance nodes the tuple of
+                        cards dealt, leading from the root to the node
+
+        Returns:
+            dict[Action, np.ndarray]: (N_COMBOS,) probability of each
+                        combination taking each action
+        """
+        node = self._root
+        for step in path:
+            if node.kind == _CHANCE:
+                node = node.children[node.deals.index(tuple(step))]
+            else:
+                node = node.children[node.actions.index(step)]
+        if node.kind != _DECISION:
+            raise ValueError("The path does not lead to a decision node.")
+        return dict(zip(node.actions, _normalized(node.average)))
+
+    def exploitability(self) -> float:
+        """Mean winnings of a best response to the average strategy over both
+        players, in milli big blinds per hand of the subgame"""
+        total = 0.0
+        for player in (0, 1):
+            mine, theirs = self._ranges[player], self._ranges[1 - player]
+            values = self._best_response(self._root, player, theirs)
+            total += float(mine @ values) / float(mine @ opposed_reach(self._board, theirs))
+        return 1000 * total / 2 / BIG_BLIND
+
+    def _build(self, state: HUNLState, board: tuple[int, ...], raises: int) -> _Node:
+        """Private helper method to build the subtree of a decision node"""
+        self.n_nodes += 1
+        node = _Node(_DECISION, board)
+        node.live = self._live(board)
+        node.player = state.actor_index
+        node.actions = tuple(action for action in state.legal_actions()
+                             if action not in _RAISES or raises < self._max_raises)
+        street = state.street
+        for action in node.actions:
+            actor = state.actor_index
+            # only a call can close the action, matching the bets at this amount
+            called = state.pot + 2 * min(state.bets[1 - actor],
+                                         state.bets[actor] + state.stacks[actor])
+            state.push(action)
+            if state.status and state.street == street:
+                child = self._build(state, board, raises + (action in _RAISES))
+            elif state.status:
+                child = self._chance(state, board)
+            elif state.folder_index is not None:
+                child = _Node(_FOLD, board)
+                child.live = self._live(board)
+                child.amount = state.payoffs
+            else:
+                child = self._showdown(board, called / 2)
+            state.pop()
+            node.children.append(child)
+        node.regrets = np.zeros((len(node.actions), N_COMBOS))
+        node.average = np.zeros((len(node.actions), N_COMBOS))
+        return node
+
+    def _chance(self, state: HUNLState, board: tuple[int, ...]) -> _Node:
+        """Private helper method to build a chance node dealing the next street"""
+        self.n_nodes += 1
+        node = _Node(_CHANCE, board)
+        deck = [card for card in range(N_CARDS) if card not in board]
+        count = _BOARD_COUNTS[state.street] - len(board)
+        node.deals = list(combinations(deck, count))
+        # each pair of hands off the board sees comb(n - 4, count) of the deals
+        node.amount = 1 / math.comb(len(deck) - 2 * _HOLE_CARDS, count)
+        node.children = [self._build(state, board + deal, 0) for deal in node.deals]
+        return node
+
+    def _showdown(self, board: tuple[int, ...], committed: float) -> _Node:
+        """Private helper method to build a showdown node"""
+        self.n_nodes += 1
+        node = _Node(_SHOWDOWN, board)
+        node.amount = committed
+        if len(board) == _BOARD_SIZE:
+            if board not in self._showdowns:
+                self._showdowns[board] = Showdown(board)
+            node.showdown = self._showdowns[board]
+        elif board not in self._equity_margins:
+            self._equity_margins[board] = self._all_in_margins(board)
+        return node
+
+    def _live(self, board: tuple[int, ...]) -> np.ndarray:
+        """Private helper method for the combinations live on a board, shared
+        by the nodes of the board"""
+        if board not in self._lives:
+            self._lives[board] = live_combos(board)
+        return self._lives[board]
+
+    def _all_in_margins(self, board: tuple[int, ...]) -> np.ndarray:
+        """Private helper method for the expected showdown margin of every pair
+        of combinations all in on a board"""
+        if board:
+            equity = equity_matrix(board)
+        elif self._equity is not None:
+            equity = self._equity.combo_equity
+        else:
+            raise ValueError("Preflop all ins need the preflop equity tables.")
+        if self._disjoint is None:
+            self._disjoint = disjoint_combos()
+        live = live_combos(board)
+        valid = self._disjoint & live[:, None] & live[None, :]
+        return np.where(valid, 2 * np.asarray(equity) - 1, 0).astype(np.float32)
+
+    def _terminal(self, node: _Node, player: int, reach: np.ndarray) -> np.ndarray:
+        """Private helper method for a player's values of a terminal node"""
+        if node.kind == _FOLD:
+            return node.amount[player] * opposed_reach(node.board, reach, node.live)
+        if node.showdown is not None:
+            return node.amount * node.showdown.margins(reach)
+        margins = self._equity_margins[node.board] @ reach.astype(np.float32)
+        return node.amount * margins.astype(np.float64)
+
+    def _cfr(self,
+             node: _Node,
+             traverser: int,
+             reach: np.ndarray,
+             opponent_reach: np.ndarray) -> np.ndarray:
+        """Private helper method to update the traverser's regrets below a node
+
+        Returns:
+            np.ndarray: (N_COMBOS,) counterfactual values of the node to the
+                        traverser
+        """
+        if node.kind in (_FOLD, _SHOWDOWN):
+            return self._terminal(node, traverser, opponent_reach)
+        if node.kind == _CHANCE:
+            values = np.zeros(N_COMBOS)
+            for child in node.children:
+                values += self._cfr(child, traverser,
+                                    reach * child.live, opponent_reach * child.live)
+            return values * node.amount
+
+        strategy = _normalized(node.regrets)
+        if node.player != traverser:
+            values = np.zeros(N_COMBOS)
+            for row, child in enumerate(node.children):
+                values += self._cfr(child, traverser, reach, opponent_reach * strategy[row])
+            return values
+
+        child_values = np.array([self._cfr(child, traverser, reach, opponent_reach)
+                                 for child in node.children])
+        values = (strategy * child_values).sum(axis=0)
+        self._update(node, child_values - values, reach * strategy)
+        return values
+
+    def _update(self, node: _Node, regrets: np.ndarray, weights: np.ndarray) -> None:
+        """Private helper method to accumulate an iteration's instantaneous
+        regrets and reach-weighted strategy at a decision node"""
+        t = self.iterations
+        if self._variant == 'cfr':
+            node.regrets += regrets
+            node.average += weights
+        elif self._variant == 'cfr+':
+            np.maximum(node.regrets + regrets, 0, out=node.regrets)
+            # linear averaging
+            node.average += t * weights
+        else:
+            node.regrets += regrets
+            positive = t ** self._alpha / (t ** self._alpha + 1)
+            negative = t ** self._beta / (t ** self._beta + 1)
+            node.regrets *= np.where(node.regrets > 0, positive, negative)
+            node.average *= (t / (t + 1)) ** self._gamma
+            node.average += weights
+
+    def _best_response(self, node: _Node, player: int, opponent_reach: np.ndarray) -> np.ndarray:
+        """Private helper method for a best response's values of a node against
+        the opponent's average strategy"""
+        if node.kind in (_FOLD, _SHOWDOWN):
+            return self._terminal(node, player, opponent_reach)
+        if node.kind == _CHANCE:
+            values = np.zeros(N_COMBOS)
+            for child in node.children:
+                values += self._best_response(child, player, opponent_reach * child.live)
+            return values * node.amount
+        if node.player == player:
+            return np.max([self._best_response(child, player, opponent_reach)
+                           for child in node.children], axis=0)
+
+        strategy = _normalized(node.average)
+        values = np.zeros(N_COMBOS)
+        for row, child in enumerate(node.children):
+            values += self._best_response(child, player, opponent_reach * strategy[row])
+        return values
+
+
+def _normalized(weights: np.ndarray) -> np.ndarray:
+    """Private helper for the strategy proportional to the positive weights of
+    each column, uniform where no weight is positive"""
+    positive = np.maximum(weights, 0)
+    totals = positive.sum(axis=0)
+    return np.where(totals > 0,
+                    positive / np.where(totals > 0, totals, 1),
+                    1 / len(weights))
+
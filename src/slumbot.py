@@ -0,0 +1,271 @@
+"""Asynchronous client playing a compiled policy against Slumbot
+
+A hand against Slumbot is a sequence of HTTP round trips, one per decision,
+so a client playing one hand at a time spends nearly all of its time
+waiting on the network. This client plays many independent sessions
+concurrently on one asyncio event loop instead. Sessions share a pool of
+HTTP/1.1 keep-alive connections (util.json_http), so that each request
+skips the TCP and TLS handshakes. Decisions take microseconds and are made
+inline on the loop, or are sent to a shared strategy server, which
+batches the decisions of all sessions.
+
+Slumbot's protocol describes a hand by an action string, e.g.
+"b200c/kb300c/kk/kk": k checks, c calls, f folds and bN bets or raises to N
+chips on the street, and / ends a street. The client is seat 0 (the big
+blind) if client_pos is 0. Each session replays the moves it has not seen
+onto an AbstractHand, which translates the opponent's bet sizes onto the
+policy's abstraction and scales the policy's bets back to real chips.
+
+Every finished hand is appended to a JSON lines log as it completes. A
+hand the server rejects or loses the connection in is abandoned and not
+counted, and its session starts over with a new hand; a session gives up
+after a number of consecutive failures.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from evaluation import EvaluationResult
+from strategy_server import AsyncStrategyClient
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.betting import ActionTree, BettingConfig
+from util.cards import parse_card
+from util.json_http import ConnectionPool
+from util.players import CFRPlayer, Player
+from util.translation import AbstractHand, ActionTranslator
+
+DEFAULT_URL = "https://slumbot.com"
+DEFAULT_MAX_FAILURES = 3
+# a bet or raise in a parsed action string, sized by its raise to amount
+RAISE = Action.BET_MIN
+
+_MOVES = {'k': Action.CHECK_CALL, 'c': Action.CHECK_CALL, 'f': Action.FOLD}
+
+
+def parse_action(action: str) -> list[tuple[Action, int]]:
+    """Split a Slumbot action string into moves
+
+    Street separators are dropped, since the game state knows when a
+    street ends.
+
+    Returns:
+        list[tuple[Action, int]]: (FOLD or CHECK_CALL, 0), or (RAISE, the
+                    street bet raised to) for each move
+    """
+    moves = []
+    index = 0
+    while index < len(action):
+        code = action[index]
+        index += 1
+        if code == 'b':
+            start = index
+            while index < len(action) and action[index].isdigit():
+                index += 1
+            moves.append((RAISE, int(action[start:index])))
+        elif code in _MOVES:
+            moves.append((_MOVES[code], 0))
+        elif code != '/':
+            raise ValueError(f"Unknown move {code!r} in action {action!r}.")
+    return moves
+
+
+def format_action(action: Action, raise_to: int, facing_bet: bool) -> str:
+    """Write a move in Slumbot's notation
+
+    Args:
+        action (Action): the move
+        raise_to (int): the street bet of a bet or raise
+        facing_bet (bool): whether the mover faces a bet, making
+                    CHECK_CALL a call rather than a check
+    """
+    if action == Action.FOLD:
+        return 'f'
+    if action == Action.CHECK_CALL:
+        return 'c' if facing_bet else 'k'
+    return f'b{raise_to}'
+
+
+class SlumbotClient:
+    """Plays a player against Slumbot in concurrent sessions"""
+
+    def __init__(self,
+                 player: Player | None,
+                 url: str = DEFAULT_URL,
+                 connections: int = 32,
+                 abstraction: CardAbstraction | None = None,
+                 betting: ActionTree | None = None,
+                 translator: ActionTranslator | None = None,
+                 username: str | None = None,
+                 password: str | None = None,
+                 strategy: AsyncStrategyClient | None = None,
+                 max_failures: int = DEFAULT_MAX_FAILURES) -> None:
+        """Create a client
+
+        Args:
+            player (Player | None): the player; shared by all sessions
+            url (str): base URL of the Slumbot API server
+            connections (int): size of the connection pool
+            abstraction (CardAbstraction | None): card abstraction of the
+                        player's information sets
+            betting (ActionTree | None): betting abstraction the player was
+                        trained on
+            translator (ActionTranslator | None): maps Slumbot's bets onto
+                        the abstraction; a new one if None
+            username (str | None): Slumbot account to log each session into,
+                        if any; sessions are anonymous otherwise
+            password (str | None): the account's password
+            strategy (AsyncStrategyClient | None): strategy server to 
+                        decide through instead of the player
+            max_failures (int): failed hands in a row after which a
+                        session raises the last error
+        """
+        self._player = player
+        self._url = url
+        self._connections = connections
+        self._abstraction = abstraction
+        self._betting = betting
+        self._translator = translator if translator is not None else ActionTranslator()
+        self._login = None if username is None else {'username': username, 'password': password}
+        self._strategy = strategy
+        self._max_failures = max_failures
+
+    async def play(self, hands: int, sessions: int, log_file: str) -> EvaluationResult:
+        """Play hands against Slumbot
+
+        Args:
+            hands (int): number of hands to play
+            sessions (int): number of hands played concurrently
+            log_file (str): JSON lines file every finished hand is appended to
+
+        Returns:
+            EvaluationResult: the player's winnings in mbb/hand
+        """
+        pool = ConnectionPool(self._url, self._connections)
+        # hands claimed by the sessions and hands finished, then the
+        # finished hands' total and squared winnings
+        totals = [0, 0, 0.0, 0.0]
+        try:
+            with open(log_file, 'a', encoding='utf-8') as log:
+                await asyncio.gather(*(self._session(pool, hands, totals, log)
+                                       for _ in range(sessions)))
+        finally:
+            await pool.close()
+        return EvaluationResult(max(totals[1], 1), totals[2], totals[3])
+
+    async def _session(self, pool: ConnectionPool, hands: int, totals: list, log) -> None:
+        """Private helper method to play hands one after another in one
+        session until hands have been started across all sessions"""
+        token = None
+        failures = 0
+        while totals[0] < hands:
+            totals[0] += 1
+            start = time.perf_counter()
+            try:
+                if token is None and self._login is not None:
+                    token = (await pool.post('/api/login', self._login))['token']
+                token, response, thinking = await self._play_hand(pool, token)
+            except (RuntimeError, ConnectionError, asyncio.IncompleteReadError) as error:
+                # give the hand back, and start over in a new session, since
+                # the server may have dropped this one
+                totals[0] -= 1
+                token = None
+                failures += 1
+                if failures >= self._max_failures:
+                    raise
+                print(f"Abandoned a hand: {error!r}", file=sys.stderr)
+                continue
+            failures = 0
+            totals[1] += 1
+            winnings = response['winnings']
+            totals[2] += winnings
+            totals[3] += winnings * winnings
+            log.write(json.dumps({'hand': totals[1],
+                                  'client_pos': response['client_pos'],
+                                  'hole_cards': response['hole_cards'],
+                                  'bot_hole_cards': response.get('bot_hole_cards'),
+                                  'board': response['board'],
+                                  'action': response['action'],
+                                  'winnings': winnings,
+                                  'seconds': round(time.perf_counter() - start, 6),
+                                  'decision_seconds': round(thinking, 6)}) + '\n')
+            log.flush()
+
+    async def _play_hand(self,
+                         pool: ConnectionPool,
+                         token: str | None) -> tuple[str, dict, float]:
+        """Private helper method to play a hand
+
+        Returns:
+            tuple[str, dict, float]: the session token, the final response
+                        and the seconds spent deciding
+        """
+        response = await pool.post('/api/new_hand', {} if token is None else {'token': token})
+        token = response.get('token', token)
+        seat = response['client_pos']
+        hand = AbstractHand(seat,
+                            tuple(parse_card(card) for card in response['hole_cards']),
+                            self._player,
+                            self._translator,
+                            self._abstraction,
+                            self._betting)
+        played = 0
+        thinking = 0.0
+        while True:
+            moves = parse_action(response['action'])
+            for action, raise_to in moves[played:]:
+                hand.observe(action, raise_to)
+            played = len(moves)
+            if 'winnings' in response:
+                return token, response, thinking
+
+            start = time.perf_counter()
+            hand.reveal_board(tuple(parse_card(card) for card in response['board']))
+            real = hand.real
+            facing_bet = real.bets[1 - seat] > real.bets[seat]
+            decided = None
+            if self._strategy is not None and (info := hand.infoset()) is not None:
+                decided = (await self._strategy.sample([info.key]))[0] or Action.CHECK_CALL
+            action, raise_to = hand.act(decided)
+            thinking += time.perf_counter() - start
+            played += 1
+            response = await pool.post('/api/act', {'token': token,
+                                                    'incr': format_action(action, raise_to,
+                                                                          facing_bet)})
+            token = response.get('token', token)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play a compiled policy against Slumbot.")
+    parser.add_argument("hands", type=int)
+    parser.add_argument("--policy", help="policy file written by save_policy_to_file")
+    parser.add_argument("--strategy-url", help="strategy server to decide through instead")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--sessions", type=int, default=64,
+                        help="number of hands played concurrently")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--log", default="slumbot.jsonl", help="JSON lines log of every hand")
+    parser.add_argument("--abstraction", help="directory of the card abstraction tables")
+    parser.add_argument("--betting", help="JSON betting config the policy was trained on")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    if (args.policy is None) == (args.strategy_url is None):
+        parser.error("give one of --policy and --strategy-url")
+
+    abstraction = CardAbstraction(args.abstraction) if args.abstraction else None
+    betting = ActionTree(BettingConfig.load(args.betting)) if args.betting else None
+    player = CFRPlayer(None, args.policy) if args.policy else None
+    strategy = AsyncStrategyClient(args.strategy_url) if args.strategy_url else None
+    client = SlumbotClient(player, args.url, args.connections, abstraction, betting,
+                           username=args.username, password=args.password, strategy=strategy)
+    start = time.perf_counter()
+    result = asyncio.run(client.play(args.hands, args.sessions, args.log))
+    print(result)
+    print(f"{result.hands / (time.perf_counter() - start):.1f} hands/sec")
+
+
+if __name__ == "__main__":
+    main()
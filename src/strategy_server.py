@@ -0,0 +1,272 @@
+"""Long-lived process serving a compiled policy's decisions to many clients
+
+Loading a policy per player, per evaluation worker and per match client
+repeats the same work and keeps a copy of the hot blocks in every process.
+The strategy server loads the policy once and answers decisions over
+HTTP/1.1 keep-alive (util.json_http):
+
+    POST /decide {"keys": [...], "distributions": false}
+
+takes a batch of packed InfoSet keys, or of "infosets" given by their
+fields [pot, hole_cards, am_opening, my_bet, opponent_bet, street,
+bucket] as pack_key() takes them, and returns {"actions": [...]} with one
+sampled Action value per information set, or with "distributions": true
+{"distributions": [...]} with each one's action probabilities indexed by
+Action.value. Information sets the policy never reached are null, and
+players check or call there as CFRPlayer does. POST /stats returns the
+request, batch and decision counts.
+
+Concurrent requests are micro-batched: the first request to arrive opens a
+batch that collects every request arriving until the event loop has
+handled the connections that are ready, or for window seconds if a window
+is set (or until max_batch decisions are waiting), and the batch is looked
+up and sampled with a single vectorized PolicyTable.distributions() call.
+Under load, many requests are ready at once, so lookups are amortized over
+many clients without waiting; a window trades latency for larger batches.
+
+StrategyClient and AsyncStrategyClient call the server from blocking and
+asyncio code, and RemotePlayer plays through it wherever a Player is
+expected, e.g. in evaluation workers.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import urllib.parse
+
+import numpy as np
+
+from util.actions import Action
+from util.blocks import DEFAULT_CACHE_BYTES
+from util.infosets import InfoSet, pack_key
+from util.json_http import ConnectionPool, json_connection
+from util.players import Player
+from util.strategies import PolicyTable
+
+DEFAULT_PORT = 8100
+DEFAULT_WINDOW = 0.0
+DEFAULT_MAX_BATCH = 4096
+
+_ACTIONS = tuple(Action)
+
+
+class StrategyServer:
+    """Answers batched decision requests from one resident policy"""
+
+    def __init__(self,
+                 policy: PolicyTable,
+                 window: float = DEFAULT_WINDOW,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 seed: int | None = None) -> None:
+        """Create a server
+
+        Args:
+            policy (PolicyTable): the policy to serve
+            window (float): seconds a batch waits for more requests; zero
+                        to answer once the ready connections are read
+            max_batch (int): decisions at which a batch is answered without
+                        waiting out the window
+            seed (int | None): seed of the action sampling
+        """
+        self._policy = policy
+        self._window = window
+        self._max_batch = max_batch
+        self._random = np.random.default_rng(seed)
+        self._pending = []
+        self._pending_count = 0
+        self._timer = None
+        self.requests = 0
+        self.batches = 0
+        self.decisions = 0
+
+    async def serve(self, host: str, port: int) -> None:
+        """Serve requests until cancelled"""
+        server = await asyncio.start_server(json_connection(self.handle), host, port,
+                                            backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, path: str, request: dict) -> dict:
+        """Answer a request to an API endpoint"""
+        if path == '/stats':
+            return {'requests': self.requests, 'batches': self.batches,
+                    'decisions': self.decisions}
+        if path != '/decide':
+            return {'error_msg': f"Unknown endpoint {path}."}
+        try:
+            if 'infosets' in request:
+                keys = np.array([pack_key(pot, tuple(hole_cards), am_opening, my_bet,
+                                          opponent_bet, street, bucket)
+                                 for pot, hole_cards, am_opening, my_bet, opponent_bet,
+                                 street, bucket in request['infosets']], dtype=np.uint64)
+            else:
+                keys = np.array(request['keys'], dtype=np.uint64)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return {'error_msg': "Expected keys or infosets."}
+
+        self.requests += 1
+        probabilities, actions, found = await self.decide(keys)
+        if request.get('distributions'):
+            return {'distributions': [row if seen else None for row, seen in
+                                      zip(probabilities.tolist(), found.tolist())]}
+        return {'actions': [action if seen else None for action, seen in
+                            zip(actions.tolist(), found.tolist())]}
+
+    async def decide(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decide at information sets in the next batch
+
+        Args:
+            keys (np.ndarray): packed InfoSet keys
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: the (batch,
+                        n_actions) action probabilities, a sampled
+                        Action.value per key, and whether each key was seen
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((keys, future))
+        self._pending_count += len(keys)
+        if self._pending_count >= self._max_batch:
+            self._flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = (loop.call_later(self._window, self._flush) if self._window > 0
+                           else loop.call_soon(self._flush))
+        return await future
+
+    def _flush(self) -> None:
+        """Private helper method to answer every waiting request at once"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = self._pending
+        self._pending = []
+        self._pending_count = 0
+        if not pending:
+            return
+
+        keys = np.concatenate([keys for keys, _ in pending])
+        probabilities, found = self._policy.distributions(keys)
+        # sample every row at once by inverting its cumulative distribution
+        cumulative = np.cumsum(probabilities, axis=1)
+        draws = self._random.random(len(keys)) * cumulative[:, -1]
+        actions = np.minimum((cumulative <= draws[:, None]).sum(axis=1), len(_ACTIONS) - 1)
+        self.batches += 1
+        self.decisions += len(keys)
+
+        start = 0
+        for request_keys, future in pending:
+            end = start + len(request_keys)
+            if not future.done():
+                future.set_result((probabilities[start:end], actions[start:end],
+                                   found[start:end]))
+            start = end
+
+
+class StrategyClient:
+    """Blocking client of a strategy server over one keep-alive connection"""
+
+    def __init__(self, url: str) -> None:
+        """Connect to a server at a URL like http://127.0.0.1:8100"""
+        parsed = urllib.parse.urlsplit(url)
+        self._connection = http.client.HTTPConnection(parsed.hostname,
+                                                      parsed.port or DEFAULT_PORT)
+
+    def sample(self, keys: list[int]) -> list[Action | None]:
+        """Sample an action at each information set, None where unseen"""
+        return [None if value is None else _ACTIONS[value]
+                for value in self._post({'keys': keys})['actions']]
+
+    def distributions(self, keys: list[int]) -> list[dict[Action, float] | None]:
+        """Get the action probabilities at each information set, None where
+        unseen"""
+        return [None if row is None else {action: row[action.value] for action in _ACTIONS
+                                          if row[action.value] > 0}
+                for row in self._post({'keys': keys, 'distributions': True})['distributions']]
+
+    def close(self) -> None:
+        """Close the connection"""
+        self._connection.close()
+
+    def _post(self, payload: dict) -> dict:
+        """Private helper method to send a request, reconnecting once if the
+        server closed the idle connection"""
+        body = json.dumps(payload)
+        headers = {'Content-Type': 'application/json'}
+        try:
+            self._connection.request('POST', '/decide', body, headers)
+            response = self._connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            self._connection.close()
+            self._connection.request('POST', '/decide', body, headers)
+            response = self._connection.getresponse()
+        result = json.loads(response.read())
+        if 'error_msg' in result:
+            raise RuntimeError(f"Strategy server error: {result['error_msg']}")
+        return result
+
+
+class AsyncStrategyClient:
+    """asyncio client of a strategy server over pooled connections"""
+
+    def __init__(self, url: str, connections: int = 8) -> None:
+        """Create a client of a server at a URL like http://127.0.0.1:8100"""
+        self._pool = ConnectionPool(url, connections)
+
+    async def sample(self, keys: list[int]) -> list[Action | None]:
+        """Sample an action at each information set, None where unseen"""
+        response = await self._pool.post('/decide', {'keys': keys})
+        return [None if value is None else _ACTIONS[value] for value in response['actions']]
+
+    async def close(self) -> None:
+        """Close the connections"""
+        await self._pool.close()
+
+
+class RemotePlayer(Player):
+    """Plays the policy of a strategy server"""
+
+    def __init__(self, game_state, url: str) -> None:
+        """Connect to a strategy server
+
+        Args:
+            game_state (State): the game being played
+            url (str): the server's URL, like http://127.0.0.1:8100
+        """
+        self._client = StrategyClient(url)
+
+    def get_action(self, info: InfoSet) -> Action:
+        """Sample an action from the served policy, checking or calling at
+        information sets that were never reached during training"""
+        action = self._client.sample([info.key])[0]
+        return action if action is not None else Action.CHECK_CALL
+
+    def handle_round_over(self, game_state, my_index: int) -> None:
+        return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a compiled policy's decisions.")
+    parser.add_argument("policy", help="policy file written by save_policy_to_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW,
+                        help="seconds a batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--cache-bytes", type=int, default=DEFAULT_CACHE_BYTES,
+                        help="memory budget of the policy's decompressed blocks")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = StrategyServer(PolicyTable(args.policy, cache_bytes=args.cache_bytes),
+                            args.window, args.max_batch, args.seed)
+    print(f"Serving {args.policy} on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print(f"{server.decisions} decisions in {server.requests} requests, "
+              f"{server.batches} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Card abstraction: buckets of (hole cards, board) by expected hand strength
+
+Hands are compared by EHS², the expectation over the remaining board cards
+of the squared river hand strength against a uniformly random opponent
+hand. Squaring rewards hands whose strength varies across runouts (draws)
+over hands of the same average strength. Each street's hands are split
+into equally weighted percentile buckets of EHS².
+
+Bucket assignments are computed once per suit-isomorphic hand class by
+build_bucket_tables() and saved as .npy lookup tables indexed by the
+class's util.hand_indexer index. The tables are memory mapped at play
+time, so a lookup is one array read.
+"""
+import multiprocessing
+import os
+import random
+from itertools import combinations
+from math import comb
+
+import numpy as np
+from util.cards import N_CARDS
+from util.evaluator import evaluate, evaluate_many
+from util.hand_indexer import HandIndexer, street_indexers
+
+PREFLOP, FLOP, TURN, RIVER = range(4)
+BOARD_COUNTS = (0, 3, 4, 5)
+# buckets 0 to MAX_BUCKETS - 1 are packed plus one into the 12 bit hole cards 
+# field of InfoSet keys (util.infosets), leaving the top key bit clear
+MAX_BUCKETS = 4095
+
+# boards valued per task when building the tables in parallel
+_BOARDS_PER_CHUNK = 64
+# above every hand value, so that rows of values can be searched as one array
+_ROW_OFFSET = 1 << 40
+_STREET_INDEXERS = []
+
+
+def hand_strength(hole_cards: tuple[int, ...], board: tuple[int, ...]) -> float:
+    """Probability of beating a uniformly random opponent hand on the river,
+    counting ties as half"""
+    dead = set(hole_cards) | set(board)
+    mine = evaluate(tuple(hole_cards) + tuple(board))
+    opponents = np.array(list(combinations([card for card in range(N_CARDS) if card not in dead], 2)))
+    theirs = evaluate_many(np.hstack((opponents, np.tile(board, (len(opponents), 1)))))
+    return float(((mine > theirs) + 0.5 * (mine == theirs)).mean())
+
+
+def expected_hand_strength_squared(hole_cards: tuple[int, ...],
+                                   board: tuple[int, ...],
+                                   samples: int,
+                                   rng: random.Random) -> float:
+    """Monte Carlo estimate of EHS² over sampled completions of the board
+
+    Args:
+        hole_cards (tuple[int, ...]): the player's hole cards
+        board (tuple[int, ...]): the visible board cards
+        samples (int): number of runouts to sample (exact on the river)
+        rng (random.Random): source of the sampled runouts
+
+    Returns:
+        float: the mean squared river hand strength
+    """
+    missing = BOARD_COUNTS[RIVER] - len(board)
+    if missing == 0:
+        return hand_strength(hole_cards, board) ** 2
+
+    dead = set(hole_cards) | set(board)
+    deck = [card for card in range(N_CARDS) if card not in dead]
+    total = 0.0
+    for _ in range(samples):
+        runout = tuple(board) + tuple(rng.sample(deck, missing))
+        total += hand_strength(hole_cards, runout) ** 2
+    return total / samples
+
+
+def build_bucket_tables(directory: str,
+                        n_buckets: tuple[int, int, int, int],
+                        samples: int,
+                        seed: int = 0,
+                        workers: int = 1) -> None:
+    """Compute and save the bucket lookup table of every street
+
+    Hands are valued a board at a time: every hole card pair on one
+    suit-isomorphic board is evaluated in one batch per runout, and the
+    boards are split among worker processes. On one core, the river table
+    takes about ten minutes and the turn table about fifteen. The flop
+    table takes about two minutes per 100 samples, up to half an hour or
+    so for exact values (samples >= 1176), and the preflop table seconds.
+    Building needs about 2 GB of memory for the river. The tables take 2
+    bytes per isomorphic hand, about 280 MB in all; build them once and
+    point every CardAbstraction at the same directory.
+
+    Args:
+        directory (str): where to write the tables; CardAbstraction
+                    loads them from there
+        n_buckets (tuple[int, int, int, int]): bucket count per street
+        samples (int): runouts per board for the EHS² estimate; every
+                    runout is used when there are no more than this many
+        seed (int): seed of the runout sampling
+        workers (int): number of processes valuing boards in parallel
+    """
+    os.makedirs(directory, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(len(BOARD_COUNTS))
+    for street, (indexer, buckets) in enumerate(zip(street_indexers(), n_buckets)):
+        boards, multiplicities = _canonical_boards(BOARD_COUNTS[street])
+        chunk_seeds = seeds[street].generate_state(-(-len(boards) // _BOARDS_PER_CHUNK))
+        chunks = [(street, boards[start:start + _BOARDS_PER_CHUNK],
+                   multiplicities[start:start + _BOARDS_PER_CHUNK], samples, int(chunk_seed))
+                  for start, chunk_seed in zip(range(0, len(boards), _BOARDS_PER_CHUNK),
+                                               chunk_seeds)]
+        strengths = np.empty(indexer.size)
+        weights = np.empty(indexer.size, dtype=np.int64)
+        if workers == 1:
+            results = map(_value_boards, chunks)
+        else:
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap_unordered(_value_boards, chunks)
+        try:
+            for indices, chunk_strengths, chunk_weights in results:
+                strengths[indices] = chunk_strengths
+                weights[indices] = chunk_weights
+        finally:
+            if workers != 1:
+                pool.terminate()
+        np.save(os.path.join(directory, f"buckets-{street}.npy"),
+                _percentile_buckets(strengths, weights, buckets))
+
+
+class CardAbstraction:
+    """Maps (hole cards, board) to a per-street bucket through precomputed
+    lookup tables"""
+
+    def __init__(self, directory: str) -> None:
+        """Memory-map the tables written by build_bucket_tables()"""
+        self._directory = directory
+        self._indexers = street_indexers()
+        self._buckets = [np.load(os.path.join(directory, f"buckets-{street}.npy"),
+                                 mmap_mode='r')
+                         for street in range(len(BOARD_COUNTS))]
+
+    def __getstate__(self) -> dict:
+        # processes receiving a copy map the same files instead of the tables
+        return {'directory': self._directory}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['directory'])
+
+    def bucket(self, street: int, hole_cards: tuple[int, ...], board: tuple[int, ...]) -> int:
+        """Return the bucket of a hand on the given street"""
+        index = self._indexers[street].index(hole_cards + board[:BOARD_COUNTS[street]])
+        return int(self._buckets[street][index])
+
+    def bucket_count(self, street: int) -> int:
+        """Return the number of buckets of a street"""
+        return int(self._buckets[street].max()) + 1
+
+    def bucket_many(self, street: int, hole_cards: np.ndarray, board: tuple[int, ...]) -> np.ndarray:
+        """Return the buckets of many hole cards on the same board
+
+        Args:
+            street (int): the street index
+            hole_cards (np.ndarray): (batch, 2) hole cards, none of which 
+                        may be on the board
+            board (tuple[int, ...]): the board, of which the street's cards 
+                        are used
+
+        Returns:
+            np.ndarray: (batch,) buckets
+        """
+        board = np.array(board[:BOARD_COUNTS[street]], dtype=np.int64)
+        cards = np.hstack((np.asarray(hole_cards, dtype=np.int64),
+                           np.tile(board, (len(hole_cards), 1))))
+        return np.asarray(self._buckets[street][self._indexers[street].index_many(cards)])
+
+
+def _canonical_boards(n_cards: int) -> tuple[np.ndarray, np.ndarray]:
+    """Private helper for a representative of every suit-isomorphic board of
+    n_cards cards, and the number of raw boards each one stands for"""
+    if n_cards == 0:
+        return np.zeros((1, 0), dtype=np.int64), np.ones(1, dtype=np.int64)
+    indexer = HandIndexer((n_cards,))
+    raw = np.array(list(combinations(range(N_CARDS), n_cards)), dtype=np.int64)
+    multiplicities = np.bincount(indexer.index_many(raw), minlength=indexer.size)
+    return indexer.unindex_many(np.arange(indexer.size)), multiplicities
+
+
+def _value_boards(chunk: tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Private helper to value every hand on a chunk of boards
+
+    Every hand of an isomorphism class lies on the same representative
+    board, with the raw hands of the class spread over the board's
+    isomorphs, so a class is complete within one chunk.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: the chunk's class
+                    indices, their EHS² and their numbers of raw hands
+    """
+    street, boards, multiplicities, samples, seed = chunk
+    rng = np.random.default_rng(seed)
+    hands, strengths, weights = [], [], []
+    for board, multiplicity in zip(boards, multiplicities):
+        deck = np.setdiff1d(np.arange(N_CARDS), board)
+        first, second = np.triu_indices(len(deck), 1)
+        hole_cards = np.column_stack((deck[first], deck[second]))
+        hands.append(np.hstack((hole_cards, np.tile(board, (len(hole_cards), 1)))))
+        strengths.append(_board_ehs2(board, hole_cards, deck, samples, rng))
+        weights.append(np.full(len(hole_cards), multiplicity, dtype=np.int64))
+
+    # average the (sampled) values of each class and count its raw hands
+    indices = _street_indexer(street).index_many(np.vstack(hands))
+    classes, inverse = np.unique(indices, return_inverse=True)
+    totals = np.bincount(inverse, np.concatenate(strengths), len(classes))
+    counts = np.bincount(inverse, minlength=len(classes))
+    class_weights = np.bincount(inverse, np.concatenate(weights), len(classes))
+    return classes, totals / counts, class_weights.astype(np.int64)
+
+
+def _street_indexer(street: int) -> HandIndexer:
+    """Private helper for a street's indexer, built once per process"""
+    if not _STREET_INDEXERS:
+        _STREET_INDEXERS.extend(street_indexers())
+    return _STREET_INDEXERS[street]
+
+
+def _board_ehs2(board: np.ndarray,
+                hole_cards: np.ndarray,
+                deck: np.ndarray,
+                samples: int,
+                rng: np.random.Generator) -> np.ndarray:
+    """Private helper for the EHS² of every hole card pair on a board
+
+    Args:
+        board (np.ndarray): the visible board cards
+        hole_cards (np.ndarray): (batch, 2) hole cards, off the board
+        deck (np.ndarray): the cards off the board
+        samples (int): runouts to sample, or all of them if no more
+        rng (np.random.Generator): source of the sampled runouts
+
+    Returns:
+        np.ndarray: (batch,) mean squared river hand strength over the 
+                    runouts that do not use either hole card
+    """
+    missing = BOARD_COUNTS[RIVER] - len(board)
+    if comb(len(deck), missing) <= samples:
+        runouts = combinations(deck.tolist(), missing)
+    else:
+        runouts = (rng.choice(deck, missing, replace=False) for _ in range(samples))
+    totals = np.zeros(len(hole_cards))
+    counts = np.zeros(len(hole_cards))
+    for runout in runouts:
+        strength = _river_strengths(np.concatenate((board, runout)).astype(np.int64))
+        values = strength[hole_cards[:, 0], hole_cards[:, 1]]
+        dealt = ~np.isnan(values)
+        totals[dealt] += values[dealt] ** 2
+        counts += dealt
+    return totals / np.maximum(counts, 1)
+
+
+def _river_strengths(board: np.ndarray) -> np.ndarray:
+    """Private helper for hand_strength() of every hole card pair on a river
+    board at once
+
+    Each pair's rank among all pairs off the board is corrected for the
+    opponent pairs that share one of its cards, read from the rows of a
+    (card, card) matrix of hand values.
+
+    Returns:
+        np.ndarray: (N_CARDS, N_CARDS) symmetric strengths, NaN for pairs 
+                    that are not hole cards off the board
+    """
+    deck = np.setdiff1d(np.arange(N_CARDS), board)
+    first, second = np.triu_indices(len(deck), 1)
+    values = evaluate_many(np.hstack((deck[first, None], deck[second, None],
+                                      np.tile(board, (len(first), 1))))).astype(np.int64)
+
+    # pairs beaten and tied among all pairs, then among those holding each
+    # of the pair's cards; a sentinel above every value fills the diagonal
+    ordered = np.sort(values)
+    below = np.searchsorted(ordered, values, 'left')
+    tied = np.searchsorted(ordered, values, 'right') - below
+    rows = np.full((len(deck), len(deck)), np.iinfo(np.int32).max, dtype=np.int64)
+    rows[first, second] = rows[second, first] = values
+    rows.sort(axis=1)
+    # offsetting row r by r * _ROW_OFFSET lets one search cover every row
+    flat = (rows + np.arange(len(deck))[:, None] * _ROW_OFFSET).ravel()
+    for card in (first, second):
+        offset = card * _ROW_OFFSET
+        row_below = np.searchsorted(flat, values + offset, 'left')
+        row_tied = np.searchsorted(flat, values + offset, 'right') - row_below
+        below -= row_below - card * len(deck)
+        tied -= row_tied
+    # the pair itself was counted once overall and removed with each card
+    tied += 1
+    opponents = comb(len(deck) - 2, 2)
+
+    strengths = np.full((N_CARDS, N_CARDS), np.nan)
+    strengths[deck[first], deck[second]] = strengths[deck[second], deck[first]] = (
+        (below + 0.5 * tied) / opponents)
+    return strengths
+
+
+def _percentile_buckets(strengths: np.ndarray, weights: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Private helper to split hands into buckets of (nearly) equal total
+    weight in order of strength"""
+    if not 0 < n_buckets <= MAX_BUCKETS:
+        raise ValueError(f"Bucket counts must be between 1 and {MAX_BUCKETS}.")
+    order = np.argsort(strengths, kind='stable')
+    weight_before = np.cumsum(weights[order]) - weights[order]
+    result = np.empty(len(strengths), dtype=np.uint16)
+    result[order] = weight_before * n_buckets // weights.sum()
+    return result
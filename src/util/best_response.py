@@ -0,0 +1,206 @@
+"""Best response and exploitability of compiled heads-up no-limit policies
+
+A best response is found by walking the public tree, the betting and board
+cards every player sees, once per seat. Instead of dealing hole cards, the
+walk carries a vector over all 1326 hole-card combinations: the opponent's
+probability of reaching the node with each combination on the way down,
+and the best responder's value of the node with each combination on the
+way up. The policy is looked up for all combinations of a node at once,
+the best responder takes the per-combination maximum over its actions, and
+terminal nodes are valued for all combinations at once by util.ranges.
+
+Exact enumeration of board cards is only practical for small subgames, so
+by default each chance node deals a fixed number of sampled boards. The
+estimate is then noisy, and decisions above sampled deals overestimate the
+best response slightly, as it maximizes over noisy values.
+"""
+import math
+import random
+from itertools import combinations
+
+import numpy as np
+
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.betting import ActionTree
+from util.cards import N_CARDS
+from util.equity import COMBOS, N_COMBOS
+from util.games import BIG_BLIND, CARDS_DEALT, HUNLState
+from util.infosets import pack_keys
+from util.ranges import Showdown, live_combos, opposed_reach
+from util.strategies import PolicyTable
+
+_BOARD_COUNTS = (0, 3, 4, 5)
+_BOARD_SIZE = 5
+_HOLE_CARDS = 2
+
+
+def best_response_value(policy: PolicyTable,
+                        player_index: int,
+                        abstraction: CardAbstraction | None = None,
+                        chance_samples: int | None = 8,
+                        seed: int = 0,
+                        betting: ActionTree | None = None) -> float:
+    """Expected winnings of a best response to a policy
+
+    Args:
+        policy (PolicyTable): the policy played by the opponent, which
+                    checks or calls at unseen information sets as
+                    CFRPlayer does
+        player_index (int): the seat of the best responder
+        abstraction (CardAbstraction | None): card abstraction the policy's
+                    information sets are keyed on
+        chance_samples (int | None): boards dealt per chance node, or None
+                    to enumerate every board
+        seed (int): seed of the board sampling
+        betting (ActionTree | None): betting abstraction the policy was 
+                    trained on; the best responder is restricted to it too
+
+    Returns:
+        float: the best responder's expected chips won per hand
+    """
+    walk = _PublicTreeWalk(policy, player_index, abstraction, chance_samples, seed)
+    values = walk.node(HUNLState(list(range(CARDS_DEALT)), betting=betting), (),
+                       np.ones(N_COMBOS))
+    # every pair of disjoint combinations is dealt with equal probability
+    return float(values.sum()) / (N_COMBOS * math.comb(N_CARDS - _HOLE_CARDS, _HOLE_CARDS))
+
+
+def exploitability(policy: PolicyTable,
+                   abstraction: CardAbstraction | None = None,
+                   chance_samples: int | None = 8,
+                   seed: int = 0,
+                   betting: ActionTree | None = None) -> float:
+    """Mean winnings of a best response to a policy over both seats
+
+    Zero exactly at a Nash equilibrium. See best_response_value() for the
+    arguments.
+
+    Returns:
+        float: exploitability in milli big blinds per hand
+    """
+    total = sum(best_response_value(policy, player_index, abstraction, chance_samples, seed,
+                                    betting)
+                for player_index in (0, 1))
+    return 1000 * total / 2 / BIG_BLIND
+
+
+class _PublicTreeWalk:
+    """Private helper class holding the state of one best response walk"""
+
+    def __init__(self,
+                 policy: PolicyTable,
+                 player_index: int,
+                 abstraction: CardAbstraction | None,
+                 chance_samples: int | None,
+                 seed: int) -> None:
+        self._policy = policy
+        self._player = player_index
+        self._abstraction = abstraction
+        self._chance_samples = chance_samples
+        self._random = random.Random(seed)
+        self._buckets = {}
+        self._showdowns = {}
+
+    def node(self, state: HUNLState, board: tuple[int, ...], reach: np.ndarray) -> np.ndarray:
+        """Values of a decision node to the best responder, per combination"""
+        actions = state.legal_actions()
+        if not reach.any():
+            return np.zeros(N_COMBOS)
+        if state.actor_index == self._player:
+            return np.max([self._action(state, board, action, reach) for action in actions],
+                          axis=0)
+
+        strategy = self._strategy(state, board, actions)
+        values = np.zeros(N_COMBOS)
+        for column, action in enumerate(actions):
+            if strategy[:, column].any():
+                values += self._action(state, board, action, reach * strategy[:, column])
+        return values
+
+    def _action(self,
+                state: HUNLState,
+                board: tuple[int, ...],
+                action: Action,
+                reach: np.ndarray) -> np.ndarray:
+        """Private helper method for the values of the child of an action"""
+        street = state.street
+        actor = state.actor_index
+        # only a call can close the action, matching the bets at this amount
+        called = state.pot + 2 * min(state.bets[1 - actor],
+                                     state.bets[actor] + state.stacks[actor])
+        state.push(action)
+        try:
+            if state.status and state.street == street:
+                return self.node(state, board, reach)
+            if state.status:
+                return self._deal(board, _BOARD_COUNTS[state.street] - len(board),
+                                  lambda dealt: self.node(state, dealt, reach))
+            if state.folder_index is not None:
+                return state.payoffs[self._player] * opposed_reach(board, reach)
+            return self._deal(board, _BOARD_SIZE - len(board),
+                              lambda dealt: called / 2 * self._showdown(dealt).margins(reach))
+        finally:
+            state.pop()
+
+    def _deal(self, board: tuple[int, ...], count: int, values_of) -> np.ndarray:
+        """Private helper method to average the values of a chance node
+
+        Each pair of hands not on the board sees comb(n - 4, count) of the
+        comb(n, count) ways to deal from the n remaining cards, and values
+        are zero for the deals that conflict with a hand, so the sum over
+        all deals is normalized by the former.
+        """
+        deck = [card for card in range(N_CARDS) if card not in board]
+        total = math.comb(len(deck), count)
+        if self._chance_samples is None or total <= self._chance_samples:
+            deals = list(combinations(deck, count))
+        else:
+            deals = [tuple(self._random.sample(deck, count))
+                     for _ in range(self._chance_samples)]
+        values = sum(values_of(board + deal) for deal in deals)
+        return values * (total / len(deals)) / math.comb(len(deck) - 2 * _HOLE_CARDS, count)
+
+    def _showdown(self, board: tuple[int, ...]) -> Showdown:
+        """Private helper method for the sorted hands of a full board, shared
+        by the showdowns on the board"""
+        if board not in self._showdowns:
+            self._showdowns[board] = Showdown(board)
+        return self._showdowns[board]
+
+    def _strategy(self,
+                  state: HUNLState,
+                  board: tuple[int, ...],
+                  actions: list[Action]) -> np.ndarray:
+        """Private helper method for the policy at an opponent node
+
+        Returns:
+            np.ndarray: (N_COMBOS, len(actions)) probabilities of each
+                        combination taking each action
+        """
+        actor = state.actor_index
+        keys = pack_keys(state.pot, COMBOS, state.opener_index == actor,
+                         state.bets[actor], state.bets[1 - actor], state.street,
+                         self._bucket_many(state.street, board))
+        probabilities, found = self._policy.distributions(keys)
+        strategy = probabilities[:, [action.value for action in actions]]
+        totals = strategy.sum(axis=1)
+
+        # unseen information sets, and rows without a legal action, check or call
+        playable = found & (totals > 0)
+        strategy = np.divide(strategy, totals[:, None],
+                             out=np.zeros(strategy.shape), where=playable[:, None])
+        strategy[~playable, actions.index(Action.CHECK_CALL)] = 1.0
+        return strategy
+
+    def _bucket_many(self, street: int, board: tuple[int, ...]) -> np.ndarray | None:
+        """Private helper method for the buckets of every live combination"""
+        if self._abstraction is None:
+            return None
+        buckets = self._buckets.get(board)
+        if buckets is None:
+            live = live_combos(board)
+            buckets = np.zeros(N_COMBOS, dtype=np.int64)
+            buckets[live] = self._abstraction.bucket_many(street, COMBOS[live], board)
+            self._buckets[board] = buckets
+        return buckets
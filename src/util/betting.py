@@ -0,0 +1,236 @@
+"""Betting abstraction: the bet sizes and raise depth of each street, and the
+public action tree they define
+
+A BettingConfig chooses which of the sized Actions (BET_MIN, BET_HALF,
+BET_FULL and ALL_IN) may be taken on each street and how many bets and
+raises a street allows. ActionTree expands the config once into the whole
+abstract public tree, laid out as flat arrays indexed by node id: the
+actor, street, pot, bets and stacks at each node, its legal-action bitmask
+and the child reached by each action. A HUNLState given the tree looks up
+its legal actions and next node by id instead of recomputing them.
+
+Because every decision node is known, so is the number of information sets
+a table keyed on the tree can hold, which sizes tables ahead of time.
+"""
+import json
+
+import numpy as np
+
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.infosets import pack_key
+
+RAISE_ACTIONS = (Action.ALL_IN, Action.BET_MIN, Action.BET_HALF, Action.BET_FULL)
+N_STREETS = 4
+NO_CHILD = -1
+NO_ACTOR = -1
+
+_ACTIONS = tuple(Action)
+_N_ACTIONS = len(_ACTIONS)
+_HAND_COMBOS = 1326
+
+
+class BettingConfig:
+    """Bet sizes and raise depth of each street"""
+
+    def __init__(self,
+                 bet_sizes: tuple[tuple[Action, ...], ...] = (
+                     (Action.BET_MIN, Action.BET_FULL, Action.ALL_IN),
+                     (Action.BET_HALF, Action.BET_FULL, Action.ALL_IN),
+                     (Action.BET_HALF, Action.BET_FULL, Action.ALL_IN),
+                     (Action.BET_HALF, Action.BET_FULL, Action.ALL_IN)),
+                 max_raises: tuple[int, ...] = (3, 2, 2, 2)) -> None:
+        """Create a config
+
+        Args:
+            bet_sizes (tuple[tuple[Action, ...], ...]): the bet and raise
+                        actions allowed on each street, from RAISE_ACTIONS
+            max_raises (tuple[int, ...]): bets and raises allowed on each
+                        street, after which a player can only call or fold
+        """
+        if len(bet_sizes) != N_STREETS or len(max_raises) != N_STREETS:
+            raise ValueError(f"A betting config needs bet sizes and a raise depth "
+                             f"for each of the {N_STREETS} streets.")
+        for sizes in bet_sizes:
+            for action in sizes:
+                if action not in RAISE_ACTIONS:
+                    raise ValueError(f"{action} is not a bet size.")
+        self.bet_sizes = tuple(tuple(sizes) for sizes in bet_sizes)
+        self.max_raises = tuple(max_raises)
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'BettingConfig':
+        """Create a config from a dict of the form written by to_dict(), e.g.
+        {"bet_sizes": [["BET_MIN", "ALL_IN"], ...], "max_raises": [3, ...]}"""
+        return cls(tuple(tuple(Action[name] for name in sizes) for sizes in config['bet_sizes']),
+                   tuple(config['max_raises']))
+
+    @classmethod
+    def load(cls, filename: str) -> 'BettingConfig':
+        """Read a config from a JSON file"""
+        with open(filename, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+    def to_dict(self) -> dict:
+        """Return the JSON-serializable form of this config"""
+        return {'bet_sizes': [[action.name for action in sizes] for sizes in self.bet_sizes],
+                'max_raises': list(self.max_raises)}
+
+    def allows(self, street: int, raises: int, action: Action) -> bool:
+        """Whether an action legal under the game rules is in the abstraction
+        after a number of bets and raises on the street"""
+        if action not in RAISE_ACTIONS:
+            return True
+        return raises < self.max_raises[street] and action in self.bet_sizes[street]
+
+
+class ActionTree:
+    """The abstract public action tree of a betting config as flat arrays
+
+    Node 0 is the root, after the blinds. Decision nodes have an actor, a
+    bitmask of legal actions indexed by Action.value and a child per legal
+    action. Terminal nodes have no actor: the hand was folded (folder is
+    set) or reaches showdown.
+
+    Attributes:
+        actor (np.ndarray): int8 seat to act, NO_ACTOR at terminal nodes
+        street (np.ndarray): int8 street index
+        opener (np.ndarray): int8 seat that last bet or raised
+        pot (np.ndarray): int32 chips collected from earlier streets
+        bets (np.ndarray): (n_nodes, 2) int32 bets on the current street
+        stacks (np.ndarray): (n_nodes, 2) int32 chips behind
+        folder (np.ndarray): int8 seat that folded, NO_ACTOR otherwise
+        legal (np.ndarray): uint8 legal-action bitmask
+        children (np.ndarray): (n_nodes, n_actions) int32 child of each
+                    action, NO_CHILD where illegal
+    """
+
+    _ARRAYS = ('actor', 'street', 'opener', 'pot', 'bets', 'stacks', 'folder', 'legal',
+               'children')
+
+    def __init__(self, config: BettingConfig | None = None) -> None:
+        """Expand a betting config into its action tree
+
+        Args:
+            config (BettingConfig | None): the abstraction; the default
+                        config if None
+        """
+        self.config = config if config is not None else BettingConfig()
+        self._build()
+        self._index()
+
+    def __len__(self) -> int:
+        return len(self.actor)
+
+    def __getstate__(self) -> dict:
+        return {'config': self.config.to_dict(),
+                **{name: getattr(self, name) for name in self._ARRAYS}}
+
+    def __setstate__(self, state: dict) -> None:
+        self.config = BettingConfig.from_dict(state['config'])
+        for name in self._ARRAYS:
+            setattr(self, name, state[name])
+        self._index()
+
+    @classmethod
+    def load(cls, filename: str) -> 'ActionTree':
+        """Load a tree written by save()"""
+        with np.load(filename) as arrays:
+            result = cls.__new__(cls)
+            result.__setstate__({'config': json.loads(str(arrays['config'])),
+                                 **{name: arrays[name] for name in cls._ARRAYS}})
+        return result
+
+    def save(self, filename: str) -> None:
+        """Save the compiled tree to an .npz file"""
+        np.savez(filename, config=json.dumps(self.config.to_dict()),
+                 **{name: getattr(self, name) for name in self._ARRAYS})
+
+    def legal_actions(self, node: int) -> list[Action]:
+        """The legal actions at a decision node, shared between calls"""
+        return self._action_lists[self._legal[node]]
+
+    def child(self, node: int, action: Action) -> int:
+        """The node reached by taking an action, NO_CHILD if illegal"""
+        return self._children[node][action.value]
+
+    def decision_nodes(self) -> np.ndarray:
+        """Ids of the nodes where a player acts"""
+        return np.flatnonzero(self.actor != NO_ACTOR)
+
+    def infoset_count(self, abstraction: CardAbstraction | None = None) -> int:
+        """Exact number of information sets of the tree
+
+        Decision nodes whose packed betting fields coincide share their
+        information sets, as their keys do, so each street counts its
+        distinct betting keys times its hand classes: card abstraction
+        buckets, or the 1326 hole-card combinations.
+        """
+        nodes = self.decision_nodes()
+        total = 0
+        for street in range(N_STREETS):
+            on_street = nodes[self.street[nodes] == street]
+            keys = {pack_key(int(self.pot[node]), (),
+                             bool(self.opener[node] == self.actor[node]),
+                             int(self.bets[node, self.actor[node]]),
+                             int(self.bets[node, 1 - self.actor[node]]),
+                             street)
+                    for node in on_street.tolist()}
+            classes = (abstraction.bucket_count(street) if abstraction is not None
+                       else _HAND_COMBOS)
+            total += len(keys) * classes
+        return total
+
+    def _build(self) -> None:
+        """Private helper method to expand the config depth first"""
+        # imported here since util.games depends on this module
+        from util.games import CARDS_DEALT, HUNLState
+
+        columns = {name: [] for name in self._ARRAYS}
+        self._expand(HUNLState(list(range(CARDS_DEALT))), 0, columns)
+        types = {'actor': np.int8, 'street': np.int8, 'opener': np.int8, 'pot': np.int32,
+                 'bets': np.int32, 'stacks': np.int32, 'folder': np.int8, 'legal': np.uint8,
+                 'children': np.int32}
+        for name in self._ARRAYS:
+            setattr(self, name, np.array(columns[name], dtype=types[name]))
+
+    def _expand(self, state, raises: int, columns: dict[str, list]) -> int:
+        """Private helper method to append a state's node and its subtree
+
+        Returns:
+            int: the id of the state's node
+        """
+        node = len(columns['actor'])
+        columns['actor'].append(state.actor_index if state.status else NO_ACTOR)
+        columns['street'].append(state.street)
+        columns['opener'].append(state.opener_index)
+        columns['pot'].append(state.pot)
+        columns['bets'].append(tuple(state.bets))
+        columns['stacks'].append(tuple(state.stacks))
+        columns['folder'].append(NO_ACTOR if state.folder_index is None
+                                 else state.folder_index)
+        columns['legal'].append(0)
+        children = [NO_CHILD] * _N_ACTIONS
+        columns['children'].append(children)
+        if not state.status:
+            return node
+
+        street = state.street
+        for action in state.legal_actions():
+            if not self.config.allows(street, raises, action):
+                continue
+            columns['legal'][node] |= 1 << action.value
+            state.push(action)
+            children[action.value] = self._expand(
+                state, raises + (action in RAISE_ACTIONS) if state.street == street else 0,
+                columns)
+            state.pop()
+        return node
+
+    def _index(self) -> None:
+        """Private helper method to keep Python lists for the lookups of play
+        and training, where indexing NumPy arrays per call is slower"""
+        self._action_lists = [[action for action in _ACTIONS if mask & (1 << action.value)]
+                              for mask in range(1 << _N_ACTIONS)]
+        self._legal = self.legal.tolist()
+        self._children = self.children.tolist()
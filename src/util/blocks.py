@@ -0,0 +1,241 @@
+"""Compressed, block-indexed information set table files
+
+Version 2 of the table file format written by InfoSetMap.save_to_file.
+Rows are sorted by key and cut into blocks of block_rows rows. Each block
+holds its delta-encoded keys, values and action masks, compressed
+independently with zlib or lzma. A block index of first keys and byte
+offsets follows the header, so a lookup binary searches the index and
+decompresses a single block.
+
+Values are stored as floats of the table's type, as float16, or as uint8
+fixed point for tables of probabilities in [0, 1] such as compiled
+policies. A uint8 value of 255 decodes to exactly 1.0.
+"""
+import lzma
+import mmap
+import struct
+import zlib
+from collections import OrderedDict
+from typing import BinaryIO
+
+import numpy as np
+
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+QUANTIZATIONS = {None: 0, 'float16': 1, 'uint8': 2}
+
+# magic, version, n_actions, itemsize, codec, quantization, block_rows,
+# count, n_blocks; the magic is shared with version 1 files
+FILE_MAGIC = b'TBRG'
+FILE_VERSION = 2
+_HEADER = struct.Struct('<4sIIIBBxxIQQ')
+_ALIGNMENT = 8
+_UINT8_SCALE = 255
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def write_table(file: BinaryIO,
+                keys: np.ndarray,
+                masks: np.ndarray,
+                values: np.ndarray,
+                codec: str = 'zlib',
+                quantization: str | None = None,
+                block_rows: int = 4096) -> None:
+    """Write rows sorted by key as a compressed block file
+
+    Args:
+        file (BinaryIO): binary file to write to
+        keys (np.ndarray): sorted uint64 packed InfoSet keys
+        masks (np.ndarray): uint8 action bitmask of each row
+        values (np.ndarray): (len(keys), n_actions) values
+        codec (str): 'none', 'zlib' or 'lzma'
+        quantization (str | None): None to keep the value type, 'float16',
+                    or 'uint8' for values in [0, 1]
+        block_rows (int): rows per block; smaller blocks make lookups
+                    cheaper and compression worse
+    """
+    if codec not in CODECS or quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown codec {codec!r} or quantization {quantization!r}.")
+    stored = _quantize(np.asarray(values), quantization)
+    count = len(keys)
+    n_blocks = -(-count // block_rows)
+
+    blocks = []
+    for start in range(0, count, block_rows):
+        block_keys = np.asarray(keys[start:start + block_rows], dtype=np.uint64)
+        deltas = np.diff(block_keys, prepend=np.uint64(0))
+        raw = (deltas.tobytes()
+               + stored[start:start + block_rows].tobytes()
+               + np.asarray(masks[start:start + block_rows], dtype=np.uint8).tobytes())
+        blocks.append(_compress(raw, codec))
+    offsets = np.zeros(n_blocks + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(block) for block in blocks])
+    first_keys = np.asarray(keys[::block_rows], dtype=np.uint64)
+
+    header = _HEADER.pack(FILE_MAGIC, FILE_VERSION, stored.shape[1], stored.dtype.itemsize,
+                          CODECS[codec], QUANTIZATIONS[quantization], block_rows,
+                          count, n_blocks)
+    for section in (header, first_keys.tobytes(), offsets.tobytes()):
+        file.write(section)
+        file.write(bytes(-len(section) % _ALIGNMENT))
+    for block in blocks:
+        file.write(block)
+
+
+class BlockTable:
+    """Read-only view of a compressed block file
+
+    The file is memory mapped, and blocks are decompressed on demand. Rows 
+    read through row() keep their decompressed blocks in an LRU cache whose 
+    size is bounded by cache_bytes, so the resident size of a large table 
+    follows the blocks in use rather than the size of the table.
+    """
+
+    def __init__(self, filename: str, cache_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """Map a file written by write_table()
+
+        Args:
+            filename (str): the file to map
+            cache_bytes (int): memory budget of the decompressed block 
+                        cache; the most recent block is kept regardless
+        """
+        self.cache_bytes = cache_bytes
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        with open(filename, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_actions, itemsize, codec, quantization,
+         self.block_rows, self.count, n_blocks) = _HEADER.unpack_from(self._buffer)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f"{filename} is not a version {FILE_VERSION} "
+                             "information set map file.")
+        self._codec = codec
+        self._quantization = quantization
+        self._stored_dtype = np.dtype(np.uint8 if quantization == QUANTIZATIONS['uint8']
+                                      else f'f{itemsize}')
+
+        offset = _aligned(_HEADER.size)
+        self._first_keys = np.frombuffer(self._buffer, np.uint64, n_blocks, offset)
+        offset = _aligned(offset + self._first_keys.nbytes)
+        self._offsets = np.frombuffer(self._buffer, np.uint64, n_blocks + 1, offset)
+        self._data_start = _aligned(offset + self._offsets.nbytes)
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self._first_keys)
+
+    @property
+    def value_dtype(self) -> np.dtype:
+        """Type of the decoded values"""
+        if self._quantization == QUANTIZATIONS[None]:
+            return self._stored_dtype
+        return np.dtype(np.float32)
+
+    def block_of(self, key: int) -> int | None:
+        """Return the block that would hold a packed key, or None if the key
+        sorts before every row"""
+        index = int(np.searchsorted(self._first_keys, np.uint64(key), side='right')) - 1
+        return index if index >= 0 else None
+
+    def row(self, key: int) -> tuple[np.ndarray, int] | None:
+        """Return the decoded values and action mask of a packed key, or None
+        if the table does not hold it"""
+        block = self.block_of(key)
+        if block is None:
+            return None
+        keys, masks, values = self._cached_block(block)
+        index = int(np.searchsorted(keys, np.uint64(key)))
+        if index < len(keys) and keys[index] == key:
+            return values[index], int(masks[index])
+        return None
+
+    def read_block(self, index: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decompress one block
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: the block's keys,
+                        masks and (rows, n_actions) decoded values
+        """
+        start = self._data_start + int(self._offsets[index])
+        end = self._data_start + int(self._offsets[index + 1])
+        raw = _decompress(self._buffer[start:end], self._codec)
+        rows = min(self.block_rows, self.count - index * self.block_rows)
+
+        keys = np.cumsum(np.frombuffer(raw, np.uint64, rows), dtype=np.uint64)
+        offset = keys.nbytes
+        stored = np.frombuffer(raw, self._stored_dtype, rows * self.n_actions, offset)
+        offset += stored.nbytes
+        # copy out of the decompressed buffer so that it can be freed
+        masks = np.frombuffer(raw, np.uint8, rows, offset).copy()
+        return keys, masks, self._dequantize(stored.reshape(rows, self.n_actions))
+
+    def read_all(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Decompress every block into (keys, masks, values) arrays"""
+        blocks = [self.read_block(index) for index in range(self.n_blocks)]
+        if not blocks:
+            return (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint8),
+                    np.zeros((0, self.n_actions), dtype=self.value_dtype))
+        return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+    def _cached_block(self, index: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Private helper method to read a block through the LRU cache"""
+        block = self._cache.get(index)
+        if block is not None:
+            self._cache.move_to_end(index)
+            self.hits += 1
+            return block
+
+        self.misses += 1
+        block = self.read_block(index)
+        self._cache[index] = block
+        self.resident_bytes += sum(part.nbytes for part in block)
+        while self.resident_bytes > self.cache_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self.resident_bytes -= sum(part.nbytes for part in evicted)
+        return block
+
+    def _dequantize(self, stored: np.ndarray) -> np.ndarray:
+        """Private helper method to decode stored values"""
+        if self._quantization == QUANTIZATIONS['uint8']:
+            return stored.astype(np.float32) / _UINT8_SCALE
+        if self._quantization == QUANTIZATIONS['float16']:
+            return stored.astype(np.float32)
+        return stored.copy()
+
+
+def _quantize(values: np.ndarray, quantization: str | None) -> np.ndarray:
+    """Private helper to encode values for storage"""
+    if quantization == 'uint8':
+        if values.size and (values.min() < 0 or values.max() > 1):
+            raise ValueError("uint8 quantization requires values in [0, 1].")
+        return np.rint(values * _UINT8_SCALE).astype(np.uint8)
+    if quantization == 'float16':
+        if values.size and np.abs(values).max() > np.finfo(np.float16).max:
+            raise ValueError("Values exceed the float16 range.")
+        return values.astype(np.float16)
+    return values
+
+
+def _compress(raw: bytes, codec: str) -> bytes:
+    """Private helper to compress a block"""
+    if codec == 'zlib':
+        return zlib.compress(raw, 6)
+    if codec == 'lzma':
+        return lzma.compress(raw)
+    return raw
+
+
+def _decompress(data: bytes, code: int) -> bytes:
+    """Private helper to decompress a block"""
+    if code == CODECS['zlib']:
+        return zlib.decompress(data)
+    if code == CODECS['lzma']:
+        return lzma.decompress(data)
+    return bytes(data)
+
+
+def _aligned(offset: int) -> int:
+    """Private helper to round an offset up to the section alignment"""
+    return offset + (-offset % _ALIGNMENT)
@@ -0,0 +1,35 @@
+"""Integer encoding of playing cards
+
+Cards are numbered 0-51 as rank_index * 4 + suit_index, with ranks ordered 
+deuce through ace and suits ordered clubs, diamonds, hearts, spades.
+"""
+from pokerkit import Card, Rank, Suit
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+N_CARDS = len(RANKS) * len(SUITS)
+
+_RANK_INDICES = {Rank(rank): index for index, rank in enumerate(RANKS)}
+_SUIT_INDICES = {Suit(suit): index for index, suit in enumerate(SUITS)}
+_CARDS = tuple(Card(Rank(RANKS[index // 4]), Suit(SUITS[index % 4]))
+               for index in range(N_CARDS))
+
+
+def card_index(card: Card) -> int:
+    """Return the integer encoding of a pokerkit card"""
+    return _RANK_INDICES[card.rank] * 4 + _SUIT_INDICES[card.suit]
+
+
+def index_to_card(index: int) -> Card:
+    """Return the pokerkit card with the given integer encoding"""
+    return _CARDS[index]
+
+
+def parse_card(text: str) -> int:
+    """Return the integer encoding of a card written like 'Ac' or 'Td'"""
+    return RANKS.index(text[0]) * 4 + SUITS.index(text[1])
+
+
+def card_text(index: int) -> str:
+    """Return the two character name of the card with the given encoding"""
+    return RANKS[index // 4] + SUITS[index % 4]
@@ -0,0 +1,132 @@
+"""Incremental checkpoints of the tables of a training run
+
+A checkpoint directory holds a manifest and a sequence of segments. Each
+segment is a pair of InfoSetMap files with the regret and cumulative
+profile rows that changed since the previous segment, so a checkpoint
+costs time and disk in proportion to the rows touched rather than to the
+table size. Loading replays the segments in order. Once there are more than
+max_segments, the next checkpoint writes the full tables as one segment
+and drops the others.
+
+Every file is written under a temporary name, flushed to disk and renamed.
+The manifest, written last, is the commit point: a crash at any time leaves
+the previous checkpoint loadable.
+"""
+import json
+import os
+import random
+
+from util.infosets import InfoSetMap
+
+_MANIFEST = "checkpoint.json"
+
+
+class Checkpointer:
+    """Writes and loads the checkpoints of a training run in a directory"""
+
+    def __init__(self, directory: str, max_segments: int = 16) -> None:
+        """Open a checkpoint directory, creating it if necessary
+
+        Args:
+            directory (str): where checkpoints are written
+            max_segments (int): number of incremental segments after which
+                        the next checkpoint is written in full
+        """
+        self._directory = directory
+        self._max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._manifest = self._read_manifest()
+
+    @property
+    def iteration(self) -> int:
+        """The epoch count of the latest checkpoint, 0 if there is none"""
+        return self._manifest['iteration']
+
+    def save(self,
+             regrets: InfoSetMap,
+             cumulative_profile: InfoSetMap,
+             iteration: int) -> None:
+        """Write the rows changed since the last checkpoint
+
+        Args:
+            regrets (InfoSetMap): regret table of the run
+            cumulative_profile (InfoSetMap): cumulative profile of the run
+            iteration (int): epochs completed so far
+        """
+        segments = self._manifest['segments']
+        full = len(segments) >= self._max_segments
+        number = self._manifest['next_segment']
+        names = [f"regrets-{number:06d}.seg", f"profile-{number:06d}.seg"]
+        for table, name in zip((regrets, cumulative_profile), names):
+            rows = table if full else table.subset(table.dirty_ids())
+            rows.save_to_file(os.path.join(self._directory, name))
+        _fsync_directory(self._directory)
+
+        stale = segments if full else []
+        self._manifest = {'iteration': iteration,
+                          'rng_state': _encode_rng_state(random.getstate()),
+                          'segments': [names] if full else segments + [names],
+                          'next_segment': number + 1}
+        self._write_manifest()
+        regrets.clear_dirty()
+        cumulative_profile.clear_dirty()
+        for name in (name for pair in stale for name in pair):
+            os.remove(os.path.join(self._directory, name))
+
+    def load(self) -> tuple[InfoSetMap, InfoSetMap]:
+        """Rebuild the tables of the latest checkpoint and restore the random
+        state it was taken with
+
+        Returns:
+            tuple[InfoSetMap, InfoSetMap]: the regrets and cumulative profile
+        """
+        regrets = InfoSetMap()
+        cumulative_profile = InfoSetMap()
+        for names in self._manifest['segments']:
+            for table, name in zip((regrets, cumulative_profile), names):
+                table.update(InfoSetMap(os.path.join(self._directory, name)))
+        regrets.clear_dirty()
+        cumulative_profile.clear_dirty()
+        if self._manifest['rng_state'] is not None:
+            random.setstate(_decode_rng_state(self._manifest['rng_state']))
+        return regrets, cumulative_profile
+
+    def _read_manifest(self) -> dict:
+        """Private helper method to read the manifest, or start a new one"""
+        path = os.path.join(self._directory, _MANIFEST)
+        if not os.path.exists(path):
+            return {'iteration': 0, 'rng_state': None, 'segments': [], 'next_segment': 0}
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write_manifest(self) -> None:
+        """Private helper method to atomically replace the manifest"""
+        path = os.path.join(self._directory, _MANIFEST)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self._manifest, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(self._directory)
+
+
+def _encode_rng_state(state: tuple) -> list:
+    """Private helper to make random.getstate() JSON serializable"""
+    version, internal, gauss = state
+    return [version, list(internal), gauss]
+
+
+def _decode_rng_state(state: list) -> tuple:
+    """Private helper to invert _encode_rng_state()"""
+    version, internal, gauss = state
+    return (version, tuple(internal), gauss)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Private helper to make renames within a directory durable"""
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,169 @@
+"""Showdown equity of one hold'em hand against another
+
+Once a player is all in before the river no decisions remain, so the value
+of the hand is its pot times the equity of the hole cards over the rest of
+the board. Flop and turn equities are enumerated exactly over the missing
+board cards. The 1,712,304 preflop boards are too many to enumerate per
+hand, so build_preflop_tables() estimates the equity of every pair of
+hole-card combinations from a sample of boards once, and AllInEquity
+memory maps the result.
+
+Combinations are indexed 0-1325 by combo_index(), and the 169 preflop hand
+classes follow util.hand_indexer.
+"""
+import os
+from itertools import combinations
+
+import numpy as np
+
+from util.cards import N_CARDS
+from util.evaluator import evaluate_many
+from util.hand_indexer import street_indexers
+
+N_COMBOS = N_CARDS * (N_CARDS - 1) // 2
+BOARD_SIZE = 5
+
+# every combination, high card first, in combo_index() order
+COMBOS = np.array([(high, low) for high in range(N_CARDS) for low in range(high)],
+                   dtype=np.int64)
+
+
+def combo_index(hole_cards: tuple[int, int]) -> int:
+    """Return the index in [0, N_COMBOS) of a pair of hole cards"""
+    high, low = max(hole_cards), min(hole_cards)
+    return high * (high - 1) // 2 + low
+
+
+def showdown_equity(hole_cards: tuple[tuple[int, int], tuple[int, int]],
+                    board: tuple[int, ...]) -> float:
+    """Exact equity of player 0 over every completion of the board
+
+    Args:
+        hole_cards (tuple[tuple[int, int], tuple[int, int]]): both
+                    players' hole cards
+        board (tuple[int, ...]): three to five board cards
+
+    Returns:
+        float: player 0's expected share of the pot, counting ties as half
+    """
+    dead = set(hole_cards[0]) | set(hole_cards[1]) | set(board)
+    deck = [card for card in range(N_CARDS) if card not in dead]
+    runouts = list(combinations(deck, BOARD_SIZE - len(board)))
+    runouts = np.array(runouts, dtype=np.int64).reshape(len(runouts), BOARD_SIZE - len(board))
+    boards = np.hstack((np.tile(np.array(board, dtype=np.int64), (len(runouts), 1)), runouts))
+    values = [evaluate_many(np.hstack((np.tile(hole, (len(boards), 1)), boards)))
+              for hole in hole_cards]
+    return float(((values[0] > values[1]) + 0.5 * (values[0] == values[1])).mean())
+
+
+def build_preflop_tables(directory: str, boards: int, seed: int = 0) -> None:
+    """Estimate and save the preflop equity tables
+
+    Every sampled board is evaluated for all combinations at once, and
+    each pair of combinations accumulates the result over the boards that
+    conflict with neither hand, so every pair is estimated from boards
+    drawn from its own remaining deck.
+
+    Args:
+        directory (str): where to write the tables
+        boards (int): number of boards to sample
+        seed (int): seed of the board sampling
+    """
+    rng = np.random.default_rng(seed)
+    combo_masks, disjoint = _combo_masks()
+
+    # wins count two per win and one per tie, so sums stay integer
+    wins = np.zeros((N_COMBOS, N_COMBOS), dtype=np.int64)
+    counts = np.zeros((N_COMBOS, N_COMBOS), dtype=np.int64)
+    for _ in range(boards):
+        _accumulate(rng.choice(N_CARDS, BOARD_SIZE, replace=False),
+                    combo_masks, disjoint, wins, counts)
+
+    preflop_indexer = street_indexers()[0]
+    classes = np.zeros((N_COMBOS, preflop_indexer.size), dtype=np.int64)
+    classes[np.arange(N_COMBOS), preflop_indexer.index_many(COMBOS)] = 1
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "equity-1326.npy"), _ratio(wins, counts))
+    np.save(os.path.join(directory, "equity-169.npy"),
+            _ratio(classes.T @ wins @ classes, classes.T @ counts @ classes))
+
+
+def equity_matrix(board: tuple[int, ...]) -> np.ndarray:
+    """Exact equity of every combination against every other over all
+    completions of a board
+
+    A flop has 1081 completions, so its matrix takes tens of seconds.
+
+    Args:
+        board (tuple[int, ...]): three to five board cards
+
+    Returns:
+        np.ndarray: (N_COMBOS, N_COMBOS) float32 expected pot share of the 
+                    row combination, zero for pairs that share a card with 
+                    each other or the board
+    """
+    combo_masks, disjoint = _combo_masks()
+    wins = np.zeros((N_COMBOS, N_COMBOS), dtype=np.int64)
+    counts = np.zeros((N_COMBOS, N_COMBOS), dtype=np.int64)
+    deck = [card for card in range(N_CARDS) if card not in board]
+    for runout in combinations(deck, BOARD_SIZE - len(board)):
+        _accumulate(np.array(tuple(board) + runout, dtype=np.int64),
+                    combo_masks, disjoint, wins, counts)
+    return _ratio(wins, counts)
+
+
+class AllInEquity:
+    """Equity of hands all in before the river, from the preflop tables
+    written by build_preflop_tables() or by enumerating the board"""
+
+    def __init__(self, directory: str) -> None:
+        """Memory-map the tables written by build_preflop_tables()"""
+        self._directory = directory
+        self.combo_equity = np.load(os.path.join(directory, "equity-1326.npy"), mmap_mode='r')
+        self.class_equity = np.load(os.path.join(directory, "equity-169.npy"), mmap_mode='r')
+
+    def __getstate__(self) -> dict:
+        # processes receiving a copy map the same files instead of the tables
+        return {'directory': self._directory}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['directory'])
+
+    def equity(self,
+               hole_cards: tuple[tuple[int, int], tuple[int, int]],
+               board: tuple[int, ...]) -> float:
+        """Player 0's expected share of the pot with the given board dealt"""
+        if not board:
+            return float(self.combo_equity[combo_index(hole_cards[0]),
+                                           combo_index(hole_cards[1])])
+        return showdown_equity(hole_cards, board)
+
+
+def _combo_masks() -> tuple[np.ndarray, np.ndarray]:
+    """Private helper for the card bitmask of every combination and whether 
+    each pair of combinations is disjoint"""
+    combo_masks = (np.int64(1) << COMBOS[:, 0]) | (np.int64(1) << COMBOS[:, 1])
+    return combo_masks, (combo_masks[:, None] & combo_masks[None, :]) == 0
+
+
+def _accumulate(board: np.ndarray,
+                combo_masks: np.ndarray,
+                disjoint: np.ndarray,
+                wins: np.ndarray,
+                counts: np.ndarray) -> None:
+    """Private helper to add the showdowns of a full board to the half-point 
+    wins and board counts of every pair of combinations"""
+    live = (combo_masks & np.bitwise_or.reduce(np.int64(1) << board)) == 0
+    values = evaluate_many(np.hstack((COMBOS, np.tile(board, (N_COMBOS, 1)))))
+    valid = live[:, None] & live[None, :] & disjoint
+    wins += valid * (2 * (values[:, None] > values[None, :])
+                     + (values[:, None] == values[None, :]))
+    counts += valid
+
+
+def _ratio(wins: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Private helper for the equities of accumulated half-point wins, zero
+    where no board was counted"""
+    return np.divide(wins, 2 * counts, out=np.zeros(wins.shape),
+                     where=counts > 0).astype(np.float32)
@@ -0,0 +1,159 @@
+"""Table-driven evaluation of hold'em hands on integer cards
+
+A hand of five to seven cards from util.cards evaluates to an int whose
+order matches pokerkit's StandardHighHand: a greater value is a stronger
+hand and equal values tie. The value packs the hand category above the
+ranks that break ties within it, four bits per rank.
+
+Hands without a flush are looked up by their rank counts, packed into the
+base-5 key sum(5 ** rank) which is unique to every multiset of ranks. A
+hand holding five or more cards of one suit is at best a flush or a
+straight flush (seven cards are too few for a flush plus a full house), so
+its value is looked up by the 13-bit rank mask of that suit. Both tables
+are built once at import.
+"""
+from itertools import combinations_with_replacement
+
+import numpy as np
+
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+
+_N_RANKS = 13
+_N_SUITS = 4
+_CATEGORY_SHIFT = 20
+_RANK_BITS = 4
+_MIN_CARDS = 5
+_MAX_CARDS = 7
+_WHEEL = (1 << 12) | 0b1111
+
+
+def category(value: int) -> int:
+    """Return the hand category (HIGH_CARD ... STRAIGHT_FLUSH) of a value"""
+    return value >> _CATEGORY_SHIFT
+
+
+def evaluate(cards: tuple[int, ...] | list[int]) -> int:
+    """Evaluate the best five-card hand among five to seven cards
+
+    Args:
+        cards (tuple[int, ...] | list[int]): distinct card indices
+
+    Returns:
+        int: the hand value; greater is stronger
+    """
+    key = 0
+    suit_masks = [0, 0, 0, 0]
+    for card in cards:
+        key += _RANK_KEYS[card]
+        suit_masks[card & 3] |= 1 << (card >> 2)
+    for mask in suit_masks:
+        if _POPCOUNT[mask] >= _MIN_CARDS:
+            return _FLUSH_VALUES[mask]
+    return _RANK_VALUES[key]
+
+
+def evaluate_many(cards: np.ndarray) -> np.ndarray:
+    """Evaluate a batch of hands
+
+    Args:
+        cards (np.ndarray): (batch, n) card indices, 5 <= n <= 7, with
+                    distinct cards in every row
+
+    Returns:
+        np.ndarray: (batch,) int32 hand values
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    ranks = cards >> 2
+    suits = cards & 3
+
+    keys = _RANK_KEY_ARRAY[cards].sum(axis=1)
+    result = _NON_FLUSH_VALUES[np.searchsorted(_NON_FLUSH_KEYS, keys)]
+
+    rank_bits = np.left_shift(1, ranks)
+    for suit in range(_N_SUITS):
+        masks = np.bitwise_or.reduce(np.where(suits == suit, rank_bits, 0), axis=1)
+        flush = _POPCOUNT_ARRAY[masks] >= _MIN_CARDS
+        result[flush] = _FLUSH_VALUE_ARRAY[masks[flush]]
+    return result
+
+
+def _value(category_index: int, ranks: list[int]) -> int:
+    """Private helper to pack a category and its tie-breaking ranks"""
+    value = category_index
+    for index in range(_MIN_CARDS):
+        value = (value << _RANK_BITS) | (ranks[index] if index < len(ranks) else 0)
+    return value
+
+
+def _straight_high(mask: int) -> int | None:
+    """Private helper for the top rank of the best straight in a rank mask"""
+    for high in range(_N_RANKS - 1, _MIN_CARDS - 2, -1):
+        run = 0b11111 << (high - _MIN_CARDS + 1)
+        if mask & run == run:
+            return high
+    if mask & _WHEEL == _WHEEL:
+        return _MIN_CARDS - 2
+    return None
+
+
+def _flush_value(mask: int) -> int:
+    """Private helper for the value of a flush in the given rank mask"""
+    high = _straight_high(mask)
+    if high is not None:
+        return _value(STRAIGHT_FLUSH, [high])
+    ranks = [rank for rank in range(_N_RANKS - 1, -1, -1) if mask >> rank & 1]
+    return _value(FLUSH, ranks[:_MIN_CARDS])
+
+
+def _rank_value(counts: list[int]) -> int:
+    """Private helper for the value of a hand without a flush"""
+    descending = range(_N_RANKS - 1, -1, -1)
+    quads = [rank for rank in descending if counts[rank] == 4]
+    trips = [rank for rank in descending if counts[rank] == 3]
+    pairs = [rank for rank in descending if counts[rank] == 2]
+    singles = [rank for rank in descending if counts[rank] == 1]
+
+    def kickers(*made: int) -> list[int]:
+        return [rank for rank in descending if counts[rank] and rank not in made]
+
+    if quads:
+        return _value(QUADS, [quads[0]] + kickers(quads[0])[:1])
+    if trips and len(trips) + len(pairs) >= 2:
+        pair = max(trips[1:] + pairs)
+        return _value(FULL_HOUSE, [trips[0], pair])
+    high = _straight_high(sum(1 << rank for rank in descending if counts[rank]))
+    if high is not None:
+        return _value(STRAIGHT, [high])
+    if trips:
+        return _value(TRIPS, [trips[0]] + kickers(trips[0])[:2])
+    if len(pairs) >= 2:
+        return _value(TWO_PAIR, pairs[:2] + kickers(*pairs[:2])[:1])
+    if pairs:
+        return _value(PAIR, [pairs[0]] + kickers(pairs[0])[:3])
+    return _value(HIGH_CARD, singles[:_MIN_CARDS])
+
+
+def _rank_tables() -> dict[int, int]:
+    """Private helper to value every multiset of five to seven ranks"""
+    result = {}
+    for n_cards in range(_MIN_CARDS, _MAX_CARDS + 1):
+        for ranks in combinations_with_replacement(range(_N_RANKS), n_cards):
+            counts = [0] * _N_RANKS
+            for rank in ranks:
+                counts[rank] += 1
+            if max(counts) <= _N_SUITS:
+                result[sum(5 ** rank for rank in ranks)] = _rank_value(counts)
+    return result
+
+
+_RANK_KEYS = tuple(5 ** (card >> 2) for card in range(_N_RANKS * _N_SUITS))
+_RANK_KEY_ARRAY = np.array(_RANK_KEYS, dtype=np.int64)
+_POPCOUNT = tuple(bin(mask).count('1') for mask in range(1 << _N_RANKS))
+_POPCOUNT_ARRAY = np.array(_POPCOUNT, dtype=np.int8)
+_FLUSH_VALUES = tuple(_flush_value(mask) if _POPCOUNT[mask] >= _MIN_CARDS else 0
+                      for mask in range(1 << _N_RANKS))
+_FLUSH_VALUE_ARRAY = np.array(_FLUSH_VALUES, dtype=np.int32)
+_RANK_VALUES = _rank_tables()
+_NON_FLUSH_KEYS = np.array(sorted(_RANK_VALUES), dtype=np.int64)
+_NON_FLUSH_VALUES = np.array([_RANK_VALUES[key] for key in _NON_FLUSH_KEYS.tolist()],
+                             dtype=np.int32)
@@ -0,0 +1,324 @@
+"""Lightweight heads-up, no-limit Texas Hold'em game state for training
+
+pokerkit's State supports every poker variant and is expensive to copy, so
+CFR tree walks use this minimal representation instead. Cards are integers
+from util.cards, and seats follow pokerkit's heads-up convention: player 0
+posts the big blind and acts first after the flop, player 1 is the button.
+"""
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.betting import ActionTree
+from util.cards import N_CARDS
+from util.equity import AllInEquity
+from util.evaluator import evaluate
+from util.infosets import InfoSet
+
+CARDS_DEALT = 9
+STARTING_STACK = 20000
+SMALL_BLIND = 50
+BIG_BLIND = 100
+
+_BOARD_COUNTS = (0, 3, 4, 5)
+_RIVER = 3
+_BET_FRACTIONS = {Action.BET_HALF: 0.5, Action.BET_FULL: 1.0}
+
+
+class HUNLState:
+    """A hand of heads-up no-limit hold'em with a predetermined deal
+
+    Children are created with apply(), which leaves the parent untouched, 
+    or by push(), which plays the action in place and records what it 
+    changed on an undo log so that pop() can restore the parent.
+    Bet sizes follow the Action abstraction: BET_MIN is a minimum bet or
+    raise, BET_HALF and BET_FULL raise by that fraction of the pot after
+    calling, and ALL_IN commits the actor's whole stack. Given an 
+    ActionTree, a state tracks its node in the tree and takes its legal 
+    actions from the tree's betting abstraction.
+    """
+
+    __slots__ = ('hole_cards', '_runout', '_abstraction', '_buckets', '_equity', '_equities',
+                 '_betting', 'node', 'stacks', 'bets', 'pot', 'street',
+                 'actor_index', 'opener_index', 'status', 'folder_index',
+                 '_last_raise', '_to_act', '_undo_log')
+
+    def __init__(self,
+                 deck: list[int],
+                 abstraction: CardAbstraction | None = None,
+                 equity: AllInEquity | None = None,
+                 betting: ActionTree | None = None) -> None:
+        """Post the blinds and deal a hand from a shuffled deck
+
+        Args:
+            deck (list[int]): at least CARDS_DEALT distinct card indices; the
+                        first four are the hole cards and the next five the
+                        board
+            abstraction (CardAbstraction | None): if given, information sets
+                        key on card buckets instead of exact hole cards
+            equity (AllInEquity | None): if given, a hand all in before the
+                        river pays out each player's expected share of the
+                        pot instead of dealing out the board
+            betting (ActionTree | None): if given, only the actions of this 
+                        betting abstraction are legal
+        """
+        self.hole_cards = ((deck[0], deck[1]), (deck[2], deck[3]))
+        self._runout = tuple(deck[4:9])
+        self._abstraction = abstraction
+        # buckets depend only on the deal, so all states of a hand share them
+        self._buckets = [[None] * len(_BOARD_COUNTS), [None] * len(_BOARD_COUNTS)]
+        self._equity = equity
+        self._equities = [None] * _RIVER
+        self._betting = betting
+        self.node = 0
+        self.stacks = [STARTING_STACK - BIG_BLIND, STARTING_STACK - SMALL_BLIND]
+        self.bets = [BIG_BLIND, SMALL_BLIND]
+        self.pot = 0
+        self.street = 0
+        self.actor_index = 1
+        self.opener_index = 1
+        self.status = True
+        self.folder_index = None
+        self._last_raise = BIG_BLIND
+        self._to_act = 2
+        self._undo_log = []
+
+    @property
+    def board(self) -> tuple[int, ...]:
+        """The board cards visible on the current street"""
+        return self._runout[:_BOARD_COUNTS[self.street]]
+
+    @property
+    def payoffs(self) -> tuple[float, float]:
+        """Chips won by each player in a finished hand, in expectation over
+        the board if the hand was valued by all-in equity"""
+        return (self.stacks[0] - STARTING_STACK, self.stacks[1] - STARTING_STACK)
+
+    def infoset(self, player_index: int) -> InfoSet:
+        """Create the information set of a player at this state"""
+        return InfoSet.from_fields(self.pot,
+                                   self.hole_cards[player_index],
+                                   self.opener_index == player_index,
+                                   self.bets[player_index],
+                                   self.bets[1 - player_index],
+                                   self.street,
+                                   self._bucket(player_index))
+
+    def _bucket(self, player_index: int) -> int | None:
+        """Private helper method for the actor's card bucket on this street"""
+        if self._abstraction is None:
+            return None
+        bucket = self._buckets[player_index][self.street]
+        if bucket is None:
+            bucket = self._abstraction.bucket(self.street,
+                                              self.hole_cards[player_index],
+                                              self._runout)
+            self._buckets[player_index][self.street] = bucket
+        return bucket
+
+    def legal_actions(self) -> list[Action]:
+        """Returns a list of abstract actions available to the actor"""
+        if self._betting is not None:
+            return self._betting.legal_actions(self.node)
+        actor = self.actor_index
+        opponent = 1 - actor
+        result = []
+
+        if self.bets[opponent] > self.bets[actor]:
+            result.append(Action.FOLD)
+        result.append(Action.CHECK_CALL)
+
+        # raising is closed once the opponent is all in or the actor cannot
+        # put in more than a call
+        all_in_to = self.bets[actor] + self.stacks[actor]
+        if self.stacks[opponent] == 0 or all_in_to <= self.bets[opponent]:
+            return result
+
+        result.append(Action.ALL_IN)
+        min_raise_to = self.min_raise_to()
+        if min_raise_to < all_in_to:
+            result.append(Action.BET_MIN)
+            for action in (Action.BET_HALF, Action.BET_FULL):
+                if min_raise_to <= self.raise_to_amount(action) < all_in_to:
+                    result.append(action)
+        return result
+
+    def raise_to_amount(self, action: Action) -> int:
+        """The street bet the actor would make by taking a bet/raise action"""
+        actor = self.actor_index
+        opponent = 1 - actor
+        if action == Action.ALL_IN:
+            return self.bets[actor] + self.stacks[actor]
+        if action == Action.BET_MIN:
+            return self.min_raise_to()
+
+        pot_after_call = self.pot + 2 * self.bets[opponent]
+        return self.bets[opponent] + int(_BET_FRACTIONS[action] * pot_after_call)
+
+    def apply(self, action: Action) -> 'HUNLState':
+        """Return the state reached by the actor taking a legal action"""
+        child = self._copy()
+        child._play(action)
+        return child
+
+    def push(self, action: Action) -> None:
+        """Play a legal action in place, remembering how to undo it"""
+        self._undo_log.append((self.stacks[0], self.stacks[1],
+                               self.bets[0], self.bets[1],
+                               self.pot, self.street,
+                               self.actor_index, self.opener_index,
+                               self.status, self.folder_index,
+                               self._last_raise, self._to_act, self.node))
+        self._play(action)
+
+    def push_raise_to(self, raise_to: int) -> None:
+        """Bet or raise in place to an amount outside the Action abstraction, 
+        as a real opponent may, remembering how to undo it
+
+        The amount is clamped to the legal range, from a minimum raise to 
+        all in. A state following an ActionTree cannot leave the tree.
+        """
+        if self._betting is not None:
+            raise ValueError("A state following a betting abstraction can only take its actions.")
+        actor = self.actor_index
+        all_in_to = self.bets[actor] + self.stacks[actor]
+        raise_to = min(max(raise_to, self.min_raise_to()), all_in_to)
+        self._undo_log.append((self.stacks[0], self.stacks[1],
+                               self.bets[0], self.bets[1],
+                               self.pot, self.street,
+                               self.actor_index, self.opener_index,
+                               self.status, self.folder_index,
+                               self._last_raise, self._to_act, self.node))
+        self._raise(raise_to)
+        self._close_action()
+
+    def reveal_board(self, board: tuple[int, ...]) -> None:
+        """Set the board cards dealt so far, for a hand whose runout was not 
+        known when it was dealt; other undealt cards stand in for the rest"""
+        dealt = set(board).union(*self.hole_cards)
+        self._runout = tuple(board) + tuple(
+            card for card in range(N_CARDS) if card not in dealt)[:len(self._runout) - len(board)]
+
+    def pop(self) -> None:
+        """Undo the most recent push()"""
+        (self.stacks[0], self.stacks[1],
+         self.bets[0], self.bets[1],
+         self.pot, self.street,
+         self.actor_index, self.opener_index,
+         self.status, self.folder_index,
+         self._last_raise, self._to_act, self.node) = self._undo_log.pop()
+
+    def _copy(self) -> 'HUNLState':
+        """Private helper method to copy the mutable parts of this state"""
+        child = HUNLState.__new__(HUNLState)
+        child.hole_cards = self.hole_cards
+        child._runout = self._runout
+        child._abstraction = self._abstraction
+        child._buckets = self._buckets
+        child._equity = self._equity
+        child._equities = self._equities
+        child._betting = self._betting
+        child.node = self.node
+        child.stacks = self.stacks.copy()
+        child.bets = self.bets.copy()
+        child.pot = self.pot
+        child.street = self.street
+        child.actor_index = self.actor_index
+        child.opener_index = self.opener_index
+        child.status = self.status
+        child.folder_index = self.folder_index
+        child._last_raise = self._last_raise
+        child._to_act = self._to_act
+        child._undo_log = []
+        return child
+
+    def _all_in_equity(self) -> float:
+        """Private helper method for player 0's equity on the current street"""
+        share = self._equities[self.street]
+        if share is None:
+            share = self._equity.equity(self.hole_cards, self.board)
+            self._equities[self.street] = share
+        return share
+
+    def min_raise_to(self) -> int:
+        """The smallest legal bet/raise to amount of the actor"""
+        return self.bets[1 - self.actor_index] + max(self._last_raise, BIG_BLIND)
+
+    def _play(self, action: Action) -> None:
+        """Private helper method to apply an action to this state in place"""
+        actor = self.actor_index
+        opponent = 1 - actor
+        if self._betting is not None:
+            self.node = self._betting.child(self.node, action)
+
+        if action == Action.FOLD:
+            self.folder_index = actor
+            self.stacks[opponent] += self.pot + self.bets[0] + self.bets[1]
+            self.bets[0] = self.bets[1] = 0
+            self.pot = 0
+            self.status = False
+            return
+
+        if action == Action.CHECK_CALL:
+            amount = min(self.bets[opponent] - self.bets[actor], self.stacks[actor])
+            self.stacks[actor] -= amount
+            self.bets[actor] += amount
+            self._to_act -= 1
+        else:
+            self._raise(self.raise_to_amount(action))
+        self._close_action()
+
+    def _raise(self, raise_to: int) -> None:
+        """Private helper method for the actor to bet or raise to an amount"""
+        actor = self.actor_index
+        self._last_raise = max(self._last_raise, raise_to - self.bets[1 - actor])
+        self.stacks[actor] -= raise_to - self.bets[actor]
+        self.bets[actor] = raise_to
+        self.opener_index = actor
+        self._to_act = 1
+
+    def _close_action(self) -> None:
+        """Private helper method to pass the action on, or end the betting 
+        round once it is closed"""
+        opponent = 1 - self.actor_index
+        if self._to_act > 0 and self.stacks[opponent] > 0:
+            self.actor_index = opponent
+            return
+
+        # the betting round is closed
+        if self.stacks[0] == 0 or self.stacks[1] == 0 or self.street == _RIVER:
+            self._showdown()
+        else:
+            self.pot += self.bets[0] + self.bets[1]
+            self.bets[0] = self.bets[1] = 0
+            self.street += 1
+            self.actor_index = 0
+            self.opener_index = 0
+            self._last_raise = 0
+            self._to_act = 2
+
+    def _showdown(self) -> None:
+        """Private helper method to deal out the board and award the pot"""
+        # return any uncalled part of a bet
+        matched = min(self.bets)
+        for index in (0, 1):
+            self.stacks[index] += self.bets[index] - matched
+        pot = self.pot + 2 * matched
+
+        if self._equity is not None and self.street < _RIVER:
+            # an all in before the river pays its expected share of the pot
+            share = self._all_in_equity()
+            self.stacks[0] += pot * share
+            self.stacks[1] += pot - pot * share
+        else:
+            hands = [evaluate(hole + self._runout) for hole in self.hole_cards]
+            if hands[0] > hands[1]:
+                self.stacks[0] += pot
+            elif hands[1] > hands[0]:
+                self.stacks[1] += pot
+            else:
+                self.stacks[0] += pot // 2
+                self.stacks[1] += pot - pot // 2
+
+        self.street = _RIVER
+        self.bets[0] = self.bets[1] = 0
+        self.pot = 0
+        self.status = False
@@ -1,172 +1,728 @@
 """Methods and classes related to information sets"""
 import json
-import pickle
-from typing import Any
+import mmap
+import multiprocessing
+import os
+import struct
+from multiprocessing import shared_memory
 
+import numpy as np
 from pokerkit import State
 
-from actions import Action
+from util.abstraction import MAX_BUCKETS, CardAbstraction
+from util.actions import Action
+from util.blocks import (BlockTable, DEFAULT_CACHE_BYTES, FILE_VERSION as _BLOCK_FILE_VERSION,
+                         write_table)
+from util.cards import card_index
+
+_ACTIONS = tuple(Action)
+_N_ACTIONS = len(_ACTIONS)
+_INITIAL_CAPACITY = 1024
+
+# binary table file layout: header, sorted uint64 keys, uint8 action masks 
+# and (n_infosets, n_actions) values, each section aligned to 8 bytes
+_FILE_MAGIC = b'TBRG'
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sIIIQ')  # magic, version, n_actions, itemsize, count
+_FILE_ALIGNMENT = 8
+
+# open-addressing parameters of shared tables; packed keys never set bit 63 
+# (the hole cards field holds at most 12 bits: two cards, or a bucket below 
+# MAX_BUCKETS plus one), so all ones marks an empty slot
+_EMPTY_KEY = np.uint64(0xFFFFFFFFFFFFFFFF)
+_UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+# splitmix64 finalizer constants; every key bit reaches the high bits of the
+# hash, which index the slot, so keys that differ only in their cards or
+# bucket spread over the table instead of clustering by betting state
+_MIX_MULTIPLIERS = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+
+# bit layout of packed InfoSet keys (least significant field first)
+_CHIP_BITS = 16
+_CHIP_MASK = (1 << _CHIP_BITS) - 1
+_CARD_BITS = 6
+_CARD_MASK = (1 << _CARD_BITS) - 1
+_STREET_BITS = 2
+_OPPONENT_BET_SHIFT = 0
+_MY_BET_SHIFT = _OPPONENT_BET_SHIFT + _CHIP_BITS
+_POT_SHIFT = _MY_BET_SHIFT + _CHIP_BITS
+_OPENING_SHIFT = _POT_SHIFT + _CHIP_BITS
+_STREET_SHIFT = _OPENING_SHIFT + 1
+_HOLE_CARDS_SHIFT = _STREET_SHIFT + _STREET_BITS
+
+
+def _bucket_chips(amount: int) -> int:
+    """Private helper to fit a chip amount into its key field
+
+    Amounts above the field width (65535 chips, more than the 40000 chip 
+    maximum pot of a 200 big blind Slumbot match) share the top bucket.
+    """
+    return min(amount, _CHIP_MASK)
+
+
+def pack_key(pot_amount: int,
+             hole_cards: tuple[int, ...],
+             am_opening: bool,
+             my_bet: int,
+             opponent_bet: int,
+             street: int = 0,
+             bucket: int | None = None) -> int:
+    """Pack information set fields into a single 64-bit integer key
+
+    Args:
+        pot_amount (int): chips collected in the pot
+        hole_cards (tuple[int, ...]): up to two hole cards as integers from 
+                        util.cards; their order does not affect the key
+        am_opening (bool): whether the player opened the betting
+        my_bet (int): the player's bet on the current street
+        opponent_bet (int): the opponent's bet on the current street
+        street (int): the street index, 0 (preflop) through 3 (river)
+        bucket (int | None): card abstraction bucket, packed in place of 
+                        the hole cards when given
+
+    Returns:
+        int: the packed key
+    """
+    if bucket is not None:
+        assert 0 <= bucket < MAX_BUCKETS, f"Bucket {bucket} does not fit in a key."
+        key = bucket + 1
+    else:
+        key = 0
+        # card fields store index + 1 so that an absent card packs as zero
+        for card in sorted(hole_cards, reverse=True):
+            key = (key << _CARD_BITS) | (card + 1)
+    key = (key << _STREET_BITS) | street
+    key = (key << 1) | am_opening
+    key = (key << _CHIP_BITS) | _bucket_chips(pot_amount)
+    key = (key << _CHIP_BITS) | _bucket_chips(my_bet)
+    key = (key << _CHIP_BITS) | _bucket_chips(opponent_bet)
+    return key
+
+
+def pack_keys(pot_amount: int,
+              hole_cards: np.ndarray,
+              am_opening: bool,
+              my_bet: int,
+              opponent_bet: int,
+              street: int = 0,
+              buckets: np.ndarray | None = None) -> np.ndarray:
+    """Pack the keys of many hands sharing the same betting state
+
+    Args:
+        hole_cards (np.ndarray): (batch, 2) hole cards
+        buckets (np.ndarray | None): (batch,) card abstraction buckets,
+                        packed in place of the hole cards when given
+        see pack_key() for the other fields
+
+    Returns:
+        np.ndarray: (batch,) uint64 keys equal to those of pack_key()
+    """
+    if buckets is not None:
+        fields = np.asarray(buckets, dtype=np.uint64) + np.uint64(1)
+        assert not len(fields) or fields.max() <= MAX_BUCKETS, "Buckets do not fit in a key."
+    else:
+        cards = -np.sort(-np.asarray(hole_cards, dtype=np.int64), axis=1)
+        fields = np.zeros(len(cards), dtype=np.uint64)
+        for column in cards.T:
+            fields = (fields << np.uint64(_CARD_BITS)) | (column + 1).astype(np.uint64)
+    betting = pack_key(pot_amount, (), am_opening, my_bet, opponent_bet, street)
+    return (fields << np.uint64(_HOLE_CARDS_SHIFT)) | np.uint64(betting)
+
+
+def unpack_key(key: int) -> tuple[int, tuple[int, ...], bool, int, int, int]:
+    """Recover the (bucketed) fields packed into a key by pack_key
+
+    The hole cards of keys packed with a card abstraction bucket are 
+    meaningless.
+    """
+    hole_cards = []
+    cards = key >> _HOLE_CARDS_SHIFT
+    while cards:
+        hole_cards.append((cards & _CARD_MASK) - 1)
+        cards >>= _CARD_BITS
+    return ((key >> _POT_SHIFT) & _CHIP_MASK,
+            tuple(sorted(hole_cards, reverse=True)),
+            bool((key >> _OPENING_SHIFT) & 1),
+            (key >> _MY_BET_SHIFT) & _CHIP_MASK,
+            (key >> _OPPONENT_BET_SHIFT) & _CHIP_MASK,
+            (key >> _STREET_SHIFT) & ((1 << _STREET_BITS) - 1))
+
 
 # TODO adapt to HUNL
 class InfoSet:
     """Represents all information about the game state available to a player"""
 
-    def __init__(self, state: State, player_index: int):
-        """Create an information set object for a state from the perspective of a player"""
+    def __init__(self, state: State, player_index: int, abstraction: CardAbstraction | None = None):
+        """Create an information set object for a state from the perspective of a player
+
+        If a card abstraction is given, the hole cards and board are keyed 
+        by their bucket instead of the exact hole cards.
+        """
         opponent_index = 1 if player_index == 0 else 0
 
         # set fields based on available knowledge
-        self.pot_amount = next(state.pot_amounts)  # 3
+        self.pot_amount = next(state.pot_amounts, 0)  # 3
         self.hole_cards = tuple(state.hole_cards[player_index])  # 3
         self.am_opening = state.opener_index == player_index  # 2
         self.my_bet = state.bets[player_index]  # 2
         self.opponent_bet = state.bets[opponent_index]  # 2
+        self.street = state.street_index if state.street_index is not None else 0
+        hole_cards = tuple(card_index(card) for card in self.hole_cards)
+        self.bucket = None
+        if abstraction is not None:
+            self.bucket = abstraction.bucket(self.street,
+                                             hole_cards,
+                                             tuple(card_index(card)
+                                                   for card in state.get_board_cards(0)))
+
+        # pack the fields once so that tables never rehash card objects
+        self.key = pack_key(self.pot_amount,
+                            hole_cards,
+                            self.am_opening,
+                            self.my_bet,
+                            self.opponent_bet,
+                            self.street,
+                            self.bucket)
+
+    @classmethod
+    def from_fields(cls,
+                    pot_amount: int,
+                    hole_cards: tuple[int, ...],
+                    am_opening: bool,
+                    my_bet: int,
+                    opponent_bet: int,
+                    street: int = 0,
+                    bucket: int | None = None) -> 'InfoSet':
+        """Create an information set without a pokerkit State
+
+        Args:
+            see pack_key(); hole cards are integers from util.cards
+        """
+        result = cls.__new__(cls)
+        result.pot_amount = pot_amount
+        result.hole_cards = hole_cards
+        result.am_opening = am_opening
+        result.my_bet = my_bet
+        result.opponent_bet = opponent_bet
+        result.street = street
+        result.bucket = bucket
+        result.key = pack_key(pot_amount, hole_cards, am_opening, my_bet, opponent_bet,
+                              street, bucket)
+        return result
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, InfoSet) and self.key == other.key
 
 
 class InfoSetMap:
-    """Maps information sets to dict[ActionType, float]
+    """Maps information sets to dict[Action, float]
 
     This class is useful for efficiently storing and retrieving regrets and 
-    strategies as associated with information sets.
+    strategies as associated with information sets. Each information set is 
+    identified by its packed 64-bit key and assigned a dense integer id on 
+    first use. Its values are stored in that row of a contiguous 
+    (n_infosets, n_actions) array indexed by Action.value, and a bitmask per 
+    row records which actions have been set.
+
+    Maps loaded from a file are memory-mapped read-only: rows are found by 
+    binary search over the sorted key section and pages are shared between 
+    processes. The first set_action copies the table into memory. Maps 
+    loaded from a compressed file (see util.blocks) are lazy: a row read 
+    through get_row or get_actions decompresses only its block, into an LRU 
+    cache bounded by cache_bytes. Any other access decompresses the whole 
+    table.
+
+    Rows changed by set_action are flagged dirty until clear_dirty(), so 
+    checkpoints can write only what changed since the last one.
     """
 
-    def __init__(self, filename: str | None = None):
-        """Create an empty information set map or populate a new one from a file"""
+    def __init__(self,
+                 filename: str | None = None,
+                 dtype: type = np.float64,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES):
+        """Create an empty information set map or populate a new one from a file
+
+        Args:
+            filename (str | None): file previously written by save_to_file
+            dtype (type): float type of the value array (np.float32 halves 
+                        the memory footprint of large tables)
+            cache_bytes (int): memory budget of decompressed blocks when 
+                        filename is a compressed file
+        """
+        self._blocks = None
         if filename is not None:
-            with open(filename, 'rb') as file:
-                self._root = pickle.load(file)
-        else:
-            self._root = {}
+            self._map_file(filename, cache_bytes)
+            return
 
-    def set_action(self, key: InfoSet, act: Action, val: float) -> None:
-        """Set the float value associated with an action in an information set"""
-        current_node = self._root
+        self._keys = np.zeros(_INITIAL_CAPACITY, dtype=np.uint64)
+        self._values = np.zeros((_INITIAL_CAPACITY, _N_ACTIONS), dtype=dtype)
+        self._masks = np.zeros(_INITIAL_CAPACITY, dtype=np.uint8)
+        self._dirty = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self._size = 0
+        self._ids = {}
 
-        # partition by pot_amount
-        next_node = current_node.get(key.pot_amount)
-        if next_node is not None:
-            current_node = next_node
-        else:
-            current_node[key.pot_amount] = {
-                key.hole_cards: {
-                    key.am_opening: {
-                        key.my_bet: {
-                            key.opponent_bet: {
-                                act: val
-                            }
-                        }
-                    }
-                }
-            }
-            return
+    @classmethod
+    def from_arrays(cls,
+                    keys: np.ndarray,
+                    values: np.ndarray,
+                    masks: np.ndarray) -> 'InfoSetMap':
+        """Create an information set map holding copies of existing rows
 
-        # partition by hole_cards
-        next_node = current_node.get(key.hole_cards)
-        if next_node is not None:
-            current_node = next_node
-        else:
-            current_node[key.hole_cards] = {
-                key.am_opening: {
-                    key.my_bet: {
-                        key.opponent_bet: {
-                            act: val
-                        }
-                    }
-                }
-            }
-            return
+        Args:
+            keys (np.ndarray): distinct packed InfoSet keys
+            values (np.ndarray): (len(keys), n_actions) values
+            masks (np.ndarray): bitmask of the set actions of each row
+        """
+        result = cls(dtype=values.dtype)
+        result._keys = np.array(keys, dtype=np.uint64)
+        result._values = np.array(values)
+        result._masks = np.array(masks, dtype=np.uint8)
+        result._dirty = np.zeros(len(result._keys), dtype=bool)
+        result._size = len(result._keys)
+        result._ids = {key: index for index, key in enumerate(result.keys.tolist())}
+        return result
 
-        # partition by am_opening
-        next_node = current_node.get(key.am_opening)
-        if next_node is not None:
-            current_node = next_node
-        else:
-            current_node[key.am_opening] = {
-                key.my_bet: {
-                    key.opponent_bet: {
-                        act: val
-                    }
-                }
-            }
-            return
+    def __len__(self) -> int:
+        return self._size
 
-        # partition by my_bet
-        next_node = current_node.get(key.my_bet)
-        if next_node is not None:
-            current_node = next_node
-        else:
-            current_node[key.my_bet] = {
-                key.opponent_bet: {
-                    act: val
-                }
-            }
-            return
+    @property
+    def keys(self) -> np.ndarray:
+        """Packed InfoSet keys, indexed by id"""
+        if self._blocks is not None:
+            self._thaw()
+        return self._keys[:self._size]
 
-        # partition by opponent_bet
-        next_node = current_node.get(key.opponent_bet)
-        if next_node is not None:
-            current_node = next_node
-        else:
-            current_node[key.opponent_bet] = {
-                act: val
-            }
-            return
+    @property
+    def values(self) -> np.ndarray:
+        """(n_infosets, n_actions) view of the stored values, indexed by id"""
+        if self._blocks is not None:
+            self._thaw()
+        return self._values[:self._size]
 
-        # set action
-        current_node[act] = val
+    @property
+    def masks(self) -> np.ndarray:
+        """Per-infoset bitmask of the actions that have been set"""
+        if self._blocks is not None:
+            self._thaw()
+        return self._masks[:self._size]
 
-    def get_actions(self, key: InfoSet) -> dict[Action, float]:
-        """Get the dict[ActionType, float] associated with an information set"""
-        current_node = self._root
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory by the table's arrays, including spare 
+        capacity; zero for memory-mapped and compressed tables"""
+        if self._ids is None:
+            return 0
+        return sum(array.nbytes for array in (self._keys, self._values, self._masks, self._dirty))
 
-        # partition by pot_amount
-        next_node = current_node.get(key.pot_amount)
-        if next_node is None:
-            return None
-        current_node = next_node
+    def infoset_id(self, key: InfoSet, create: bool = False) -> int | None:
+        """Get the dense integer id of an information set
 
-        # partition by hole_cards
-        next_node = current_node.get(key.hole_cards)
-        if next_node is None:
-            return None
-        current_node = next_node
+        Args:
+            key (InfoSet): the information set to look up
+            create (bool): allocate a new row if the information set is unseen
 
-        # partition by am_opening
-        next_node = current_node.get(key.am_opening)
-        if next_node is None:
-            return None
-        current_node = next_node
+        Returns:
+            int | None: the row of the information set, or None if unseen and 
+                        create is False
+        """
+        return self._row(key.key, create)
+
+    def set_action(self, key: InfoSet, act: Action, val: float) -> None:
+        """Set the float value associated with an action in an information set"""
+        if self._ids is None:
+            self._thaw()
+        index = self._row(key.key, create=True)
+        self._values[index, act.value] = val
+        self._masks[index] |= 1 << act.value
+        self._dirty[index] = True
 
-        # partition by my_bet
-        next_node = current_node.get(key.my_bet)
-        if next_node is None:
+    def get_actions(self, key: InfoSet) -> dict[Action, float] | None:
+        """Get the dict[Action, float] associated with an information set"""
+        row = self.get_row(key)
+        if row is None:
             return None
-        current_node = next_node
+        return _actions_dict(row[1], row[0])
 
-        # partition by opponent_bet
-        next_node = current_node.get(key.opponent_bet)
-        if next_node is None:
+    def get_row(self, key: InfoSet) -> tuple[np.ndarray, int] | None:
+        """Get the values, indexed by Action.value, and the action bitmask of 
+        an information set, or None if unseen"""
+        if self._blocks is not None:
+            return self._blocks.row(key.key)
+        index = self._lookup(key.key)
+        if index is None:
             return None
-        current_node = next_node
+        return self._values[index], int(self._masks[index])
+
+    def get_rows(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Look up many packed keys at once
+
+        Args:
+            keys (np.ndarray): packed InfoSet keys
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: the (batch, n_actions)
+                        values and the action bitmasks of the keys, zero for
+                        unseen keys, and whether each key was found
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        if self._blocks is not None:
+            values = np.zeros((len(keys), _N_ACTIONS), dtype=self._blocks.value_dtype)
+            masks = np.zeros(len(keys), dtype=np.uint8)
+            found = np.zeros(len(keys), dtype=bool)
+            for index, key in enumerate(keys.tolist()):
+                row = self._blocks.row(key)
+                if row is not None:
+                    values[index], masks[index], found[index] = row[0], row[1], True
+            return values, masks, found
+
+        if not self._size:
+            return (np.zeros((len(keys), _N_ACTIONS), dtype=self._values.dtype),
+                    np.zeros(len(keys), dtype=np.uint8), np.zeros(len(keys), dtype=bool))
+        if self._ids is not None:
+            ids = np.array([self._ids.get(key, -1) for key in keys.tolist()], dtype=np.int64)
+            found = ids >= 0
+        else:
+            # memory-mapped tables are sorted by key
+            ids = np.minimum(np.searchsorted(self._keys, keys), self._size - 1)
+            found = self._keys[ids] == keys
+        ids = np.where(found, ids, 0)
+        return (np.where(found[:, None], self._values[ids], 0),
+                np.where(found, self._masks[ids], 0).astype(np.uint8), found)
+
+    def dirty_ids(self) -> np.ndarray:
+        """Ids of the rows set since the last clear_dirty()"""
+        if self._ids is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self._dirty[:self._size])
 
-        # return action mappings
-        return current_node
+    def clear_dirty(self) -> None:
+        """Mark every row as clean"""
+        if self._ids is not None:
+            self._dirty[:self._size] = False
 
-    def save_to_file(self, filename: str) -> None:
-        """Save this information set map to a file for future use"""
-        with open(filename, 'wb') as file:
-            pickle.dump(self._root, file)
+    def subset(self, ids: np.ndarray) -> 'InfoSetMap':
+        """Create an information set map holding copies of some rows"""
+        return InfoSetMap.from_arrays(self.keys[ids], self.values[ids], self.masks[ids])
 
-    def _convert_keys_to_str(self, obj: dict | list | Any):
-        """Private, recursive helper method to convert all keys to printable strings"""
-        if isinstance(obj, dict):
-            return {str(k): self._convert_keys_to_str(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [self._convert_keys_to_str(item) for item in obj]
-        return obj
+    def update(self, other: 'InfoSetMap') -> None:
+        """Overwrite or add every row of another map, leaving them dirty"""
+        if self._ids is None:
+            self._thaw()
+        ids = np.array([self._row(key, create=True) for key in other.keys.tolist()],
+                       dtype=np.int64)
+        self._values[ids] = other.values
+        self._masks[ids] = other.masks
+        self._dirty[ids] = True
+
+    def save_to_file(self,
+                     filename: str,
+                     codec: str | None = None,
+                     quantization: str | None = None,
+                     block_rows: int = 4096) -> None:
+        """Save this information set map to a file for future use
+
+        The file is written under a temporary name, flushed to disk and then 
+        renamed, so an interrupted save never leaves a partial file behind.
+
+        Args:
+            filename (str): the file to write
+            codec (str | None): 'none', 'zlib' or 'lzma' to write the 
+                        compressed block format of util.blocks; None writes 
+                        the uncompressed format unless quantization is given
+            quantization (str | None): 'float16', or 'uint8' for tables of 
+                        probabilities, to shrink the values of a compressed 
+                        file; play-only tables tolerate the lost precision
+            block_rows (int): rows per compressed block
+        """
+        order = np.argsort(self.keys, kind='stable')
+        values = self.values[order]
+        temporary = f"{filename}.tmp"
+        with open(temporary, 'wb') as file:
+            if codec is not None or quantization is not None:
+                write_table(file, self.keys[order], self.masks[order], values,
+                            codec or 'zlib', quantization, block_rows)
+            else:
+                header = _FILE_HEADER.pack(_FILE_MAGIC,
+                                           _FILE_VERSION,
+                                           _N_ACTIONS,
+                                           values.dtype.itemsize,
+                                           self._size)
+                for section in (header,
+                                self.keys[order].tobytes(),
+                                self.masks[order].tobytes(),
+                                values.tobytes()):
+                    file.write(section)
+                    file.write(bytes(-len(section) % _FILE_ALIGNMENT))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
 
     def to_string(self) -> str:
         """Create a JSON string based on this data structure"""
-        str_keys = self._convert_keys_to_str(self._root)
+        str_keys = {str(infoset_key): {str(act): val
+                                       for act, val in self._row_to_dict(index).items()}
+                    for index, infoset_key in enumerate(self.keys.tolist())}
         result = json.dumps(str_keys)
         return result
+
+    def _row(self, key: int, create: bool) -> int | None:
+        """Private helper method to find or allocate the row of a packed key"""
+        index = self._lookup(key)
+        if index is None and create:
+            if self._ids is None:
+                self._thaw()
+            index = self._size
+            if index == len(self._masks):
+                self._grow()
+            self._keys[index] = key
+            self._ids[key] = index
+            self._size += 1
+        return index
+
+    def _lookup(self, key: int) -> int | None:
+        """Private helper method to find the row of a packed key"""
+        if self._ids is not None:
+            return self._ids.get(key)
+        if self._blocks is not None:
+            self._thaw()
+            return self._ids.get(key)
+
+        # memory-mapped tables are sorted by key
+        index = int(np.searchsorted(self._keys, np.uint64(key)))
+        if index < self._size and self._keys[index] == key:
+            return index
+        return None
+
+    def _map_file(self, filename: str, cache_bytes: int) -> None:
+        """Private helper method to memory-map a file written by save_to_file"""
+        with open(filename, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # lookups hit scattered rows, so read ahead only what is touched
+        if hasattr(mmap, 'MADV_RANDOM'):
+            buffer.madvise(mmap.MADV_RANDOM)
+
+        magic, version, n_actions, itemsize, count = \
+            _FILE_HEADER.unpack_from(buffer)
+        if magic == _FILE_MAGIC and version == _BLOCK_FILE_VERSION:
+            buffer.close()
+            self._map_blocks(filename, cache_bytes)
+            return
+        if magic != _FILE_MAGIC or version != _FILE_VERSION:
+            raise ValueError(f"{filename} is not a version {_FILE_VERSION} "
+                             "information set map file.")
+        if n_actions != _N_ACTIONS:
+            raise ValueError(f"{filename} stores {n_actions} actions per "
+                             f"information set, expected {_N_ACTIONS}.")
+
+        offset = _aligned(_FILE_HEADER.size)
+        self._keys = np.frombuffer(buffer, np.uint64, count, offset)
+        offset = _aligned(offset + self._keys.nbytes)
+        self._masks = np.frombuffer(buffer, np.uint8, count, offset)
+        offset = _aligned(offset + self._masks.nbytes)
+        self._values = np.frombuffer(buffer, np.dtype(f'f{itemsize}'),
+                                     count * n_actions, offset)
+        self._values = self._values.reshape(count, n_actions)
+        self._size = count
+        self._dirty = None
+        self._ids = None
+
+    def _map_blocks(self, filename: str, cache_bytes: int) -> None:
+        """Private helper method to open a compressed file for block reads"""
+        self._blocks = BlockTable(filename, cache_bytes)
+        if self._blocks.n_actions != _N_ACTIONS:
+            raise ValueError(f"{filename} stores {self._blocks.n_actions} actions per "
+                             f"information set, expected {_N_ACTIONS}.")
+        self._keys = self._values = self._masks = None
+        self._size = self._blocks.count
+        self._dirty = None
+        self._ids = None
+
+    def _thaw(self) -> None:
+        """Private helper method to copy a memory-mapped or compressed table 
+        into memory"""
+        if self._blocks is not None:
+            self._keys, self._masks, self._values = self._blocks.read_all()
+            self._blocks = None
+        self._keys = self._keys.copy()
+        self._values = self._values.copy()
+        self._masks = self._masks.copy()
+        self._dirty = np.zeros(len(self._masks), dtype=bool)
+        self._ids = {key: index for index, key in enumerate(self.keys.tolist())}
+
+    def _row_to_dict(self, index: int) -> dict[Action, float]:
+        """Private helper method to build the action mapping of a single row"""
+        return _actions_dict(self._masks[index], self._values[index])
+
+    def _grow(self) -> None:
+        """Private helper method to double the capacity of the value arrays"""
+        capacity = max(2 * len(self._masks), _INITIAL_CAPACITY)
+        keys = np.zeros(capacity, dtype=np.uint64)
+        keys[:len(self._keys)] = self._keys
+        values = np.zeros((capacity, _N_ACTIONS), dtype=self._values.dtype)
+        values[:len(self._values)] = self._values
+        masks = np.zeros(capacity, dtype=np.uint8)
+        masks[:len(self._masks)] = self._masks
+        dirty = np.zeros(capacity, dtype=bool)
+        dirty[:len(self._dirty)] = self._dirty
+        self._keys = keys
+        self._values = values
+        self._masks = masks
+        self._dirty = dirty
+
+
+class SharedInfoSetMap:
+    """Maps information sets to dict[Action, float] in shared memory
+
+    Counterpart of InfoSetMap for parallel training. Rows live in a fixed 
+    capacity open-addressing hash table in a multiprocessing.shared_memory 
+    block, so every process holding the map (passed to it as a Process 
+    argument) reads and writes the same rows. Only claiming a slot for a 
+    new information set takes a lock. Values are updated without locking in 
+    the Hogwild style: concurrent updates to one row may occasionally lose 
+    an increment, which sampled CFR tolerates.
+    """
+
+    def __init__(self, capacity: int, dtype: type = np.float64):
+        """Create an empty shared information set map
+
+        Args:
+            capacity (int): the number of information sets the map must hold
+            dtype (type): float type of the value array
+        """
+        # keep the table at most half full to bound probe lengths
+        slots = 1
+        while slots < 2 * capacity:
+            slots *= 2
+        self._slots = slots
+        self._dtype = np.dtype(dtype)
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=_shared_size(slots, self._dtype))
+        self._lock = multiprocessing.Lock()
+        self._attach()
+        self._keys.fill(_EMPTY_KEY)
+
+    def __getstate__(self) -> dict:
+        return {'name': self._shm.name,
+                'slots': self._slots,
+                'dtype': self._dtype,
+                'lock': self._lock}
+
+    def __setstate__(self, state: dict) -> None:
+        self._slots = state['slots']
+        self._dtype = state['dtype']
+        self._lock = state['lock']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._attach()
+
+    def __len__(self) -> int:
+        return int(self._count[0])
+
+    def infoset_id(self, key: InfoSet, create: bool = False) -> int | None:
+        """Get the hash table slot of an information set
+
+        Args:
+            key (InfoSet): the information set to look up
+            create (bool): claim a slot if the information set is unseen
+
+        Returns:
+            int | None: the slot of the information set, or None if unseen 
+                        and create is False
+        """
+        slot = self._probe(key.key)
+        if self._keys[slot] == key.key:
+            return slot
+        if not create:
+            return None
+
+        with self._lock:
+            # another process may have claimed a slot since the probe
+            slot = self._probe(key.key)
+            if self._keys[slot] != key.key:
+                if self._count[0] == self._slots // 2:
+                    raise RuntimeError("Shared information set map is full.")
+                self._keys[slot] = key.key
+                self._count[0] += 1
+        return slot
+
+    def set_action(self, key: InfoSet, act: Action, val: float) -> None:
+        """Set the float value associated with an action in an information set"""
+        slot = self.infoset_id(key, create=True)
+        self._values[slot, act.value] = val
+        bit = 1 << act.value
+        if not self._masks[slot] & bit:
+            # an unlocked read-modify-write racing another process would drop 
+            # one of the bits, hiding its action for good
+            with self._lock:
+                self._masks[slot] |= bit
+
+    def get_actions(self, key: InfoSet) -> dict[Action, float] | None:
+        """Get the dict[Action, float] associated with an information set"""
+        slot = self._probe(key.key)
+        if self._keys[slot] != key.key:
+            return None
+        return _actions_dict(self._masks[slot], self._values[slot])
+
+    def to_infoset_map(self) -> InfoSetMap:
+        """Copy the occupied rows into a private InfoSetMap"""
+        occupied = self._keys != _EMPTY_KEY
+        return InfoSetMap.from_arrays(self._keys[occupied],
+                                      self._values[occupied],
+                                      self._masks[occupied])
+
+    def close(self) -> None:
+        """Detach this process from the shared memory block"""
+        self._keys = self._values = self._masks = self._count = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Free the shared memory block once every process has closed it"""
+        self._shm.unlink()
+
+    def _probe(self, key: int) -> int:
+        """Private helper method to find the slot holding a key, or the empty 
+        slot where it would be inserted"""
+        mask = self._slots - 1
+        slot = _mix(key) >> self._shift
+        keys = self._keys
+        while keys[slot] != key and keys[slot] != _EMPTY_KEY:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _attach(self) -> None:
+        """Private helper method to view the shared memory block as arrays"""
+        buffer = self._shm.buf
+        slots = self._slots
+        self._shift = 64 - (slots.bit_length() - 1)
+        self._count = np.ndarray(1, np.int64, buffer, 0)
+        offset = 8
+        self._keys = np.ndarray(slots, np.uint64, buffer, offset)
+        offset += self._keys.nbytes
+        self._values = np.ndarray((slots, _N_ACTIONS), self._dtype, buffer, offset)
+        offset += self._values.nbytes
+        self._masks = np.ndarray(slots, np.uint8, buffer, offset)
+
+
+def _mix(key: int) -> int:
+    """Private helper to hash a packed key with the splitmix64 finalizer"""
+    key = ((key ^ (key >> 30)) * _MIX_MULTIPLIERS[0]) & _UINT64_MASK
+    key = ((key ^ (key >> 27)) * _MIX_MULTIPLIERS[1]) & _UINT64_MASK
+    return key ^ (key >> 31)
+
+
+def _shared_size(slots: int, dtype: np.dtype) -> int:
+    """Private helper for the byte size of a SharedInfoSetMap block"""
+    return 8 + slots * (8 + _N_ACTIONS * dtype.itemsize + 1)
+
+
+def _actions_dict(mask: int, row: np.ndarray) -> dict[Action, float]:
+    """Private helper to build the action mapping of a single row"""
+    mask = int(mask)
+    return {act: float(row[act.value])
+            for act in _ACTIONS if mask & (1 << act.value)}
+
+
+def _aligned(offset: int) -> int:
+    """Private helper to round a file offset up to the section alignment"""
+    return offset + (-offset % _FILE_ALIGNMENT)
@@ -0,0 +1,161 @@
+"""JSON over HTTP/1.1 keep-alive on asyncio streams
+
+The match client, the mock Slumbot server and the strategy server all
+exchange small JSON bodies many times a second. Keeping connections open
+between requests skips a TCP (and TLS) handshake per request, and the
+standard library's asyncio streams are enough for the little of HTTP/1.1
+that needs. Errors are reported in an error_msg field, as Slumbot does.
+"""
+import asyncio
+import json
+import ssl
+import urllib.parse
+from collections.abc import Awaitable, Callable
+
+JSONHandler = Callable[[str, dict], Awaitable[dict]]
+
+
+class ConnectionPool:
+    """HTTP/1.1 keep-alive connections to one server, shared by sessions
+
+    At most size requests are in flight at once; connections are opened on
+    demand and kept open for the next request.
+    """
+
+    def __init__(self, url: str, size: int) -> None:
+        """Create a pool
+
+        Args:
+            url (str): base URL of the server, http or https
+            size (int): maximum number of open connections
+        """
+        parsed = urllib.parse.urlsplit(url)
+        self._host = parsed.hostname
+        secure = parsed.scheme == 'https'
+        self._port = parsed.port or (443 if secure else 80)
+        self._ssl = ssl.create_default_context() if secure else None
+        self._prefix = parsed.path.rstrip('/')
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+
+    async def post(self, path: str, payload: dict) -> dict:
+        """Send a JSON request and return the JSON response
+
+        A request that fails on a reused connection, which the server may
+        have closed while it was idle, is retried once on a new one.
+
+        Raises:
+            RuntimeError: if the server reports an error
+        """
+        body = json.dumps(payload).encode()
+        request = (f"POST {self._prefix}{path} HTTP/1.1\r\n"
+                   f"Host: {self._host}\r\n"
+                   f"Content-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n"
+                   f"Connection: keep-alive\r\n\r\n").encode() + body
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await asyncio.open_connection(
+                    self._host, self._port, ssl=self._ssl)
+                try:
+                    writer.write(request)
+                    status, keep_alive, content = await read_response(reader)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if not reused:
+                        raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+
+        response = json.loads(content) if content else {}
+        if status != 200 or 'error_msg' in response:
+            raise RuntimeError(f"{path} failed with status {status}: "
+                               f"{response.get('error_msg', content[:200])}")
+        return response
+
+    async def close(self) -> None:
+        """Close the idle connections"""
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, bool, bytes]:
+    """Read an HTTP/1.1 response
+
+    Returns:
+        tuple[int, bool, bytes]: the status code, whether the connection
+                    stays open, and the body
+    """
+    status_line = await reader.readuntil(b'\r\n')
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await reader.readuntil(b'\r\n')) != b'\r\n':
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        chunks = []
+        while size := int((await reader.readuntil(b'\r\n')).split(b';')[0], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # trailers end with a blank line
+        while await reader.readuntil(b'\r\n') != b'\r\n':
+            pass
+        content = b''.join(chunks)
+    else:
+        content = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection') != 'close', content
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, bytes]:
+    """Read an HTTP/1.1 request
+
+    Returns:
+        tuple[str, bytes]: the path and the body
+    """
+    request_line = await reader.readuntil(b'\r\n')
+    path = request_line.split()[1].decode()
+    length = 0
+    while (line := await reader.readuntil(b'\r\n')) != b'\r\n':
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+    return path, await reader.readexactly(length)
+
+
+def json_connection(handle: JSONHandler):
+    """Wrap a handler of JSON requests into an asyncio.start_server callback
+
+    Args:
+        handle (JSONHandler): returns the response to (path, request);
+                    responses with an error_msg are sent with status 400
+
+    Returns:
+        the callback, serving one connection's requests in order
+    """
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                path, body = await read_request(reader)
+                try:
+                    request = json.loads(body) if body else {}
+                except json.JSONDecodeError:
+                    response = {'error_msg': "Malformed request."}
+                else:
+                    response = await handle(path, request)
+                content = json.dumps(response).encode()
+                status = '400 Bad Request' if 'error_msg' in response else '200 OK'
+                writer.write(f"HTTP/1.1 {status}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(content)}\r\n\r\n".encode() + content)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    return serve
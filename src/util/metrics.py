@@ -0,0 +1,181 @@
+"""Throughput, phase timing and memory metrics of training runs
+
+TrainingMetrics counts iterations and tree nodes, times the phases of a
+tree walk and measures the size of the tables, and every so many epochs
+appends a sample of the rates since the previous one to a CSV or JSON
+lines file.
+
+Phases are timed by wrapping the functions that implement them for as long
+as the metrics are attached, and restoring the originals afterwards, so
+training without metrics runs the unmodified code. Phases nest (a showdown
+runs inside the state update that ends the hand), so each phase is charged
+its exclusive time, not counting the phases it calls. Timing every call
+adds a fraction of a microsecond to each, which inflates the totals a
+little but not the split between phases.
+"""
+import csv
+import functools
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    # Windows has neither getrusage nor /proc
+    resource = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class TrainingMetrics:
+    """Samples the performance of a training run into a file
+
+    Use as a context manager around training, calling record() once per
+    epoch.
+    """
+
+    def __init__(self,
+                 filename: str,
+                 every: int = 10000,
+                 phases: dict[str, list[tuple[object, str]]] | None = None,
+                 counters: dict[str, tuple[object, str]] | None = None) -> None:
+        """Prepare a metrics file
+
+        Args:
+            filename (str): file to append samples to; CSV if it ends in
+                        .csv, JSON lines otherwise
+            every (int): number of epochs between samples
+            phases (dict[str, list[tuple[object, str]]] | None): the
+                        (owner, attribute) of each function timed under a
+                        phase name
+            counters (dict[str, tuple[object, str]] | None): the (owner,
+                        attribute) of each function whose calls are counted
+                        under a name, e.g. the nodes of a tree walk
+        """
+        self.filename = filename
+        self.every = every
+        self._phases = phases or {}
+        self._counters = counters or {}
+        self._originals = []
+        self._times = dict.fromkeys(self._phases, 0)
+        self._counts = dict.fromkeys(self._counters, 0)
+        # time spent in nested phases, per active phase call
+        self._nested = []
+        self._epochs = 0
+        self._file = None
+        self._writer = None
+        self._last = None
+
+    def __enter__(self) -> 'TrainingMetrics':
+        self.attach()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.detach()
+
+    def attach(self) -> None:
+        """Install the phase timers and counters and open the file"""
+        for phase, targets in self._phases.items():
+            for owner, name in targets:
+                self._wrap(owner, name, self._timed(phase, getattr(owner, name)))
+        for counter, (owner, name) in self._counters.items():
+            self._wrap(owner, name, self._counted(counter, getattr(owner, name)))
+        self._file = open(self.filename, 'a', newline='', encoding='utf-8')
+        self._last = (time.perf_counter(), self._epochs, dict(self._times), dict(self._counts))
+
+    def detach(self) -> None:
+        """Restore the original functions and close the file"""
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, epoch: int, *tables) -> None:
+        """Count a completed epoch, and write a sample if epoch is a multiple 
+        of every
+
+        Args:
+            epoch (int): number of epochs completed, including those of 
+                        earlier runs resumed from a checkpoint
+            tables: the InfoSetMaps of the run, whose sizes are recorded
+        """
+        self._epochs += 1
+        if epoch % self.every:
+            return
+        now = time.perf_counter()
+        last_time, last_epochs, last_times, last_counts = self._last
+        seconds = now - last_time
+        sample = {'epoch': epoch,
+                  'seconds': round(seconds, 6),
+                  'iterations_per_sec': round((self._epochs - last_epochs) / seconds, 3)}
+        for counter, count in self._counts.items():
+            sample[f'{counter}_per_sec'] = round((count - last_counts[counter]) / seconds, 3)
+        for phase, nanoseconds in self._times.items():
+            sample[f'{phase}_fraction'] = round(
+                (nanoseconds - last_times[phase]) / 1e9 / seconds, 6)
+        sample['table_rows'] = sum(len(table) for table in tables)
+        sample['table_bytes'] = sum(table.nbytes for table in tables)
+        sample['rss_bytes'] = _resident_bytes()
+        self._write(sample)
+        self._last = (time.perf_counter(), self._epochs, dict(self._times), dict(self._counts))
+
+    def _write(self, sample: dict) -> None:
+        """Private helper method to append a sample to the file"""
+        if not self.filename.endswith('.csv'):
+            self._file.write(json.dumps(sample) + '\n')
+        else:
+            if self._writer is None:
+                self._writer = csv.DictWriter(self._file, fieldnames=list(sample))
+                if self._file.tell() == 0:
+                    self._writer.writeheader()
+            self._writer.writerow(sample)
+        self._file.flush()
+
+    def _wrap(self, owner: object, name: str, wrapper) -> None:
+        """Private helper method to replace a function, remembering the original"""
+        self._originals.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, wrapper)
+
+    def _timed(self, phase: str, function):
+        """Private helper method to wrap a function with a phase timer"""
+        times = self._times
+        nested = self._nested
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            nested.append(0)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                times[phase] += elapsed - nested.pop()
+                if nested:
+                    nested[-1] += elapsed
+        return timed
+
+    def _counted(self, counter: str, function):
+        """Private helper method to wrap a function with a call counter"""
+        counts = self._counts
+
+        @functools.wraps(function)
+        def counted(*args, **kwargs):
+            counts[counter] += 1
+            return function(*args, **kwargs)
+        return counted
+
+
+def _resident_bytes() -> int:
+    """Private helper for the resident set size of this process, 0 where 
+    it cannot be measured"""
+    try:
+        with open('/proc/self/statm', 'r', encoding='ascii') as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        if resource is None:
+            return 0
+        # peak rather than current size, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
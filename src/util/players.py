@@ -1,8 +1,12 @@
 """Interface to represent HUNL players"""
+import random
+
 from pokerkit import State
 
-from actions import Action
-from infosets import InfoSet
+from util.actions import Action
+from util.blocks import DEFAULT_CACHE_BYTES
+from util.infosets import InfoSet, InfoSetMap
+from util.strategies import PolicyTable
 
 
 class Player:
@@ -24,3 +28,59 @@ class Player:
 
     def handle_round_over(self, game_state: State, my_index: int) -> None:
         """Things to do at the end of a round"""
+
+
+class CFRPlayer(Player):
+    """Plays the average strategy of a policy compiled by HeadsUpNLCFR"""
+
+    def __init__(self,
+                 game_state: State,
+                 policy_file: str,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """Load a compiled policy
+
+        Args:
+            game_state (State): the game being played
+            policy_file (str): file written by HeadsUpNLCFR.save_policy_to_file
+            cache_bytes (int): memory budget of the policy's decompressed 
+                        blocks; a match only touches a few of them
+        """
+        self._policy = PolicyTable(policy_file, cache_bytes=cache_bytes)
+
+    def get_action(self, info: InfoSet) -> Action:
+        """Sample an action from the average strategy, checking or calling at 
+        information sets that were never reached during training"""
+        action = self._policy.sample(info)
+        return action if action is not None else Action.CHECK_CALL
+
+    def handle_round_over(self, game_state: State, my_index: int) -> None:
+        return
+
+
+class RegretPlayer(Player):
+    """Plays the regret-matched current strategy of a regret table written by
+    HeadsUpNLCFR.save_regrets_to_file"""
+
+    def __init__(self, game_state: State, regrets_file: str) -> None:
+        """Load a regret table
+
+        Args:
+            game_state (State): the game being played
+            regrets_file (str): the regret table file, memory-mapped
+        """
+        self._regrets = InfoSetMap(regrets_file)
+
+    def get_action(self, info: InfoSet) -> Action:
+        """Sample an action by regret matching, checking or calling at 
+        information sets that were never reached during training"""
+        regrets = self._regrets.get_actions(info)
+        if not regrets:
+            return Action.CHECK_CALL
+        actions = list(regrets)
+        weights = [max(0.0, regrets[action]) for action in actions]
+        if sum(weights) == 0:
+            return random.choice(actions)
+        return random.choices(actions, weights)[0]
+
+    def handle_round_over(self, game_state: State, my_index: int) -> None:
+        return
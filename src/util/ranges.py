@@ -0,0 +1,118 @@
+"""Terminal values of ranges of hole cards
+
+Range-vs-range algorithms carry a weight for each of the 1326 hole-card
+combinations of each player, indexed as util.equity.combo_index(). At a
+terminal node the value of each combination depends on the opposing
+weights of the combinations it can face: those sharing no card with it or
+the board. Rather than multiplying by a 1326 x 1326 matrix, these sums are
+found from per-card totals, and showdowns sort the combinations by hand
+strength once per board, after which each evaluation takes O(n).
+"""
+import numpy as np
+
+from util.cards import N_CARDS
+from util.equity import COMBOS, N_COMBOS
+from util.evaluator import evaluate_many
+
+# combinations holding each card, (N_CARDS, N_CARDS - 1)
+_CARD_COMBOS = np.array([np.flatnonzero((COMBOS == card).any(axis=1))
+                         for card in range(N_CARDS)])
+
+
+def live_combos(board: tuple[int, ...]) -> np.ndarray:
+    """Return which combinations share no card with a board"""
+    return ~np.isin(COMBOS, board).any(axis=1)
+
+
+def opposed_reach(board: tuple[int, ...],
+                  reach: np.ndarray,
+                  live: np.ndarray | None = None) -> np.ndarray:
+    """Opposing weight each combination can face
+
+    Args:
+        board (tuple[int, ...]): the board cards
+        reach (np.ndarray): (N_COMBOS,) weights of the opponent's combinations
+        live (np.ndarray | None): live_combos(board), if already computed
+
+    Returns:
+        np.ndarray: (N_COMBOS,) sum of the weights of the combinations 
+                    sharing no card with the board or each combination; 
+                    zero for combinations on the board
+    """
+    if live is None:
+        live = live_combos(board)
+    weights = reach * live
+    per_card = weights[_CARD_COMBOS].sum(axis=1)
+    # a combination holds both of its own cards, so it is subtracted twice
+    opposed = weights.sum() - per_card[COMBOS[:, 0]] - per_card[COMBOS[:, 1]] + weights
+    return opposed * live
+
+
+def disjoint_combos() -> np.ndarray:
+    """Return whether each pair of combinations shares no card, as a 
+    (N_COMBOS, N_COMBOS) bool array"""
+    masks = (np.int64(1) << COMBOS[:, 0]) | (np.int64(1) << COMBOS[:, 1])
+    return (masks[:, None] & masks[None, :]) == 0
+
+
+def showdown_margins(board: tuple[int, ...], reach: np.ndarray) -> np.ndarray:
+    """Opposing weight each combination beats at showdown less the weight it
+    loses to; see Showdown.margins()"""
+    return Showdown(board).margins(reach)
+
+
+class Showdown:
+    """The combinations of a full board sorted by hand strength, for valuing 
+    showdowns on the board repeatedly"""
+
+    def __init__(self, board: tuple[int, ...]) -> None:
+        """Evaluate and sort every combination on a full board"""
+        self._live = live_combos(board)
+        ranks = np.zeros(N_COMBOS, dtype=np.int64)
+        ranks[self._live] = evaluate_many(np.hstack((COMBOS[self._live],
+                                                     np.tile(board, (int(self._live.sum()), 1)))))
+        self._order, self._below, self._above = _rank_positions(ranks)
+        # the same for the combinations holding each card, with positions 
+        # flattened into (N_CARDS, N_CARDS) rows of cumulative weights
+        positions = [_rank_positions(ranks[members]) for members in _CARD_COMBOS]
+        order, below, above = (np.array(part) for part in zip(*positions))
+        rows = np.arange(N_CARDS)[:, None]
+        self._card_sorted = _CARD_COMBOS[rows, order]
+        self._card_below = (rows * N_CARDS + below).ravel()
+        self._card_above = (rows * N_CARDS + above).ravel()
+
+    def margins(self, reach: np.ndarray) -> np.ndarray:
+        """Opposing weight each combination beats at showdown less the weight
+        it loses to
+
+        Args:
+            reach (np.ndarray): (N_COMBOS,) weights of the opponent's 
+                        combinations
+
+        Returns:
+            np.ndarray: (N_COMBOS,) margins over the combinations sharing no 
+                        card with the board or each combination; zero for 
+                        combinations on the board
+        """
+        weights = reach * self._live
+        cumulative = np.concatenate(([0.0], np.cumsum(weights[self._order])))
+        margins = cumulative[self._below] - (cumulative[-1] - cumulative[self._above])
+
+        # the combination itself ties, so only single shared cards are removed
+        cumulative = np.zeros((N_CARDS, N_CARDS))
+        np.cumsum(weights[self._card_sorted], axis=1, out=cumulative[:, 1:])
+        card_margins = (cumulative.ravel()[self._card_below]
+                        - np.repeat(cumulative[:, -1], N_CARDS - 1)
+                        + cumulative.ravel()[self._card_above])
+        margins -= np.bincount(_CARD_COMBOS.ravel(), card_margins, N_COMBOS)
+        return margins * self._live
+
+
+def _rank_positions(ranks: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Private helper for the sort order of a group of ranks, and for each
+    rank the number of lower ranks and of ranks not higher"""
+    order = np.argsort(ranks, kind='stable')
+    sorted_ranks = ranks[order]
+    return (order,
+            np.searchsorted(sorted_ranks, ranks, side='left'),
+            np.searchsorted(sorted_ranks, ranks, side='right'))
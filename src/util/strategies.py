@@ -0,0 +1,172 @@
+"""Methods to derive strategies from regret and cumulative profile tables"""
+import random
+
+import numpy as np
+
+from util.actions import Action
+from util.blocks import DEFAULT_CACHE_BYTES
+from util.infosets import InfoSet, InfoSetMap
+
+_ACTIONS = tuple(Action)
+_N_ACTIONS = len(_ACTIONS)
+_ACTION_BITS = np.arange(_N_ACTIONS, dtype=np.uint8)
+
+
+def masks_to_legal(masks: np.ndarray) -> np.ndarray:
+    """Expand per-infoset action bitmasks into a (batch, n_actions) bool array"""
+    return ((np.asarray(masks, dtype=np.uint8)[:, None] >> _ACTION_BITS) & 1).astype(bool)
+
+
+def regret_matching(regrets: np.ndarray, legal: np.ndarray) -> np.ndarray:
+    """Regret matching over a batch of information sets
+
+    Each row plays its legal actions in proportion to their positive
+    regret, or uniformly if no legal action has positive regret. Rows with
+    no legal actions are all zero.
+
+    Args:
+        regrets (np.ndarray): (batch, n_actions) cumulative regrets
+        legal (np.ndarray): (batch, n_actions) bool legal-action mask
+
+    Returns:
+        np.ndarray: (batch, n_actions) float64 strategy matrix
+    """
+    positive = np.where(legal, np.maximum(regrets, 0), 0.0)
+    positive_sums = positive.sum(axis=1, keepdims=True)
+    legal_counts = legal.sum(axis=1, keepdims=True)
+    return np.where(positive_sums > 0,
+                    np.divide(positive, positive_sums,
+                              out=np.zeros_like(positive), where=positive_sums > 0),
+                    np.divide(legal, legal_counts,
+                              out=np.zeros(positive.shape), where=legal_counts > 0))
+
+
+def table_regret_matching(table: InfoSetMap,
+                          ids: np.ndarray | None = None,
+                          legal: np.ndarray | None = None) -> np.ndarray:
+    """Regret matching over a block of rows of a regret table
+
+    Args:
+        table (InfoSetMap): regret table
+        ids (np.ndarray | None): infoset ids of the rows; all rows if None
+        legal (np.ndarray | None): (batch, n_actions) legal-action mask;
+                        defaults to the actions set in each row
+
+    Returns:
+        np.ndarray: (batch, n_actions) strategy matrix indexed by Action.value
+    """
+    if ids is None:
+        ids = np.arange(len(table))
+    if legal is None:
+        legal = masks_to_legal(table.masks[ids])
+    return regret_matching(table.values[ids], legal)
+
+
+class PolicyTable:
+    """An average strategy compiled for play
+
+    Each row holds the cumulative probabilities of the actions of one 
+    information set, indexed by Action.value, so choosing an action is one 
+    table lookup and a search over at most n_actions floats. Rows are 
+    stored in an InfoSetMap and therefore share its memory-mapped file 
+    format.
+    """
+
+    def __init__(self,
+                 filename: str | None = None,
+                 table: InfoSetMap | None = None,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES):
+        """Load a compiled policy from a file or wrap a compiled table
+
+        Args:
+            filename (str | None): file previously written by save_to_file; 
+                        compressed files are read lazily
+            table (InfoSetMap | None): rows of cumulative probabilities
+            cache_bytes (int): memory budget of decompressed blocks of a 
+                        compressed file
+        """
+        if filename is not None:
+            table = InfoSetMap(filename, cache_bytes=cache_bytes)
+        self._table = table
+
+    @classmethod
+    def compile(cls, cumulative_profile: InfoSetMap, dtype: type = np.float32) -> 'PolicyTable':
+        """Normalize a cumulative profile into the average strategy
+
+        Args:
+            cumulative_profile (InfoSetMap): the cumulative profile of 
+                        training; actions set in a row are taken as legal
+            dtype (type): float type of the compiled rows
+
+        Returns:
+            PolicyTable: the compiled average strategy
+        """
+        # normalizing positive cumulative probabilities is regret matching
+        legal = masks_to_legal(cumulative_profile.masks)
+        strategy = table_regret_matching(cumulative_profile, legal=legal)
+        cumulative = np.cumsum(strategy, axis=1)
+
+        # guard sampling against rounding by ending every row at exactly one
+        last_legal = _N_ACTIONS - 1 - np.argmax(legal[:, ::-1], axis=1)
+        cumulative[np.arange(_N_ACTIONS) >= last_legal[:, None]] = 1.0
+
+        return cls(table=InfoSetMap.from_arrays(cumulative_profile.keys,
+                                                cumulative.astype(dtype),
+                                                cumulative_profile.masks))
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def save_to_file(self,
+                     filename: str,
+                     codec: str | None = 'zlib',
+                     quantization: str | None = 'uint8',
+                     block_rows: int = 4096) -> None:
+        """Save this policy to a file for future use
+
+        By default rows are stored as compressed uint8 fixed point, which 
+        rounds each cumulative probability by at most 1/510; see 
+        InfoSetMap.save_to_file for the options.
+        """
+        self._table.save_to_file(filename, codec, quantization, block_rows)
+
+    def distribution(self, key: InfoSet) -> dict[Action, float] | None:
+        """Get the average strategy at an information set, or None if unseen"""
+        row = self._table.get_row(key)
+        if row is None:
+            return None
+        cumulative, mask = row
+        result = {}
+        previous = 0.0
+        for act in _ACTIONS:
+            if mask & (1 << act.value):
+                result[act] = float(cumulative[act.value]) - previous
+            previous = float(cumulative[act.value])
+        return result
+
+    def distributions(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Get the average strategies at many information sets
+
+        Args:
+            keys (np.ndarray): packed InfoSet keys
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (batch, n_actions) action
+                        probabilities indexed by Action.value, zero for unseen 
+                        keys, and whether each key was seen
+        """
+        cumulative, masks, found = self._table.get_rows(keys)
+        probabilities = np.diff(cumulative, axis=1, prepend=0.0)
+        return np.where(masks_to_legal(masks), probabilities, 0.0), found
+
+    def sample(self, key: InfoSet) -> Action | None:
+        """Sample an action from the average strategy at an information set
+
+        Returns:
+            Action | None: the sampled action, or None if the information 
+                        set was never reached during training
+        """
+        row = self._table.get_row(key)
+        if row is None:
+            return None
+        return _ACTIONS[int(np.searchsorted(row[0], random.random(), side='right'))]
@@ -0,0 +1,265 @@
+"""Action translation: mapping bets of any size onto the Action abstraction
+
+A real opponent bets amounts the abstract game does not contain. Each such
+bet is mapped onto one of the two abstract sizes around it, chosen at
+random with the pseudo-harmonic mapping of Ganzfried and Sandholm (2013):
+with sizes A < x < B expressed as fractions of the pot, x maps to A with
+probability
+
+    f(x) = (B - x) (1 + A) / ((B - A) (1 + x))
+
+which is exploitable by neither always betting just above A nor just below
+B. Bets below the smallest abstract size map to it, as do bets above the
+largest, which is always all in.
+
+The mapping of a spot depends only on its chip amounts, so ActionTranslator
+computes it once per spot and memoizes it in an LRU cache keyed by the
+amounts packed into one integer. A repeated spot costs a dict lookup and a
+random number; the sizes around the bet and the probability between them
+are never rebuilt.
+
+AbstractHand mirrors a hand played for real onto the abstract game, so
+that a player trained on the abstraction can play it: opponent bets are
+translated onto the abstract state, and the player's abstract bets are
+scaled back to the same fraction of the real pot.
+"""
+import random
+from collections import OrderedDict
+
+from util.abstraction import CardAbstraction
+from util.actions import Action
+from util.betting import ActionTree
+from util.cards import N_CARDS
+from util.games import CARDS_DEALT, HUNLState
+from util.infosets import InfoSet
+from util.players import Player
+
+DEFAULT_MAX_ENTRIES = 1 << 20
+
+_SIZED = (Action.BET_MIN, Action.BET_HALF, Action.BET_FULL)
+_RAISE_MASK = ~(1 << Action.FOLD.value | 1 << Action.CHECK_CALL.value)
+# chip amounts fit in 16 bits, as a pot holds at most 40000 chips
+_CHIP_BITS = 16
+_N_ACTIONS = len(Action)
+
+
+def pseudo_harmonic(lower: float, upper: float, size: float) -> float:
+    """Probability of mapping a bet onto the smaller of the abstract sizes
+    around it, all as fractions of the pot"""
+    return (upper - size) * (1 + lower) / ((upper - lower) * (1 + size))
+
+
+class ActionTranslator:
+    """Stochastic, memoized pseudo-harmonic mapping of real bets onto the
+    sized Actions"""
+
+    def __init__(self, seed: int | None = None, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Create a translator
+
+        Args:
+            seed (int | None): seed of the random choice between sizes
+            max_entries (int): spots memoized, after which the least 
+                        recently used is evicted
+        """
+        self._random = random.Random(seed)
+        self._max_entries = max_entries
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def translate(self, pot: int, stack: int, bet: int, min_raise: int, legal: int) -> Action:
+        """Map a real bet or raise onto an abstract one
+
+        Args:
+            pot (int): chips in the pot once the bettor has called, which
+                        the sizes are fractions of
+            stack (int): chips the bettor has behind after calling, the
+                        size of an all in
+            bet (int): chips the bettor puts in beyond a call
+            min_raise (int): the smallest legal bet or raise beyond a call
+            legal (int): bitmask, by Action.value, of the abstract actions
+                        legal at the spot
+
+        Returns:
+            Action: a legal abstract bet or raise
+        """
+        key = ((((pot << _CHIP_BITS | stack) << _CHIP_BITS | bet) << _CHIP_BITS | min_raise)
+               << _N_ACTIONS | legal)
+        cache = self._cache
+        mapping = cache.get(key)
+        if mapping is None:
+            if len(cache) >= self._max_entries:
+                cache.popitem(last=False)
+            mapping = _mapping(pot, stack, bet, min_raise, legal)
+            cache[key] = mapping
+        else:
+            cache.move_to_end(key)
+        lower, upper, probability = mapping
+        return lower if self._random.random() < probability else upper
+
+
+def _mapping(pot: int,
+             stack: int,
+             bet: int,
+             min_raise: int,
+             legal: int) -> tuple[Action, Action, float]:
+    """Private helper for the abstract sizes around a bet and the probability
+    of the smaller, the sizes computed as HUNLState.raise_to_amount does"""
+    amounts = {Action.BET_MIN: min_raise, Action.BET_HALF: pot // 2, Action.BET_FULL: pot}
+    sizes = [(min(amounts[action], stack), action) for action in _SIZED
+             if legal & (1 << action.value)]
+    if legal & (1 << Action.ALL_IN.value) or not sizes:
+        sizes.append((stack, Action.ALL_IN))
+    sizes.sort(key=lambda size: size[0])
+
+    if bet <= sizes[0][0]:
+        return sizes[0][1], sizes[0][1], 1.0
+    for (lower, lower_action), (upper, upper_action) in zip(sizes, sizes[1:]):
+        if bet <= upper:
+            if upper == lower:
+                return upper_action, upper_action, 1.0
+            return (lower_action, upper_action,
+                    pseudo_harmonic(lower / pot, upper / pot, bet / pot))
+    return sizes[-1][1], sizes[-1][1], 1.0
+
+
+class AbstractHand:
+    """A hand played for real from one seat, mirrored onto the abstract game
+
+    Two HUNLStates follow the hand: one with the real chip amounts, and one
+    that takes only abstract actions, on which the player decides. Calls
+    and folds are played on both. If the abstract hand ends first, e.g.
+    after a translated all in that was really a large bet, the player
+    checks or calls down. If the opponent raises where the betting
+    abstraction allows no more raises, the player calls, and the abstract
+    opponent calls once the real street closes, so that both hands move on
+    to the next street together.
+    """
+
+    def __init__(self,
+                 seat: int,
+                 hole_cards: tuple[int, int],
+                 player: Player | None,
+                 translator: ActionTranslator,
+                 abstraction: CardAbstraction | None = None,
+                 betting: ActionTree | None = None) -> None:
+        """Deal a hand
+
+        Args:
+            seat (int): the player's seat; 0 is the big blind
+            hole_cards (tuple[int, int]): the player's hole cards
+            player (Player | None): the player deciding the abstract 
+                        actions, if act() is not given them
+            translator (ActionTranslator): maps the opponent's bets
+            abstraction (CardAbstraction | None): card abstraction of the
+                        player's information sets
+            betting (ActionTree | None): betting abstraction the player was
+                        trained on
+        """
+        # the opponent's cards and the board are unknown, so stand-ins fill
+        # the deck; the board is revealed as it is dealt
+        stand_ins = [card for card in range(N_CARDS) if card not in hole_cards]
+        deck = stand_ins[:CARDS_DEALT - 2]
+        deck[2 * seat:2 * seat] = hole_cards
+        self.seat = seat
+        self.real = HUNLState(deck)
+        self.abstract = HUNLState(deck, abstraction, betting=betting)
+        self._player = player
+        self._translator = translator
+        self._deferred_call = False
+
+    def reveal_board(self, board: tuple[int, ...]) -> None:
+        """Set the board cards dealt so far"""
+        # keep the opponent's stand-in cards off the board
+        dealt = set(board).union(self.real.hole_cards[self.seat])
+        stand_ins = tuple(card for card in range(N_CARDS) if card not in dealt)[:2]
+        for state in (self.real, self.abstract):
+            hole_cards = list(state.hole_cards)
+            hole_cards[1 - self.seat] = stand_ins
+            state.hole_cards = tuple(hole_cards)
+            state.reveal_board(board)
+
+    def infoset(self) -> InfoSet | None:
+        """The player's information set in the abstract game, or None if the
+        abstract hand is over, or is waiting on a raise it has no room for,
+        and the player just checks or calls"""
+        abstract = self.abstract
+        if abstract.status and abstract.actor_index == self.seat and not self._deferred_call:
+            return abstract.infoset(self.seat)
+        return None
+
+    def act(self, action: Action | None = None) -> tuple[Action, int]:
+        """Decide and play the player's action
+
+        Args:
+            action (Action | None): the abstract action at infoset(), if
+                        decided elsewhere; the player decides if None
+
+        Returns:
+            tuple[Action, int]: FOLD or CHECK_CALL, or a bet or raise with
+                        the real street bet it raises to (zero otherwise)
+        """
+        abstract = self.abstract
+        if self._deferred_call:
+            # calling closes the real street, and the abstract opponent's
+            # call closes the abstract one
+            self._deferred_call = False
+            abstract.push(Action.CHECK_CALL)
+            self.real.push(Action.CHECK_CALL)
+            return Action.CHECK_CALL, 0
+        if not abstract.status or abstract.actor_index != self.seat:
+            action = Action.CHECK_CALL
+        else:
+            if action is None:
+                action = self._player.get_action(abstract.infoset(self.seat))
+            if action not in abstract.legal_actions():
+                action = Action.CHECK_CALL
+            abstract.push(action)
+        real = self.real
+        if action in (Action.FOLD, Action.CHECK_CALL) or Action.ALL_IN not in real.legal_actions():
+            # a raise the real hand no longer allows is a call
+            action = action if action == Action.FOLD else Action.CHECK_CALL
+            real.push(action)
+            return action, 0
+
+        # the same fraction of the real pot
+        actor = real.actor_index
+        all_in_to = real.bets[actor] + real.stacks[actor]
+        raise_to = min(max(real.raise_to_amount(action), real.min_raise_to()), all_in_to)
+        real.push_raise_to(raise_to)
+        return (Action.ALL_IN if raise_to == all_in_to else action), raise_to
+
+    def observe(self, action: Action, raise_to: int = 0) -> None:
+        """Play the opponent's action
+
+        Args:
+            action (Action): FOLD, CHECK_CALL, or any bet or raise
+            raise_to (int): the real street bet of a bet or raise
+        """
+        real = self.real
+        abstract = self.abstract
+        if action in (Action.FOLD, Action.CHECK_CALL):
+            if abstract.status:
+                abstract.push(action)
+            real.push(action)
+            return
+
+        if abstract.status:
+            actor = real.actor_index
+            call = real.bets[1 - actor] - real.bets[actor]
+            legal = 0
+            for legal_action in abstract.legal_actions():
+                legal |= 1 << legal_action.value
+            if legal & _RAISE_MASK:
+                abstract.push(self._translator.translate(
+                    real.pot + 2 * real.bets[1 - actor],
+                    real.stacks[actor] - call,
+                    raise_to - real.bets[1 - actor],
+                    real.min_raise_to() - real.bets[1 - actor],
+                    legal))
+            else:
+                # a call here would close the abstract street while the real
+                # one stays open, so the call waits for the player's own
+                self._deferred_call = True
+        real.push_raise_to(raise_to)
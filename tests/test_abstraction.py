@@ -0,0 +1,49 @@
+"""Tests of the batched hand strength behind the card abstraction tables"""
+import random
+from math import comb
+
+import numpy as np
+import pytest
+
+from util.abstraction import (_canonical_boards, _river_strengths, _value_boards,
+                              expected_hand_strength_squared, hand_strength)
+from util.hand_indexer import street_indexers
+
+
+def test_river_strengths_match_hand_strength():
+    rng = random.Random(0)
+    for _ in range(5):
+        cards = rng.sample(range(52), 7)
+        hole_cards, board = tuple(cards[:2]), tuple(cards[2:])
+        strengths = _river_strengths(np.array(board))
+        assert strengths[hole_cards] == pytest.approx(hand_strength(hole_cards, board))
+        assert np.isnan(strengths[board[0], hole_cards[0]])
+
+
+@pytest.mark.parametrize('n_cards, classes', [(3, 1755), (4, 16432)])
+def test_canonical_boards_cover_every_board(n_cards, classes):
+    boards, multiplicities = _canonical_boards(n_cards)
+    assert len(boards) == classes
+    assert multiplicities.sum() == comb(52, n_cards)
+    assert len(np.unique(np.sort(boards, axis=1), axis=0)) == len(boards)
+
+
+def test_turn_boards_are_valued_exactly():
+    boards, multiplicities = _canonical_boards(4)
+    indices, strengths, weights = _value_boards((2, boards[:2], multiplicities[:2], 48, 0))
+    # every raw hand on the boards' isomorphs is counted once
+    assert weights.sum() == multiplicities[:2].sum() * comb(48, 2)
+    indexer = street_indexers()[2]
+    rng = random.Random(0)
+    for row in rng.sample(range(len(indices)), 3):
+        cards = indexer.unindex(int(indices[row]))
+        hole_cards, board = tuple(cards[:2]), tuple(cards[2:])
+        exact = np.mean([hand_strength(hole_cards, board + (card,)) ** 2
+                         for card in range(52) if card not in cards])
+        assert strengths[row] == pytest.approx(exact)
+
+
+def test_river_ehs2_is_squared_strength():
+    hole_cards, board = (48, 49), (0, 5, 10, 20, 30)
+    assert expected_hand_strength_squared(hole_cards, board, 1, random.Random(0)) == (
+        pytest.approx(_river_strengths(np.array(board))[hole_cards] ** 2))
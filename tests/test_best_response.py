@@ -0,0 +1,154 @@
+"""Tests of the range-vs-range best response"""
+import random
+from itertools import product
+
+import numpy as np
+import pytest
+
+from hunl_cfr import HeadsUpNLCFR
+from util.actions import Action
+from util.best_response import _PublicTreeWalk
+from util.betting import ActionTree, BettingConfig
+from util.cards import N_CARDS
+from util.equity import COMBOS, N_COMBOS
+from util.games import HUNLState
+from util.infosets import InfoSetMap
+from util.strategies import PolicyTable
+
+_RIVER = 3
+
+# check down to the river, where either player may bet half the pot or shove
+RIVER_ONLY = BettingConfig(((Action.BET_MIN,), (Action.BET_HALF,), (Action.BET_HALF,),
+                            (Action.BET_HALF, Action.ALL_IN)), (0, 0, 0, 1))
+
+
+def river_state(tree, hole_cards, board):
+    """The first river state of a deal, reached by calling and checking"""
+    state = HUNLState(list(hole_cards[0] + hole_cards[1] + board), betting=tree)
+    while state.street < _RIVER:
+        state.push(Action.CHECK_CALL)
+    return state
+
+
+def deal(seat, hand, other, board):
+    """Hole cards by seat with hand in the given seat"""
+    return (hand, other) if seat == 0 else (other, hand)
+
+
+def spare_hand(board, *hands):
+    dead = set(board).union(*hands)
+    return tuple(card for card in range(N_CARDS) if card not in dead)[:2]
+
+
+def random_policy(tree, board, seed):
+    """A policy with random rows at the river nodes of every hand, leaving
+    some hands unseen and some rows without weight"""
+    rng = np.random.default_rng(seed)
+    profile = InfoSetMap()
+
+    def fill(state, seat):
+        if not state.status:
+            return
+        if state.actor_index == seat:
+            infoset = state.infoset(seat)
+            unseen = rng.random() < 0.1
+            weightless = rng.random() < 0.05
+            for action in state.legal_actions():
+                if not unseen:
+                    profile.set_action(infoset, action, 0.0 if weightless else rng.random())
+        for action in state.legal_actions():
+            state.push(action)
+            fill(state, seat)
+            state.pop()
+
+    for hand in map(tuple, COMBOS.tolist()):
+        if set(hand) & set(board):
+            continue
+        for seat in (0, 1):
+            other = spare_hand(board, hand)
+            fill(river_state(tree, deal(seat, hand, other, board), board), seat)
+    return PolicyTable.compile(profile)
+
+
+def brute_force_value(policy, tree, board, player, hand):
+    """Best response value of one hand, maximized over every pure strategy
+    and summed over every opposing hand dealt one at a time"""
+    def decision_nodes(state):
+        if not state.status:
+            return []
+        nodes = [(state.node, state.legal_actions())] if state.actor_index == player else []
+        for action in state.legal_actions():
+            state.push(action)
+            nodes += decision_nodes(state)
+            state.pop()
+        return nodes
+
+    root = river_state(tree, deal(player, hand, spare_hand(board, hand), board), board)
+    nodes = decision_nodes(root)
+    strategies = [dict(zip((node for node, _ in nodes), choice))
+                  for choice in product(*(actions for _, actions in nodes))]
+
+    def values(state):
+        """Values of every pure strategy in the subtree of a state"""
+        if not state.status:
+            return np.full(len(strategies), float(state.payoffs[player]))
+        children = {}
+        for action in state.legal_actions():
+            state.push(action)
+            children[action] = values(state)
+            state.pop()
+        if state.actor_index == player:
+            return np.array([children[strategy[state.node]][index]
+                             for index, strategy in enumerate(strategies)])
+        distribution = policy.distribution(state.infoset(state.actor_index)) or {}
+        weights = {action: distribution.get(action, 0.0) for action in children}
+        total = sum(weights.values())
+        if total <= 0:
+            weights, total = {Action.CHECK_CALL: 1.0}, 1.0
+        return sum(weight / total * children[action] for action, weight in weights.items())
+
+    totals = np.zeros(len(strategies))
+    for other in map(tuple, COMBOS.tolist()):
+        if set(other) & (set(board) | set(hand)):
+            continue
+        totals += values(river_state(tree, deal(player, hand, other, board), board))
+    return totals.max()
+
+
+@pytest.mark.parametrize('player', [0, 1])
+def test_vectorized_best_response_matches_brute_force(player):
+    tree = ActionTree(RIVER_ONLY)
+    board = tuple(random.Random(player).sample(range(N_CARDS), 5))
+    policy = random_policy(tree, board, player)
+
+    # the walk ignores the hole cards dealt to its state
+    hand = spare_hand(board)
+    state = river_state(tree, (hand, spare_hand(board, hand)), board)
+    walk = _PublicTreeWalk(policy, player, None, None, 0)
+    values = walk.node(state, board, np.ones(N_COMBOS))
+
+    live = np.flatnonzero(~np.isin(COMBOS, board).any(axis=1))
+    assert not values[np.isin(COMBOS, board).any(axis=1)].any()
+    for index in np.random.default_rng(player).choice(live, 6, replace=False).tolist():
+        expected = brute_force_value(policy, tree, board, player, tuple(COMBOS[index].tolist()))
+        assert values[index] == pytest.approx(expected, rel=1e-5)
+
+
+def test_training_reports_exploitability_to_its_callback(monkeypatch):
+    estimates = []
+    policies = []
+
+    def fake_exploitability(policy, abstraction, betting=None):
+        policies.append(policy)
+        return 123.0
+
+    monkeypatch.setattr('hunl_cfr.exploitability', fake_exploitability)
+    random.seed(0)
+    model = HeadsUpNLCFR(betting=ActionTree(RIVER_ONLY))
+    model.train(20, 0.05, 1000, 1e6, exploitability_every=10,
+                on_exploitability=lambda epoch, value: estimates.append((epoch, value)))
+    assert estimates == [(10, 123.0), (20, 123.0)]
+    assert all(isinstance(policy, PolicyTable) and len(policy) for policy in policies)
+
+    with pytest.raises(ValueError):
+        model.train(20, 0.05, 1000, 1e6, exploitability_every=10)
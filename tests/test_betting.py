@@ -0,0 +1,63 @@
+"""Tests of betting abstractions and their action trees"""
+import numpy as np
+import pytest
+
+from util.actions import Action
+from util.betting import NO_ACTOR, NO_CHILD, ActionTree, BettingConfig
+from util.games import CARDS_DEALT, HUNLState
+
+SMALL = BettingConfig(((Action.BET_MIN, Action.ALL_IN),) + ((Action.BET_HALF, Action.ALL_IN),) * 3,
+                      (2, 1, 1, 1))
+
+# the packed key fields below the hole cards or bucket
+_BETTING_KEY_BITS = 51
+_HAND_COMBOS = 1326
+
+
+def walk(state, tree, keys):
+    """Collect the betting part of every information set key, checking the
+    state against its tree node on the way"""
+    node = state.node
+    if not state.status:
+        assert tree.actor[node] == NO_ACTOR
+        return
+    assert tree.actor[node] == state.actor_index
+    assert (tree.street[node], tree.pot[node]) == (state.street, state.pot)
+    keys.add(state.infoset(state.actor_index).key & ((1 << _BETTING_KEY_BITS) - 1))
+    for action in state.legal_actions():
+        state.push(action)
+        walk(state, tree, keys)
+        state.pop()
+
+
+@pytest.mark.parametrize('config', [SMALL, None])
+def test_infoset_count_matches_a_walk_of_the_game(config):
+    tree = ActionTree(config)
+    keys = set()
+    walk(HUNLState(list(range(CARDS_DEALT)), betting=tree), tree, keys)
+    assert tree.infoset_count() == len(keys) * _HAND_COMBOS
+
+
+def test_tree_round_trips_through_npz(tmp_path):
+    tree = ActionTree(SMALL)
+    filename = str(tmp_path / 'tree.npz')
+    tree.save(filename)
+    loaded = ActionTree.load(filename)
+
+    assert loaded.config.to_dict() == SMALL.to_dict()
+    assert len(loaded) == len(tree)
+    for name in ActionTree._ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(tree, name))
+    assert loaded.infoset_count() == tree.infoset_count()
+    for node in tree.decision_nodes().tolist():
+        assert loaded.legal_actions(node) == tree.legal_actions(node)
+        for action in Action:
+            assert loaded.child(node, action) == tree.child(node, action)
+    assert tree.child(0, Action.BET_FULL) == NO_CHILD
+
+
+def test_config_rejects_unknown_bet_sizes():
+    with pytest.raises(ValueError):
+        BettingConfig(((Action.FOLD,),) * 4, (1, 1, 1, 1))
+    with pytest.raises(ValueError):
+        BettingConfig(((Action.ALL_IN,),) * 3, (1, 1, 1))
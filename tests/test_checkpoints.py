@@ -0,0 +1,119 @@
+"""Tests of incremental training checkpoints"""
+import json
+import os
+import random
+
+import pytest
+
+from hunl_cfr import HeadsUpNLCFR
+from util.actions import Action
+from util.betting import ActionTree, BettingConfig
+from util.checkpoints import Checkpointer
+from util.infosets import InfoSet, InfoSetMap
+
+# all in or check down on every street, which keeps training to milliseconds
+PUSH_OR_FOLD = BettingConfig(((Action.ALL_IN,),) * 4, (1, 1, 1, 1))
+
+
+def rows(table):
+    return {key: (mask, tuple(values)) for key, mask, values
+            in zip(table.keys.tolist(), table.masks.tolist(), table.values.tolist())}
+
+
+def train(epochs, checkpoint_dir=None, checkpoint_every=10):
+    model = HeadsUpNLCFR(betting=ActionTree(PUSH_OR_FOLD))
+    model.train(epochs, 0.05, 1000, 1e6, checkpoint_dir=checkpoint_dir,
+                checkpoint_every=checkpoint_every)
+    return model
+
+
+def sample_tables(count, seed):
+    rng = random.Random(seed)
+    regrets, profile = InfoSetMap(), InfoSetMap()
+    for _ in range(count):
+        infoset = InfoSet.from_fields(rng.randrange(40000), (), False, 0, 0, rng.randrange(4))
+        regrets.set_action(infoset, rng.choice(list(Action)), rng.random())
+        profile.set_action(infoset, rng.choice(list(Action)), rng.random())
+    return regrets, profile
+
+
+def test_interrupted_run_resumes_to_the_uninterrupted_result(tmp_path):
+    random.seed(5)
+    uninterrupted = train(60)
+
+    random.seed(5)
+    checkpoint_dir = str(tmp_path / 'run')
+    train(35, checkpoint_dir)
+    assert Checkpointer(checkpoint_dir).iteration == 35
+    # the random state of the checkpoint is restored on resume
+    random.seed(123)
+    resumed = train(60, checkpoint_dir)
+
+    assert Checkpointer(checkpoint_dir).iteration == 60
+    assert rows(resumed._regrets) == rows(uninterrupted._regrets)
+    assert rows(resumed._cumulative_profile) == rows(uninterrupted._cumulative_profile)
+
+
+def test_short_runs_are_checkpointed(tmp_path):
+    checkpoint_dir = str(tmp_path / 'run')
+    model = train(5, checkpoint_dir, checkpoint_every=1000)
+    checkpointer = Checkpointer(checkpoint_dir)
+    assert checkpointer.iteration == 5
+    assert rows(checkpointer.load()[0]) == rows(model._regrets)
+
+
+def test_checkpoint_interval_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        train(5, str(tmp_path / 'run'), checkpoint_every=0)
+
+
+def test_checkpoint_is_rewritten_in_full_after_max_segments(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path), max_segments=2)
+    regrets, profile = sample_tables(50, 0)
+    for iteration in range(1, 4):
+        more_regrets, more_profile = sample_tables(20, iteration)
+        regrets.update(more_regrets)
+        profile.update(more_profile)
+        checkpointer.save(regrets, profile, iteration)
+
+    with open(tmp_path / 'checkpoint.json', encoding='utf-8') as file:
+        manifest = json.load(file)
+    assert manifest['iteration'] == 3
+    assert manifest['segments'] == [['regrets-000002.seg', 'profile-000002.seg']]
+    assert sorted(os.listdir(tmp_path)) == ['checkpoint.json', 'profile-000002.seg',
+                                            'regrets-000002.seg']
+    loaded_regrets, loaded_profile = Checkpointer(str(tmp_path)).load()
+    assert rows(loaded_regrets) == rows(regrets)
+    assert rows(loaded_profile) == rows(profile)
+
+
+def test_failed_save_leaves_the_previous_checkpoint(tmp_path, monkeypatch):
+    checkpointer = Checkpointer(str(tmp_path))
+    regrets, profile = sample_tables(50, 0)
+    checkpointer.save(regrets, profile, 10)
+    saved_regrets, saved_profile = rows(regrets), rows(profile)
+    manifest = (tmp_path / 'checkpoint.json').read_bytes()
+
+    regrets.update(sample_tables(20, 1)[0])
+    profile.update(sample_tables(20, 2)[1])
+    save_to_file = InfoSetMap.save_to_file
+    calls = []
+
+    def fail_second_file(self, filename, *args):
+        # write the regrets segment, then fail on the profile segment
+        calls.append(filename)
+        if len(calls) == 2:
+            raise OSError("Disk full.")
+        save_to_file(self, filename, *args)
+
+    monkeypatch.setattr(InfoSetMap, 'save_to_file', fail_second_file)
+    with pytest.raises(OSError):
+        checkpointer.save(regrets, profile, 20)
+    monkeypatch.undo()
+
+    assert (tmp_path / 'checkpoint.json').read_bytes() == manifest
+    reopened = Checkpointer(str(tmp_path))
+    assert reopened.iteration == 10
+    loaded_regrets, loaded_profile = reopened.load()
+    assert rows(loaded_regrets) == saved_regrets
+    assert rows(loaded_profile) == saved_profile
@@ -0,0 +1,104 @@
+"""Tests of the self-play evaluation harness"""
+import random
+
+import numpy as np
+import pytest
+
+from evaluation import _luck, _play_chunk, _play_hand, evaluate
+from util.actions import Action
+from util.cards import N_CARDS
+from util.equity import AllInEquity, build_preflop_tables
+from util.games import CARDS_DEALT
+from util.players import Player
+
+_ACTIONS = tuple(Action)
+
+
+class RandomPlayer(Player):
+    """Picks any action with the global random state that evaluation seeds;
+    illegal picks are played as calls"""
+
+    def __init__(self) -> None:
+        pass
+
+    def get_action(self, info):
+        return random.choice(_ACTIONS)
+
+
+class KeyedPlayer(Player):
+    """Picks an action determined by the information set alone"""
+
+    def __init__(self) -> None:
+        pass
+
+    def get_action(self, info):
+        return _ACTIONS[info.key % 7 % len(_ACTIONS)]
+
+
+def test_results_do_not_depend_on_the_number_of_workers():
+    players = (RandomPlayer, KeyedPlayer)
+    serial = evaluate(players, 400, workers=1, seed=3, chunk_size=50)
+    parallel = evaluate(players, 400, workers=2, seed=3, chunk_size=50)
+    assert (serial.hands, serial.mean, serial.std) == (parallel.hands, parallel.mean,
+                                                        parallel.std)
+    assert evaluate(players, 400, workers=1, seed=4, chunk_size=50).mean != serial.mean
+
+
+def test_identical_players_break_even():
+    result = evaluate((RandomPlayer, RandomPlayer), 2000, seed=0, chunk_size=500)
+    assert result.hands == 2000
+    assert abs(result.mean) < 3 * result.ci95
+
+
+def test_duplicate_deals_cancel_between_identical_deterministic_players():
+    result = evaluate((KeyedPlayer, KeyedPlayer), 300, seed=0, duplicate=True)
+    assert result.hands == 600
+    assert result.mean == result.std == 0
+    assert evaluate((KeyedPlayer, KeyedPlayer), 300, seed=0).std > 0
+
+
+@pytest.fixture(scope='module')
+def equity(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('equity')
+    # a few boards are enough for tables whose accuracy does not matter here
+    build_preflop_tables(str(directory), 20, seed=0)
+    return AllInEquity(str(directory))
+
+
+def test_luck_of_the_preflop_deal_averages_to_zero(equity):
+    dealer = random.Random(0)
+    luck = [_luck(dealer.sample(range(N_CARDS), CARDS_DEALT), [(0, 150)], equity)
+            for _ in range(3000)]
+    assert abs(np.mean(luck)) < 3 * np.std(luck) / np.sqrt(len(luck))
+
+
+@pytest.mark.parametrize('street', [2, 3])
+def test_luck_of_the_turn_and_river_averages_to_zero_over_the_card_dealt(equity, street):
+    deck = random.Random(street).sample(range(N_CARDS), CARDS_DEALT)
+    deals = [(0, 150), (1, 600), (2, 1800), (3, 1800)][:street + 1]
+    before = _luck(deck, deals[:-1], equity)
+    # hole cards, then the board dealt before this street
+    dealt = 5 + street
+    lucks = [_luck(deck[:dealt] + [card], deals, equity)
+             for card in range(N_CARDS) if card not in deck[:dealt]]
+    # the equity before a deal is the mean of the equities after it
+    assert np.mean(lucks) == pytest.approx(before, abs=1e-9)
+    assert np.std(lucks) > 0
+
+
+def test_duplicate_sample_is_the_mean_of_both_seatings(equity):
+    players = (RandomPlayer(), KeyedPlayer())
+    total, squares = _play_chunk((RandomPlayer, KeyedPlayer), None, equity, None, True, 20, 7)
+
+    random.seed(7)
+    dealer = random.Random(7)
+    samples = []
+    for _ in range(20):
+        deck = dealer.sample(range(N_CARDS), CARDS_DEALT)
+        first = _play_hand(deck, players, None, equity, None)
+        second = _play_hand(deck, players[::-1], None, equity, None)
+        # each seating is zero sum after the luck correction too
+        assert sum(first) == pytest.approx(0) and sum(second) == pytest.approx(0)
+        samples.append((first[0] + second[1]) / 2)
+    assert total == pytest.approx(sum(samples))
+    assert squares == pytest.approx(float(np.dot(samples, samples)))
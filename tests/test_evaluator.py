@@ -0,0 +1,82 @@
+"""Tests of the table-driven hand evaluator against pokerkit"""
+import random
+
+import numpy as np
+import pytest
+from pokerkit import StandardHighHand
+
+from util.cards import card_text, parse_card
+from util.evaluator import (FLUSH, FULL_HOUSE, STRAIGHT, STRAIGHT_FLUSH, category, evaluate,
+                            evaluate_many)
+
+
+def cards(text):
+    """Parse cards written like 'AsKd2c'"""
+    return [parse_card(text[index:index + 2]) for index in range(0, len(text), 2)]
+
+
+def pokerkit_hand(hand):
+    """pokerkit's best five-card hand of five to seven integer cards"""
+    return StandardHighHand.from_game(''.join(card_text(card) for card in hand))
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+@pytest.mark.parametrize('n_cards', [5, 6, 7])
+def test_order_matches_pokerkit(n_cards):
+    rng = random.Random(n_cards)
+    hands = [rng.sample(range(52), n_cards) for _ in range(1000)]
+    values = [evaluate(hand) for hand in hands]
+    expected = [pokerkit_hand(hand) for hand in hands]
+    for index in range(len(hands) - 1):
+        mine = sign(values[index] - values[index + 1])
+        theirs = sign((expected[index] > expected[index + 1])
+                      - (expected[index] < expected[index + 1]))
+        assert mine == theirs, (hands[index], hands[index + 1])
+
+
+def test_evaluate_many_matches_evaluate():
+    rng = random.Random(0)
+    hands = np.array([rng.sample(range(52), 7) for _ in range(1000)])
+    assert evaluate_many(hands).tolist() == [evaluate(hand) for hand in hands.tolist()]
+
+
+def test_ties():
+    board = cards('AsKdQh7c2s')
+    # the board plays for both
+    assert evaluate(cards('3c4d') + board) == evaluate(cards('3h4s') + board)
+    # same two pair, kickers decide on the board
+    assert evaluate(cards('Ac9d') + cards('AhKs9c5d3h')) == evaluate(
+        cards('Ad9h') + cards('AhKs9c5d3h'))
+    # suits never break ties
+    assert evaluate(cards('2c3c4c5c7d')) == evaluate(cards('2d3d4d5d7c'))
+    # the fifth card decides, and cards outside the best five do not
+    assert evaluate(cards('Jc5d') + board) > evaluate(cards('Tc9d') + board)
+    assert evaluate(cards('Jc5d') + board) == evaluate(cards('Jd6c') + board)
+
+
+def test_wheel_is_the_lowest_straight():
+    wheel = evaluate(cards('As2d3h4c5s'))
+    six_high = evaluate(cards('2d3h4c5s6d'))
+    assert category(wheel) == STRAIGHT
+    assert wheel < six_high
+    assert wheel > evaluate(cards('AsAdKhKcQs'))
+    steel_wheel = evaluate(cards('As2s3s4s5s'))
+    assert category(steel_wheel) == STRAIGHT_FLUSH
+    assert steel_wheel < evaluate(cards('2s3s4s5s6s'))
+    # a wheel among seven cards, with no higher straight
+    assert category(evaluate(cards('As2d3h4c5sKdKh'))) == STRAIGHT
+
+
+def test_flush_versus_full_house():
+    full_house = evaluate(cards('2c2d2h3s3c') + cards('9c'))
+    flush = evaluate(cards('AcKc9c7c3c') + cards('Ad'))
+    assert category(full_house) == FULL_HOUSE
+    assert category(flush) == FLUSH
+    assert full_house > flush
+    # seven cards holding both a flush and a full house
+    both = evaluate(cards('KcKdKh7c7d2c4c'))
+    assert category(both) == FULL_HOUSE
+    assert both == evaluate(cards('KcKdKh7c7d'))
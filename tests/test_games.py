@@ -0,0 +1,120 @@
+"""Cross-checks of HUNLState against pokerkit on random hands"""
+import random
+
+import pytest
+from pokerkit import Automation, NoLimitTexasHoldem
+
+from util.actions import Action
+from util.cards import N_CARDS, card_text
+from util.games import BIG_BLIND, CARDS_DEALT, SMALL_BLIND, STARTING_STACK, HUNLState
+
+AUTOMATIONS = (
+    Automation.ANTE_POSTING,
+    Automation.BET_COLLECTION,
+    Automation.BLIND_OR_STRADDLE_POSTING,
+    Automation.HOLE_CARDS_SHOWING_OR_MUCKING,
+    Automation.HAND_KILLING,
+    Automation.CHIPS_PUSHING,
+    Automation.CHIPS_PULLING,
+)
+BOARD_DEALS = ((4, 7), (7, 8), (8, 9))
+RAISES = (Action.ALL_IN, Action.BET_MIN, Action.BET_HALF, Action.BET_FULL)
+
+
+def deal_pokerkit(deck):
+    """A pokerkit state dealt the same cards as HUNLState(deck)"""
+    state = NoLimitTexasHoldem.create_state(AUTOMATIONS, True, 0, (SMALL_BLIND, BIG_BLIND),
+                                            BIG_BLIND, STARTING_STACK, 2)
+    state.deal_hole(card_text(deck[0]) + card_text(deck[1]))
+    state.deal_hole(card_text(deck[2]) + card_text(deck[3]))
+    return state
+
+
+def deal_board(state, deck, dealt):
+    """Deal pokerkit's board until a player is to act, returning the number
+    of boards dealt"""
+    while state.status and (state.can_burn_card() or state.can_deal_board()):
+        # burn unknown cards so that pokerkit's deck keeps the chosen runout
+        state.burn_card('??')
+        start, end = BOARD_DEALS[dealt]
+        state.deal_board(''.join(card_text(card) for card in deck[start:end]))
+        dealt += 1
+    return dealt
+
+
+def assert_legal_actions_match(hunl, state):
+    """Compare the legal actions and bet sizes of both states"""
+    legal = hunl.legal_actions()
+    assert hunl.actor_index == state.actor_index
+    assert (Action.FOLD in legal) == state.can_fold()
+    assert Action.CHECK_CALL in legal
+    assert state.can_check_or_call()
+    can_raise = state.can_complete_bet_or_raise_to()
+    assert (Action.ALL_IN in legal) == can_raise
+    if not can_raise:
+        assert not set(legal) & set(RAISES)
+        return
+    low = state.min_completion_betting_or_raising_to_amount
+    high = state.max_completion_betting_or_raising_to_amount
+    assert hunl.raise_to_amount(Action.ALL_IN) == high
+    assert (Action.BET_MIN in legal) == (low < high)
+    for action in RAISES:
+        if action in legal:
+            amount = hunl.raise_to_amount(action)
+            assert low <= amount <= high
+            assert state.can_complete_bet_or_raise_to(amount)
+
+
+def play(hunl, state, action):
+    """Take an action on both states"""
+    if action == Action.FOLD:
+        state.fold()
+    elif action == Action.CHECK_CALL:
+        state.check_or_call()
+    else:
+        state.complete_bet_or_raise_to(hunl.raise_to_amount(action))
+    hunl.push(action)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_random_hands_match_pokerkit(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        deck = rng.sample(range(N_CARDS), CARDS_DEALT)
+        hunl = HUNLState(deck)
+        state = deal_pokerkit(deck)
+        dealt = 0
+        while hunl.status:
+            dealt = deal_board(state, deck, dealt)
+            assert state.status
+            assert hunl.street == dealt
+            assert_legal_actions_match(hunl, state)
+            legal = hunl.legal_actions()
+            # weight passive actions so that many hands reach later streets
+            weights = [4 if action == Action.CHECK_CALL else 1 for action in legal]
+            play(hunl, state, rng.choices(legal, weights)[0])
+            if hunl.status:
+                assert hunl.bets == list(state.bets)
+                assert hunl.stacks == list(state.stacks)
+        deal_board(state, deck, dealt)
+        assert not state.status
+        assert hunl.payoffs == tuple(stack - STARTING_STACK for stack in state.stacks)
+
+
+def test_push_and_pop_restore_the_parent():
+    rng = random.Random(0)
+    deck = rng.sample(range(N_CARDS), CARDS_DEALT)
+    state = HUNLState(deck)
+    history = []
+    while state.status:
+        action = rng.choice(state.legal_actions())
+        history.append((action, state.apply(action)))
+        state.push(action)
+        child = history[-1][1]
+        assert (state.stacks, state.bets, state.pot, state.street, state.actor_index) == (
+            child.stacks, child.bets, child.pot, child.street, child.actor_index)
+    for _ in history:
+        state.pop()
+    fresh = HUNLState(deck)
+    assert (state.stacks, state.bets, state.pot, state.street, state.actor_index) == (
+        fresh.stacks, fresh.bets, fresh.pot, fresh.street, fresh.actor_index)
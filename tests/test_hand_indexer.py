@@ -0,0 +1,33 @@
+"""Tests of the suit-isomorphic hand indexer"""
+import numpy as np
+import pytest
+
+from util.hand_indexer import street_indexers
+
+SIZES = (169, 1286792, 13960050, 123156254)
+
+
+@pytest.mark.parametrize('street', range(4))
+def test_batched_indices_match_single_indices(street):
+    indexer = street_indexers()[street]
+    assert indexer.size == SIZES[street]
+    rng = np.random.default_rng(street)
+    hands = np.array([rng.permutation(52)[:len(indexer.unindex(0))] for _ in range(2000)])
+    indices = indexer.index_many(hands)
+    assert indices.tolist() == [indexer.index(hand) for hand in hands.tolist()]
+    assert indices.min() >= 0 and indices.max() < indexer.size
+
+
+@pytest.mark.parametrize('street', range(4))
+def test_representatives_index_back(street):
+    indexer = street_indexers()[street]
+    rng = np.random.default_rng(10 + street)
+    indices = rng.integers(0, indexer.size, 500)
+    assert indexer.index_many(indexer.unindex_many(indices)).tolist() == indices.tolist()
+
+
+def test_suit_isomorphs_share_an_index():
+    indexer = street_indexers()[3]
+    hand = [48, 49, 0, 5, 10, 20, 30]
+    relabeled = [(card & ~3) | (3 - (card & 3)) for card in hand]
+    assert indexer.index(hand) == indexer.index(relabeled)
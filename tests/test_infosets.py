@@ -0,0 +1,291 @@
+"""Tests of information set keys and maps"""
+import multiprocessing
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from util.actions import Action
+from util.blocks import BlockTable
+from util.infosets import InfoSet, InfoSetMap, SharedInfoSetMap, pack_key, pack_keys, unpack_key
+
+
+def sample_map(n_rows=3000, seed=0):
+    """An in-memory map of random rows, and the rows it holds"""
+    rng = np.random.default_rng(seed)
+    table = InfoSetMap()
+    rows = {}
+    for _ in range(n_rows):
+        cards = tuple(int(card) for card in rng.choice(52, 2, replace=False))
+        infoset = InfoSet.from_fields(int(rng.integers(0, 40000)), cards, bool(rng.integers(2)),
+                                      int(rng.integers(0, 20000)), int(rng.integers(0, 20000)),
+                                      int(rng.integers(4)))
+        actions = [action for action in Action if rng.random() < 0.5] or [Action.CHECK_CALL]
+        rows[infoset.key] = (infoset, {action: float(rng.normal()) for action in actions})
+    for infoset, actions in rows.values():
+        for action, value in actions.items():
+            table.set_action(infoset, action, value)
+    return table, list(rows.values())
+
+
+@pytest.fixture
+def shared_map():
+    table = SharedInfoSetMap(4096)
+    yield table
+    table.close()
+    table.unlink()
+
+
+def test_keys_differing_in_cards_spread_over_slots(shared_map):
+    # every hand at the same betting node, which differ only above bit 51
+    infosets = [InfoSet.from_fields(0, cards, False, 50, 100, 0)
+                for cards in combinations(range(52), 2)]
+    slots = {shared_map._probe(infoset.key) for infoset in infosets}
+    assert len(slots) > 0.7 * len(infosets)
+
+
+def test_keys_differing_in_bucket_spread_over_slots(shared_map):
+    infosets = [InfoSet.from_fields(1200, (), True, 0, 600, 2, bucket)
+                for bucket in range(1000)]
+    slots = {shared_map._probe(infoset.key) for infoset in infosets}
+    assert len(slots) > 0.7 * len(infosets)
+
+
+def test_rows_round_trip(shared_map):
+    infosets = [InfoSet.from_fields(0, cards, False, 50, 100, 0)
+                for cards in combinations(range(20), 2)]
+    for index, infoset in enumerate(infosets):
+        shared_map.set_action(infoset, Action.CHECK_CALL, index)
+        shared_map.set_action(infoset, Action.FOLD, -index)
+    assert len(shared_map) == len(infosets)
+    for index, infoset in enumerate(infosets):
+        assert shared_map.get_actions(infoset) == {Action.FOLD: -index,
+                                                   Action.CHECK_CALL: index}
+    assert shared_map.get_actions(InfoSet.from_fields(0, (40, 41), False, 50, 100, 0)) is None
+    assert len(shared_map.to_infoset_map().keys) == len(infosets)
+
+
+def _set_one_action(table, infosets, action):
+    """Worker of the multiprocess test: write one action of every infoset"""
+    for infoset in infosets:
+        table.set_action(infoset, action, action.value)
+    table.close()
+
+
+def test_actions_written_by_many_processes_are_visible(shared_map):
+    infosets = [InfoSet.from_fields(0, cards, False, 50, 100, 0)
+                for cards in combinations(range(52), 2)][:1500]
+    processes = [multiprocessing.Process(target=_set_one_action,
+                                         args=(shared_map, infosets, action))
+                 for action in Action]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(shared_map) == len(infosets)
+    for infoset in infosets:
+        assert shared_map.get_actions(infoset) == {action: action.value for action in Action}
+
+
+def test_map_rows_round_trip_through_growth():
+    table, rows = sample_map()
+    assert len(table) == len(rows)
+    for infoset, actions in rows:
+        assert table.get_actions(infoset) == actions
+    assert table.get_actions(InfoSet.from_fields(1, (), False, 2, 3)) is None
+
+    values, masks, found = table.get_rows(np.array([infoset.key for infoset, _ in rows[:50]]
+                                                   + [12345], dtype=np.uint64))
+    assert found.tolist() == [True] * 50 + [False]
+    for (_, actions), row, mask in zip(rows, values[:50], masks[:50]):
+        assert {action for action in Action if mask & (1 << action.value)} == set(actions)
+        assert all(row[action.value] == value for action, value in actions.items())
+
+
+def test_dirty_rows_are_tracked_until_cleared():
+    table, rows = sample_map(100)
+    assert len(table.dirty_ids()) == 100
+    table.clear_dirty()
+    table.set_action(rows[7][0], Action.FOLD, 1.0)
+    assert table.dirty_ids().tolist() == [table.infoset_id(rows[7][0])]
+
+
+@pytest.mark.parametrize('fields', [
+    (0, (), False, 0, 0, 0),
+    (150, (51, 0), True, 100, 50, 0),
+    (40000, (12, 37), False, 19900, 20000, 3),
+    (65535, (50, 51), True, 65535, 65535, 2),
+    (2500, (7,), False, 0, 1200, 1),
+])
+def test_pack_key_round_trips_every_field(fields):
+    pot, cards, opening, my_bet, opponent_bet, street = fields
+    key = pack_key(pot, cards, opening, my_bet, opponent_bet, street)
+    assert 0 <= key < 2 ** 64
+    assert unpack_key(key) == (pot, tuple(sorted(cards, reverse=True)), opening,
+                               my_bet, opponent_bet, street)
+    assert pack_key(pot, cards[::-1], opening, my_bet, opponent_bet, street) == key
+
+
+def test_pack_key_caps_chips_at_the_field_width():
+    key = pack_key(70000, (3, 4), False, 66000, 65536, 1)
+    assert unpack_key(key)[0] == unpack_key(key)[3] == unpack_key(key)[4] == 65535
+
+
+def test_pack_keys_matches_pack_key():
+    hands = np.array(list(combinations(range(52), 2))[::97])
+    keys = pack_keys(3000, hands, True, 200, 800, 2)
+    assert keys.tolist() == [pack_key(3000, tuple(hand.tolist()), True, 200, 800, 2)
+                             for hand in hands]
+
+
+def test_mapped_file_round_trips_through_binary_search(tmp_path):
+    table, rows = sample_map()
+    filename = str(tmp_path / 'table.bin')
+    table.save_to_file(filename)
+    mapped = InfoSetMap(filename)
+    assert mapped._ids is None
+    assert len(mapped) == len(rows)
+    assert np.all(np.diff(mapped.keys.astype(np.float64)) >= 0)
+    for infoset, actions in rows:
+        assert mapped.get_actions(infoset) == actions
+    unseen = InfoSet.from_fields(1, (), False, 2, 3)
+    assert mapped.get_actions(unseen) is None
+
+    keys = np.array([unseen.key] + [infoset.key for infoset, _ in rows[::10]], dtype=np.uint64)
+    values, masks, found = mapped.get_rows(keys)
+    expected = table.get_rows(keys)
+    assert found.tolist() == expected[2].tolist() == [False] + [True] * len(rows[::10])
+    assert np.array_equal(values, expected[0]) and np.array_equal(masks, expected[1])
+
+
+def test_writing_to_mapped_table_copies_it(tmp_path):
+    table, rows = sample_map(200)
+    filename = str(tmp_path / 'table.bin')
+    table.save_to_file(filename)
+    before = open(filename, 'rb').read()
+
+    mapped = InfoSetMap(filename)
+    infoset, actions = rows[0]
+    mapped.set_action(infoset, Action.FOLD, 99.0)
+    new_infoset = InfoSet.from_fields(1, (), False, 2, 3)
+    mapped.set_action(new_infoset, Action.ALL_IN, -1.0)
+
+    assert mapped._ids is not None
+    assert mapped.get_actions(infoset) == {**actions, Action.FOLD: 99.0}
+    assert mapped.get_actions(new_infoset) == {Action.ALL_IN: -1.0}
+    assert mapped.dirty_ids().tolist() == [mapped.infoset_id(infoset),
+                                           mapped.infoset_id(new_infoset)]
+    assert open(filename, 'rb').read() == before
+    assert InfoSetMap(filename).get_actions(infoset) == actions
+
+
+def probability_map(n_rows=3000, seed=0):
+    """A map of random rows with values in [0, 1], like a compiled policy"""
+    table, rows = sample_map(n_rows, seed)
+    rng = np.random.default_rng(seed)
+    return InfoSetMap.from_arrays(table.keys, rng.random(table.values.shape), table.masks), rows
+
+
+@pytest.mark.parametrize('codec', ['none', 'zlib', 'lzma'])
+def test_compressed_file_round_trips(tmp_path, codec):
+    table, rows = sample_map()
+    assert int(table.keys.max()) > 2 ** 53
+    filename = str(tmp_path / 'table.bin')
+    table.save_to_file(filename, codec=codec, block_rows=256)
+
+    loaded = InfoSetMap(filename)
+    assert loaded._blocks is not None
+    assert len(loaded) == len(rows)
+    for infoset, actions in rows:
+        assert loaded.get_actions(infoset) == actions
+    assert loaded.get_actions(InfoSet.from_fields(1, (), False, 2, 3)) is None
+
+    # keys are kept exactly, which a float64 round trip would not do
+    order = np.argsort(table.keys)
+    keys, masks, values = loaded._blocks.read_all()
+    assert keys.tolist() == table.keys[order].tolist()
+    assert np.array_equal(masks, table.masks[order])
+    assert np.array_equal(values, table.values[order])
+
+
+@pytest.mark.parametrize('quantization', ['float16', 'uint8'])
+def test_quantized_rows_are_within_one_step(tmp_path, quantization):
+    table, _ = probability_map()
+    filename = str(tmp_path / 'table.bin')
+    table.save_to_file(filename, quantization=quantization)
+
+    loaded = InfoSetMap(filename)
+    values, masks, found = loaded.get_rows(table.keys)
+    assert found.all()
+    assert np.array_equal(masks, table.masks)
+    assert np.abs(values - table.values).max() <= 1 / 255
+    assert loaded.get_rows(table.keys[:1])[0].dtype == np.float32
+
+
+def test_uint8_quantization_rejects_values_outside_the_unit_interval(tmp_path):
+    table, _ = sample_map(100)
+    with pytest.raises(ValueError):
+        table.save_to_file(str(tmp_path / 'table.bin'), quantization='uint8')
+
+
+def test_file_versions_are_detected_on_load(tmp_path):
+    table, rows = sample_map(500)
+    infoset, actions = rows[0]
+    table.save_to_file(str(tmp_path / 'v1.bin'))
+    table.save_to_file(str(tmp_path / 'v2.bin'), codec='zlib')
+
+    v1 = InfoSetMap(str(tmp_path / 'v1.bin'))
+    v2 = InfoSetMap(str(tmp_path / 'v2.bin'))
+    assert v1._blocks is None and v1._ids is None
+    assert v2._blocks is not None
+    assert v1.get_actions(infoset) == v2.get_actions(infoset) == actions
+
+    (tmp_path / 'bad.bin').write_bytes(b'XXXX' + (tmp_path / 'v1.bin').read_bytes()[4:])
+    with pytest.raises(ValueError):
+        InfoSetMap(str(tmp_path / 'bad.bin'))
+
+
+@pytest.fixture
+def block_table(tmp_path):
+    """A compressed table of 8 blocks, and its rows' keys in block order"""
+    table, _ = sample_map(800)
+    filename = str(tmp_path / 'table.bin')
+    table.save_to_file(filename, codec='zlib', block_rows=100)
+    keys = np.sort(table.keys)
+    # room for two and a half decompressed blocks
+    block_bytes = 100 * (8 + 1 + 8 * len(Action))
+    return BlockTable(filename, cache_bytes=int(2.5 * block_bytes)), keys
+
+
+def test_block_cache_counts_hits_and_misses(block_table):
+    blocks, keys = block_table
+    assert blocks.n_blocks == 8
+    for key in keys[:100].tolist():
+        assert blocks.row(key) is not None
+    assert (blocks.misses, blocks.hits) == (1, 99)
+    blocks.row(int(keys[100]))
+    assert (blocks.misses, blocks.hits) == (2, 99)
+
+
+def test_block_cache_stays_within_its_budget(block_table):
+    blocks, keys = block_table
+    rng = np.random.default_rng(0)
+    for key in rng.choice(keys, 500).tolist():
+        assert blocks.row(key) is not None
+        assert blocks.resident_bytes <= blocks.cache_bytes
+        assert blocks.resident_bytes == sum(part.nbytes for block in blocks._cache.values()
+                                            for part in block)
+    assert len(blocks._cache) == 2
+
+
+def test_block_cache_evicts_the_least_recently_used_block(block_table):
+    blocks, keys = block_table
+    first, second, third = (int(keys[100 * block]) for block in range(3))
+    blocks.row(first)
+    blocks.row(second)
+    blocks.row(first)
+    blocks.row(third)
+    assert list(blocks._cache) == [0, 2]
+    blocks.row(first)
+    assert (blocks.misses, blocks.hits) == (3, 2)
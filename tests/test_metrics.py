@@ -0,0 +1,69 @@
+"""Tests of training metrics"""
+import json
+import random
+
+import pytest
+
+import hunl_cfr
+from hunl_cfr import HeadsUpNLCFR
+from util.actions import Action
+from util.betting import ActionTree, BettingConfig
+from util.metrics import TrainingMetrics
+
+PUSH_OR_FOLD = BettingConfig(((Action.ALL_IN,),) * 4, (1, 1, 1, 1))
+
+
+def timed_functions():
+    targets = [target for targets in hunl_cfr._PHASES.values() for target in targets]
+    targets += hunl_cfr._COUNTERS.values()
+    return {(owner, name): getattr(owner, name) for owner, name in targets}
+
+
+def test_training_writes_samples_and_removes_its_wrappers(tmp_path):
+    originals = timed_functions()
+    random.seed(0)
+    metrics_file = tmp_path / 'metrics.jsonl'
+    HeadsUpNLCFR(betting=ActionTree(PUSH_OR_FOLD)).train(
+        40, 0.05, 1000, 1e6, metrics_file=str(metrics_file), metrics_every=10)
+
+    assert timed_functions() == originals
+    samples = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    assert [sample['epoch'] for sample in samples] == [10, 20, 30, 40]
+    assert all(sample['nodes_per_sec'] > 0 and sample['table_rows'] > 0 for sample in samples)
+    assert all(0 <= sample['lookup_fraction'] <= 1 for sample in samples)
+
+
+def test_wrappers_are_removed_when_training_fails(tmp_path, monkeypatch):
+    originals = timed_functions()
+
+    def fail(*args):
+        raise RuntimeError("Injected failure.")
+
+    monkeypatch.setattr('hunl_cfr.exploitability', lambda *args, **kwargs: 0.0)
+    with pytest.raises(RuntimeError):
+        HeadsUpNLCFR(betting=ActionTree(PUSH_OR_FOLD)).train(
+            20, 0.05, 1000, 1e6, exploitability_every=5, on_exploitability=fail,
+            metrics_file=str(tmp_path / 'metrics.csv'))
+    assert timed_functions() == originals
+
+
+def test_phases_are_charged_exclusive_time(tmp_path):
+    class Work:
+        @staticmethod
+        def outer():
+            Work.inner()
+
+        @staticmethod
+        def inner():
+            sum(range(100000))
+
+    with TrainingMetrics(str(tmp_path / 'metrics.csv'), every=1,
+                         phases={'outer': [(Work, 'outer')], 'inner': [(Work, 'inner')]},
+                         counters={'calls': (Work, 'inner')}) as metrics:
+        for _ in range(5):
+            Work.outer()
+        assert metrics._counts['calls'] == 5
+        assert metrics._times['inner'] > metrics._times['outer'] > 0
+        metrics.record(1)
+    lines = (tmp_path / 'metrics.csv').read_text().splitlines()
+    assert lines[0].startswith('epoch,') and len(lines) == 2
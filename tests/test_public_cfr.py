@@ -0,0 +1,49 @@
+"""Tests of range-vs-range CFR over public subgames"""
+import numpy as np
+import pytest
+
+from public_cfr import VARIANTS, PublicTreeCFR
+from util.actions import Action
+from util.games import HUNLState
+
+_RIVER = 3
+BOARD = (0, 13, 26, 40, 51)
+
+
+def river_subgame(variant):
+    """A river subgame reached by calling and checking, one raise per street"""
+    state = HUNLState([1, 2, 3, 4] + list(BOARD))
+    while state.street < _RIVER:
+        state.push(Action.CHECK_CALL)
+    return PublicTreeCFR(state, BOARD, variant=variant, max_raises=1), state
+
+
+@pytest.mark.parametrize('variant', VARIANTS)
+def test_exploitability_falls_with_training(variant):
+    solver, _ = river_subgame(variant)
+    initial = solver.exploitability()
+    solver.train(50)
+    early = solver.exploitability()
+    solver.train(250)
+    assert solver.iterations == 300
+    assert solver.exploitability() < early < initial
+    assert solver.exploitability() < initial / 100
+
+
+@pytest.mark.parametrize('variant', VARIANTS)
+def test_average_strategy_sums_to_one_over_legal_actions(variant):
+    solver, state = river_subgame(variant)
+    solver.train(20)
+    for path in ((), (Action.CHECK_CALL,), (Action.BET_HALF,)):
+        for action in path:
+            state.push(action)
+        strategy = solver.average_strategy(path)
+        assert set(strategy) <= set(state.legal_actions())
+        assert np.allclose(sum(strategy.values()), 1.0)
+        assert all(np.all(column >= 0) for column in strategy.values())
+        for _ in path:
+            state.pop()
+
+    with pytest.raises(ValueError):
+        # checked down to a showdown
+        solver.average_strategy((Action.CHECK_CALL, Action.CHECK_CALL))
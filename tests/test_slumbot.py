@@ -0,0 +1,154 @@
+"""Tests of the Slumbot client against the local mock server"""
+import asyncio
+import json
+import random
+import socket
+
+import pytest
+
+from mock_slumbot import MockSlumbot, RandomOpponent
+from slumbot import RAISE, SlumbotClient, format_action, parse_action
+from util.actions import Action
+from util.games import BIG_BLIND
+from util.json_http import ConnectionPool, read_request
+from util.players import Player
+
+
+class RandomActionPlayer(Player):
+    """Picks any action at random; illegal picks are played as calls"""
+
+    def __init__(self, seed: int = 0) -> None:
+        self._random = random.Random(seed)
+
+    def get_action(self, info):
+        return self._random.choice(list(Action))
+
+
+class FlakyMockSlumbot(MockSlumbot):
+    """Rejects every failure_every-th move"""
+
+    def __init__(self, failure_every: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._failure_every = failure_every
+        self.moves = 0
+
+    def handle(self, path, request):
+        if path == '/api/act':
+            self.moves += 1
+            if self.moves % self._failure_every == 0:
+                return {'error_msg': "Injected failure."}
+        return super().handle(path, request)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def play_against(server, hands, sessions, log_file, **client_args):
+    """Serve the mock server and play a match against it
+
+    Returns:
+        the match result, or the exception the client raised
+    """
+    port = free_port()
+
+    async def run():
+        serving = asyncio.create_task(server.serve('127.0.0.1', port))
+        await asyncio.sleep(0.05)
+        try:
+            client = SlumbotClient(RandomActionPlayer(), f"http://127.0.0.1:{port}",
+                                   connections=4, **client_args)
+            return await client.play(hands, sessions, str(log_file))
+        finally:
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+    return asyncio.run(run())
+
+
+def read_log(log_file):
+    with open(log_file, encoding='utf-8') as log:
+        return [json.loads(line) for line in log]
+
+
+def test_parse_and_format_actions():
+    assert parse_action('b200c/kb300c/kk/') == [(RAISE, 200), (Action.CHECK_CALL, 0),
+                                                  (Action.CHECK_CALL, 0), (RAISE, 300),
+                                                  (Action.CHECK_CALL, 0), (Action.CHECK_CALL, 0),
+                                                  (Action.CHECK_CALL, 0)]
+    assert parse_action('f') == [(Action.FOLD, 0)]
+    with pytest.raises(ValueError):
+        parse_action('x')
+    assert format_action(Action.CHECK_CALL, 0, False) == 'k'
+    assert format_action(Action.CHECK_CALL, 0, True) == 'c'
+    assert format_action(Action.FOLD, 0, True) == 'f'
+    assert format_action(Action.BET_HALF, 450, False) == 'b450'
+
+
+def test_concurrent_sessions_account_for_every_hand(tmp_path):
+    server = MockSlumbot(RandomOpponent(0), latency=0.001, seed=0)
+    log_file = tmp_path / 'match.jsonl'
+    result = play_against(server, 40, 8, log_file)
+
+    hands = read_log(log_file)
+    assert result.hands == server.hands == len(hands) == 40
+    assert sorted(hand['hand'] for hand in hands) == list(range(1, 41))
+    total = sum(hand['winnings'] for hand in hands)
+    assert result.mean == pytest.approx(1000 / BIG_BLIND * total / 40)
+    # each session plays all of its hands on one token, alternating seats
+    assert len(server._sessions) == 8
+    assert sum(session.hands for session in server._sessions.values()) == 40
+    assert {hand['client_pos'] for hand in hands} == {0, 1}
+
+
+def test_logged_in_sessions_reuse_their_tokens(tmp_path):
+    server = MockSlumbot(RandomOpponent(1))
+    result = play_against(server, 12, 3, tmp_path / 'match.jsonl',
+                          username='user', password='secret')
+    assert result.hands == 12
+    assert len(server._sessions) == 3
+
+
+def test_failed_hands_are_replayed(tmp_path):
+    server = FlakyMockSlumbot(7, opponent=RandomOpponent(2))
+    log_file = tmp_path / 'match.jsonl'
+    # which session a failure lands on depends on scheduling, so allow any
+    # session several in a row
+    result = play_against(server, 30, 4, log_file, max_failures=30)
+    assert server.moves >= 7
+    # abandoned hands are neither counted nor logged, and are made up for
+    assert result.hands == server.hands == len(read_log(log_file)) == 30
+    assert len(server._sessions) > 4
+
+
+def test_a_session_gives_up_after_repeated_failures(tmp_path):
+    server = FlakyMockSlumbot(1, opponent=RandomOpponent(3))
+    with pytest.raises(RuntimeError, match="Injected failure"):
+        play_against(server, 10, 2, tmp_path / 'match.jsonl', max_failures=2)
+
+
+def test_pool_retries_a_connection_the_server_closed():
+    port = free_port()
+    connections = []
+
+    async def answer_once(reader, writer):
+        # answer one request, then drop the connection without saying so
+        connections.append(writer)
+        await read_request(reader)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 12\r\n\r\n{\"ok\": true}")
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(answer_once, '127.0.0.1', port)
+        async with server:
+            pool = ConnectionPool(f"http://127.0.0.1:{port}", 1)
+            first = await pool.post('/ping', {})
+            await asyncio.sleep(0.05)
+            second = await pool.post('/ping', {})
+            await pool.close()
+        return first, second
+
+    assert asyncio.run(run()) == ({'ok': True}, {'ok': True})
+    assert len(connections) == 2
@@ -0,0 +1,122 @@
+"""Tests of regret matching and compiled policy tables"""
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from util.actions import Action
+from util.infosets import InfoSet, InfoSetMap
+from util.players import CFRPlayer
+from util.strategies import (PolicyTable, masks_to_legal, regret_matching,
+                             table_regret_matching)
+
+
+def test_regret_matching_follows_positive_regret():
+    regrets = np.array([[2.0, -1.0, 6.0, 0.0, 0.0, 0.0]])
+    legal = np.array([[True, True, True, False, False, False]])
+    assert np.allclose(regret_matching(regrets, legal), [[0.25, 0, 0.75, 0, 0, 0]])
+
+
+def test_regret_matching_falls_back_to_uniform_over_legal_actions():
+    regrets = np.array([[-3.0, 0.0, -1.0, 5.0, 0.0, -2.0],
+                        [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+                        [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]])
+    legal = np.array([[True, True, True, False, False, False],
+                      [False, True, False, False, True, True],
+                      [False] * 6])
+    strategy = regret_matching(regrets, legal)
+    # the positive regret of an illegal action does not count
+    assert np.allclose(strategy[0], [1 / 3, 1 / 3, 1 / 3, 0, 0, 0])
+    assert np.allclose(strategy[1], [0, 1 / 3, 0, 0, 1 / 3, 1 / 3])
+    assert np.array_equal(strategy[2], np.zeros(6))
+
+
+def test_table_regret_matching_takes_legal_actions_from_row_masks():
+    table = InfoSetMap()
+    first = InfoSet.from_fields(150, (51, 50), False, 100, 50)
+    second = InfoSet.from_fields(200, (3, 2), True, 100, 100)
+    table.set_action(first, Action.FOLD, -5.0)
+    table.set_action(first, Action.CHECK_CALL, -1.0)
+    table.set_action(second, Action.CHECK_CALL, 3.0)
+    table.set_action(second, Action.BET_HALF, 1.0)
+
+    strategy = table_regret_matching(table)
+    assert np.allclose(strategy, [[0.5, 0.5, 0, 0, 0, 0], [0, 0.75, 0, 0, 0.25, 0]])
+    ids = np.array([table.infoset_id(second)])
+    assert np.allclose(table_regret_matching(table, ids), strategy[1:])
+    assert np.array_equal(masks_to_legal(table.masks[ids]), strategy[1:] > 0)
+
+
+def random_profile(n_rows=500, seed=0):
+    """A cumulative profile of random rows over random legal actions"""
+    rng = np.random.default_rng(seed)
+    profile = InfoSetMap()
+    for index in range(n_rows):
+        infoset = InfoSet.from_fields(index, (), False, 0, 0, index % 4)
+        actions = [action for action in Action if rng.random() < 0.6] or [Action.FOLD]
+        for action in actions:
+            # some rows have no positive weight and fall back to uniform
+            profile.set_action(infoset, action, float(rng.exponential()) if index % 5 else 0.0)
+    return profile
+
+
+def test_compiled_rows_end_at_exactly_one():
+    policy = PolicyTable.compile(random_profile())
+    table = policy._table
+    legal = masks_to_legal(table.masks)
+    last_legal = len(Action) - 1 - np.argmax(legal[:, ::-1], axis=1)
+    assert np.all(table.values[np.arange(len(table)), last_legal] == 1.0)
+    assert np.all(table.values[:, -1] == 1.0)
+    assert np.all(np.diff(table.values, axis=1) >= 0)
+
+
+def test_distribution_inverts_the_cumulative_rows():
+    profile = random_profile()
+    policy = PolicyTable.compile(profile)
+    expected = table_regret_matching(profile)
+    distributions, found = policy.distributions(profile.keys)
+    assert found.all()
+    assert np.allclose(distributions, expected, atol=1e-6)
+    for index in range(0, len(profile), 37):
+        infoset = InfoSet.from_fields(index, (), False, 0, 0, index % 4)
+        distribution = policy.distribution(infoset)
+        assert set(distribution) == {action for action in Action
+                                     if profile.masks[index] & (1 << action.value)}
+        for action, probability in distribution.items():
+            assert probability == pytest.approx(expected[index, action.value], abs=1e-6)
+    assert policy.distribution(InfoSet.from_fields(9999, (), False, 0, 0)) is None
+
+
+def test_illegal_actions_are_never_sampled():
+    random.seed(0)
+    profile = random_profile(100)
+    policy = PolicyTable.compile(profile)
+    for index in range(len(profile)):
+        infoset = InfoSet.from_fields(index, (), False, 0, 0, index % 4)
+        legal = {action for action in Action if profile.masks[index] & (1 << action.value)}
+        assert {policy.sample(infoset) for _ in range(30)} <= legal
+
+
+def test_sampling_follows_the_distribution():
+    random.seed(1)
+    profile = InfoSetMap()
+    infoset = InfoSet.from_fields(150, (51, 50), False, 100, 50)
+    profile.set_action(infoset, Action.FOLD, 1.0)
+    profile.set_action(infoset, Action.BET_HALF, 3.0)
+    policy = PolicyTable.compile(profile)
+    counts = Counter(policy.sample(infoset) for _ in range(4000))
+    assert set(counts) == {Action.FOLD, Action.BET_HALF}
+    assert counts[Action.BET_HALF] / 4000 == pytest.approx(0.75, abs=0.03)
+
+
+def test_cfr_player_checks_or_calls_at_unseen_infosets(tmp_path):
+    profile = InfoSetMap()
+    infoset = InfoSet.from_fields(150, (51, 50), False, 100, 50)
+    profile.set_action(infoset, Action.ALL_IN, 1.0)
+    filename = str(tmp_path / 'policy.bin')
+    PolicyTable.compile(profile).save_to_file(filename)
+
+    player = CFRPlayer(None, filename)
+    assert player.get_action(infoset) == Action.ALL_IN
+    assert player.get_action(InfoSet.from_fields(150, (3, 2), False, 100, 50)) == Action.CHECK_CALL
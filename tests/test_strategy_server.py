@@ -0,0 +1,179 @@
+"""Tests of the strategy server and its clients"""
+import asyncio
+import socket
+
+import numpy as np
+import pytest
+
+from strategy_server import AsyncStrategyClient, StrategyClient, StrategyServer
+from util.actions import Action
+from util.infosets import InfoSet, InfoSetMap
+from util.json_http import ConnectionPool
+from util.strategies import PolicyTable
+
+N_INFOSETS = 200
+UNSEEN_KEY = InfoSet.from_fields(1, (), False, 2, 3).key
+
+
+@pytest.fixture(scope='module')
+def policy():
+    rng = np.random.default_rng(0)
+    profile = InfoSetMap()
+    for index in range(N_INFOSETS):
+        infoset = InfoSet.from_fields(index, (51, 50), False, 100, 200)
+        for action in Action:
+            if rng.random() < 0.5 or action == Action.CHECK_CALL:
+                profile.set_action(infoset, action, float(rng.random()))
+    return PolicyTable.compile(profile)
+
+
+def policy_keys(count=N_INFOSETS):
+    return [InfoSet.from_fields(index, (51, 50), False, 100, 200).key for index in range(count)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def with_server(server, client_code):
+    """Serve on a free port and run client_code(url) against the server"""
+    port = free_port()
+
+    async def run():
+        serving = asyncio.create_task(server.serve('127.0.0.1', port))
+        await asyncio.sleep(0.05)
+        try:
+            return await client_code(f"http://127.0.0.1:{port}")
+        finally:
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_ready_requests_are_answered_in_one_batch(policy):
+    server = StrategyServer(policy, seed=0)
+
+    async def decide():
+        return await asyncio.gather(*(server.decide(np.array(keys, dtype=np.uint64))
+                                      for keys in np.array_split(policy_keys(), 10)))
+    answers = asyncio.run(decide())
+    assert (server.batches, server.decisions) == (1, N_INFOSETS)
+    expected, _ = policy.distributions(np.array(policy_keys(), dtype=np.uint64))
+    assert np.array_equal(np.concatenate([probabilities for probabilities, _, _ in answers]),
+                          expected)
+
+
+def test_window_collects_requests_arriving_late(policy):
+    server = StrategyServer(policy, window=0.2, seed=0)
+    keys = np.array(policy_keys(3), dtype=np.uint64)
+
+    async def decide_after(delay):
+        await asyncio.sleep(delay)
+        return await server.decide(keys)
+
+    async def decide():
+        return await asyncio.gather(*(decide_after(delay) for delay in (0, 0.02, 0.05)))
+    asyncio.run(decide())
+    assert (server.batches, server.decisions) == (1, 9)
+
+
+def test_full_batches_are_answered_without_waiting(policy):
+    server = StrategyServer(policy, window=10.0, max_batch=10, seed=0)
+    keys = np.array(policy_keys(6), dtype=np.uint64)
+
+    async def decide():
+        # the second request fills a batch; the third waits for a window that
+        # only a full batch ends early
+        first, second = server.decide(keys), server.decide(keys)
+        answers = await asyncio.gather(first, second)
+        assert (server.batches, server.decisions) == (1, 12)
+        third = asyncio.ensure_future(server.decide(keys[:3]))
+        await asyncio.sleep(0.05)
+        assert not third.done()
+        server._flush()
+        return answers + [await third]
+    answers = asyncio.run(decide())
+    assert (server.batches, server.decisions) == (2, 15)
+    assert [len(actions) for _, actions, _ in answers] == [6, 6, 3]
+
+
+def test_unknown_and_empty_requests(policy):
+    server = StrategyServer(policy, seed=0)
+
+    async def requests(url):
+        pool = ConnectionPool(url, 1)
+        try:
+            answers = [await pool.post('/decide', {'keys': [UNSEEN_KEY, policy_keys(1)[0]]}),
+                       await pool.post('/decide', {'keys': []}),
+                       await pool.post('/decide', {'keys': [UNSEEN_KEY],
+                                                   'distributions': True})]
+            with pytest.raises(RuntimeError, match="Expected keys or infosets"):
+                await pool.post('/decide', {'cards': []})
+            with pytest.raises(RuntimeError, match="Unknown endpoint"):
+                await pool.post('/elsewhere', {})
+            return answers
+        finally:
+            await pool.close()
+    mixed, empty, unseen = with_server(server, requests)
+    assert mixed['actions'][0] is None and mixed['actions'][1] is not None
+    assert empty == {'actions': []}
+    assert unseen == {'distributions': [None]}
+    assert server.requests == 3
+
+
+def test_infosets_given_by_fields_match_their_keys(policy):
+    server = StrategyServer(policy, seed=0)
+
+    async def requests(url):
+        pool = ConnectionPool(url, 1)
+        try:
+            return (await pool.post('/decide', {'infosets': [[7, [51, 50], False, 100, 200,
+                                                              0, None]],
+                                                'distributions': True}))['distributions']
+        finally:
+            await pool.close()
+    expected, _ = policy.distributions(np.array(policy_keys(8)[7:], dtype=np.uint64))
+    assert np.allclose(with_server(server, requests), expected)
+
+
+def test_blocking_client_samples_and_distributions(policy):
+    server = StrategyServer(policy, seed=0)
+    keys = policy_keys()
+
+    async def requests(url):
+        client = StrategyClient(url)
+        try:
+            return (await asyncio.to_thread(client.sample, keys + [UNSEEN_KEY]),
+                    await asyncio.to_thread(client.distributions, keys + [UNSEEN_KEY]))
+        finally:
+            client.close()
+    actions, distributions = with_server(server, requests)
+    expected, _ = policy.distributions(np.array(keys, dtype=np.uint64))
+    assert actions[-1] is None and distributions[-1] is None
+    for action, distribution, row in zip(actions, distributions, expected):
+        assert distribution == pytest.approx({action: row[action.value] for action in Action
+                                              if row[action.value] > 0})
+        # only actions with probability are sampled
+        assert row[action.value] > 0
+
+
+def test_concurrent_async_requests_share_batches(policy):
+    server = StrategyServer(policy, seed=0)
+    keys = policy_keys()
+
+    async def requests(url):
+        client = AsyncStrategyClient(url, connections=8)
+        try:
+            return await asyncio.gather(*(client.sample(keys[start:start + 5])
+                                          for start in range(0, N_INFOSETS, 5)))
+        finally:
+            await client.close()
+    answers = with_server(server, requests)
+    assert server.requests == N_INFOSETS // 5
+    assert server.batches < server.requests
+    expected, _ = policy.distributions(np.array(keys, dtype=np.uint64))
+    actions = [action for answer in answers for action in answer]
+    assert len(actions) == N_INFOSETS
+    assert all(expected[index, action.value] > 0 for index, action in enumerate(actions))
@@ -0,0 +1,75 @@
+"""Tests of action translation and of abstract hands"""
+from util import translation
+from util.actions import Action
+from util.betting import ActionTree, BettingConfig
+from util.translation import AbstractHand, ActionTranslator, pseudo_harmonic
+
+
+def test_pseudo_harmonic_endpoints():
+    assert pseudo_harmonic(0.5, 1.0, 0.5) == 1.0
+    assert pseudo_harmonic(0.5, 1.0, 1.0) == 0.0
+    assert 0 < pseudo_harmonic(0.5, 1.0, 0.75) < 1
+
+
+def test_translation_is_memoized_and_legal():
+    translator = ActionTranslator(seed=0)
+    legal = sum(1 << action.value for action in (Action.FOLD, Action.CHECK_CALL, Action.ALL_IN,
+                                                 Action.BET_HALF, Action.BET_FULL))
+    actions = {translator.translate(1000, 19000, 700, 200, legal) for _ in range(200)}
+    assert actions == {Action.BET_HALF, Action.BET_FULL}
+    assert len(translator) == 1
+
+
+def test_spots_differing_in_any_amount_are_cached_apart():
+    translator = ActionTranslator(seed=0)
+    legal = sum(1 << action.value for action in Action)
+    spots = [(1000, 19000, 700, 200, legal), (1000, 19000, 700, 200, legal & ~1),
+             (1000, 19000, 700, 400, legal), (1000, 19000, 900, 200, legal),
+             (1000, 18000, 700, 200, legal), (2000, 19000, 700, 200, legal),
+             (40000, 20000, 20000, 20000, legal)]
+    for spot in spots:
+        translator.translate(*spot)
+    assert len(translator) == len(spots)
+
+
+def test_cache_evicts_the_least_recently_used_spot(monkeypatch):
+    translator = ActionTranslator(seed=0, max_entries=2)
+    legal = (1 << Action.BET_HALF.value) | (1 << Action.ALL_IN.value)
+    computed = []
+    mapping = translation._mapping
+
+    def counted(*spot):
+        computed.append(spot[2])
+        return mapping(*spot)
+
+    monkeypatch.setattr(translation, '_mapping', counted)
+    for bet in (600, 700, 600, 800, 600, 700):
+        translator.translate(1000, 19000, bet, 200, legal)
+    # 700 is evicted for 800, and 600 stays cached as it is used again
+    assert computed == [600, 700, 800, 700]
+    assert len(translator) == 2
+
+
+def test_raise_at_a_capped_node_keeps_the_streets_together():
+    tree = ActionTree(BettingConfig(max_raises=(1, 2, 2, 2)))
+    # the player is the big blind; the button limps, the player raises and
+    # the button reraises, which the tree has no room for
+    hand = AbstractHand(0, (0, 1), None, ActionTranslator(seed=0), betting=tree)
+    hand.observe(Action.CHECK_CALL)
+    assert hand.act(Action.BET_FULL) == (Action.BET_FULL, 300)
+    hand.observe(Action.BET_MIN, 1000)
+    assert hand.real.street == hand.abstract.street == 0
+    assert hand.infoset() is None
+
+    assert hand.act(Action.BET_HALF) == (Action.CHECK_CALL, 0)
+    assert hand.real.street == hand.abstract.street == 1
+    assert hand.real.bets == [0, 0]
+    assert hand.real.pot == 2000
+    assert hand.abstract.actor_index == hand.real.actor_index == 0
+    assert hand.infoset() is not None
+
+    # the player's flop bet is a flop bet of half the real pot
+    action, raise_to = hand.act(Action.BET_HALF)
+    assert action == Action.BET_HALF
+    assert raise_to == 1000
+    assert hand.real.street == 1